@@ -0,0 +1,252 @@
+"""
+A local stand-in for the parts of the Stripe API this project calls.
+
+It answers the Customer, InvoiceItem, Invoice (create and finalize),
+Checkout Session and Refund endpoints with minimal Stripe-shaped objects, honours
+`Idempotency-Key` like Stripe does (including refusing a key reused with
+other parameters) and can add a fixed latency to every response, so checkout throughput can be measured without the network:
+
+    python -m benchmarks.fake_stripe --port 12111 --latency 0.05
+    STRIPE_API_BASE=http://127.0.0.1:12111 STRIPE_SECRET_KEY=sk_test_fake ...
+"""
+import argparse
+import itertools
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+# Shortest and longest expiry Stripe accepts for a checkout session.
+CHECKOUT_MIN_EXPIRY = 30 * 60
+CHECKOUT_MAX_EXPIRY = 24 * 60 * 60
+
+
+class FakeStripeError(Exception):
+    """
+    A Stripe error response.
+    """
+
+    def __init__(self, error_type, message):
+        super().__init__(message)
+        self.body = {'error': {'type': error_type, 'message': message}}
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        (re.compile(r'^/v1/customers$'), 'create_customer'),
+        (re.compile(r'^/v1/invoiceitems$'), 'create_invoice_item'),
+        (re.compile(r'^/v1/invoices$'), 'create_invoice'),
+        (re.compile(r'^/v1/invoices/(?P<invoice_id>[^/]+)/finalize$'), 'finalize_invoice'),
+        (re.compile(r'^/v1/checkout/sessions$'), 'create_checkout_session'),
+        (re.compile(r'^/v1/refunds$'), 'create_refund'),
+    ]
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, delayed
+        # ACKs would add ~40ms to every keep-alive response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = dict(parse_qsl(self.rfile.read(length).decode('utf-8'), keep_blank_values=True))
+        for pattern, name in self.routes:
+            match = pattern.match(self.path)
+            if match:
+                break
+        else:
+            return self.respond(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown endpoint'}})
+
+        self.server.enter()
+        try:
+            key = self.headers.get('Idempotency-Key')
+            status, body = self.server.replay(key, params)
+            if body is None:
+                self.server.count('requests')
+                try:
+                    status, body = 200, getattr(self.server, name)(params, **match.groupdict())
+                except FakeStripeError as error:
+                    status, body = 400, error.body
+                self.server.remember(key, params, status, body)
+            if self.server.latency:
+                time.sleep(self.server.latency)
+        finally:
+            self.server.leave()
+        self.respond(status, body)
+
+    def respond(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """
+    Threaded fake Stripe server.
+
+    `stats` counts the TCP connections accepted and the requests that
+    created an object (idempotent replays are not counted), which shows how
+    well clients reuse connections. `peak_in_flight` is the largest number
+    of requests handled at the same time, which shows whether a client
+    overlaps its calls.
+
+    Args:
+        address (tuple): Host and port to bind; port 0 picks a free one.
+        latency (float): Seconds added to every response.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0):
+        super().__init__(address, FakeStripeHandler)
+        self.latency = latency
+        self.stats = {'connections': 0, 'requests': 0}
+        self.in_flight = self.peak_in_flight = 0
+        self.objects = {}
+        self.responses = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def replay(self, key, params):
+        """
+        The response stored under an idempotency key, like Stripe replays it.
+
+        A key reused with other parameters gets an idempotency error.
+        """
+        if not key:
+            return None, None
+        with self.lock:
+            if key not in self.responses:
+                return None, None
+            stored_params, status, body = self.responses[key]
+        if stored_params != params:
+            return 400, FakeStripeError(
+                'idempotency_error',
+                'Keys for idempotent requests can only be used with the same parameters they were first used with.',
+            ).body
+        return status, body
+
+    def remember(self, key, params, status, body):
+        if key:
+            with self.lock:
+                self.responses.setdefault(key, (params, status, body))
+
+    def new_object(self, prefix, kind, **fields):
+        with self.lock:
+            object_id = f'{prefix}_fake{next(self.ids)}'
+            self.objects[object_id] = {'id': object_id, 'object': kind, 'created': int(time.time()), **fields}
+            return self.objects[object_id]
+
+    def create_customer(self, params):
+        return self.new_object('cus', 'customer', email=params.get('email'), name=params.get('name'))
+
+    def create_invoice_item(self, params):
+        return self.new_object(
+            'ii', 'invoiceitem', customer=params.get('customer'), amount=int(params.get('amount', 0)),
+            currency=params.get('currency'), description=params.get('description'), invoice=None,
+        )
+
+    def create_invoice(self, params):
+        customer = params.get('customer')
+        with self.lock:
+            items = [
+                item for item in self.objects.values()
+                if item['object'] == 'invoiceitem' and item['customer'] == customer and item['invoice'] is None
+            ]
+        invoice = self.new_object(
+            'in', 'invoice', customer=customer, status='draft', hosted_invoice_url=None,
+            amount_due=sum(item['amount'] for item in items),
+            metadata={key[9:-1]: value for key, value in params.items() if key.startswith('metadata[')},
+        )
+        for item in items:
+            item['invoice'] = invoice['id']
+        return invoice
+
+    def finalize_invoice(self, params, invoice_id):
+        with self.lock:
+            invoice = self.objects[invoice_id]
+            invoice.update(status='open', hosted_invoice_url=f'{self.url}/invoices/{invoice_id}')
+            return invoice
+
+    def create_checkout_session(self, params):
+        if 'expires_at' in params:
+            remaining = int(params['expires_at']) - time.time()
+            if not CHECKOUT_MIN_EXPIRY <= remaining <= CHECKOUT_MAX_EXPIRY:
+                raise FakeStripeError(
+                    'invalid_request_error',
+                    'The `expires_at` timestamp must be between 30 minutes and 24 hours from creation.',
+                )
+        session = self.new_object(
+            'cs_test', 'checkout.session', mode=params.get('mode'), payment_status='unpaid',
+            expires_at=int(params['expires_at']) if 'expires_at' in params else None,
+            metadata={key[9:-1]: value for key, value in params.items() if key.startswith('metadata[')},
+        )
+        session['url'] = f'{self.url}/pay/{session["id"]}'
+        return session
+
+    def create_refund(self, params):
+        if not params.get('payment_intent'):
+            raise FakeStripeError('invalid_request_error', 'Missing required param: payment_intent.')
+        return self.new_object(
+            're', 'refund', payment_intent=params['payment_intent'], status='succeeded',
+            metadata={key[9:-1]: value for key, value in params.items() if key.startswith('metadata[')},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Stripe API server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response.')
+    options = parser.parse_args()
+    server = FakeStripeServer((options.host, options.port), latency=options.latency)
+    print(f'Fake Stripe listening on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
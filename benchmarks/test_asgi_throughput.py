@@ -0,0 +1,187 @@
+import asyncio
+import io
+import json
+import os
+import time
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import path
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+from cart.models import Cart, CartItem
+from drf_api import stripe_gateway
+from drf_api.authentication import CachedJWTCookieAuthentication
+from drf_api.views import AsyncCheckoutSessionView, create_checkout_session
+from products.models import Product, StockReservation
+from .fake_stripe import FakeStripeServer
+
+# Simulated Stripe round trip, checkouts per mode and clients in flight at once.
+LATENCY = 0.05
+REQUESTS = 40
+CONCURRENCY = 20
+
+# Both implementations side by side, so one process can serve either mode.
+urlpatterns = [
+    path('wsgi/create-checkout-session/', create_checkout_session),
+    path('asgi/create-checkout-session/', AsyncCheckoutSessionView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsgiThroughputBenchmark(TransactionTestCase):
+    """
+    Checkout throughput of one WSGI worker against one ASGI worker.
+
+    `REQUESTS` buyers start a checkout, `CONCURRENCY` at a time, against the
+    fake Stripe server. The sync view is served by Django's WSGI handler the
+    way a sync gunicorn worker serves it, one request after another; the
+    async view is served by Django's ASGI handler on one event loop, the way
+    a uvicorn worker serves it, so requests overlap while they wait on
+    Stripe. Requests authenticate with JWTs like in production. Throughput
+    and latency percentiles of both modes are written as JSON to the path in
+    the `ASGI_BENCHMARK_REPORT` environment variable when set.
+
+    Requests served by the ASGI handler use their own database connections,
+    so the benchmark is skipped on an in-memory SQLite test database; run it
+    on PostgreSQL or with a file-backed SQLite test database (DATABASES TEST NAME).
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Needs a test database shared between threads.')
+        self.server = FakeStripeServer(latency=LATENCY).start()
+        overrides = override_settings(
+            STRIPE_API_BASE=self.server.url, STRIPE_SECRET_KEY='sk_test_fake', STRIPE_HTTP_POOL_SIZE=CONCURRENCY,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.server.stop)
+        self.addCleanup(stripe_gateway.reset_client)
+        stripe_gateway.reset_client()
+        for view_class in (APIView, create_checkout_session.cls):
+            authentication = patch.object(view_class, 'authentication_classes', [CachedJWTCookieAuthentication])
+            authentication.start()
+            self.addCleanup(authentication.stop)
+
+        seller = User.objects.create_user(username='seller', password='password')
+        product = Product.objects.create(owner=seller, name='Shirt', price=12.50, stock=2 * REQUESTS)
+        buyers = User.objects.bulk_create([User(username=f'buyer{index}') for index in range(2 * REQUESTS)])
+        carts = Cart.objects.bulk_create([Cart(owner=buyer) for buyer in buyers])
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1, price=12.50) for cart in carts])
+        self.checkouts = [
+            (cart.pk, str(RefreshToken.for_user(buyer).access_token)) for buyer, cart in zip(buyers, carts)
+        ]
+
+    def wsgi_checkout(self, application, cart_id, token):
+        body = json.dumps({'cart_id': cart_id}).encode()
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/wsgi/create-checkout-session/',
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': io.StringIO(),
+        }
+        statuses = []
+        started = time.perf_counter()
+        response = application(environ, lambda status, headers: statuses.append(status))
+        content = b''.join(response)
+        response.close()
+        return int(statuses[0].split()[0]), json.loads(content), time.perf_counter() - started
+
+    async def asgi_checkout(self, application, cart_id, token):
+        body = json.dumps({'cart_id': cart_id}).encode()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/asgi/create-checkout-session/',
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'authorization', f'Bearer {token}'.encode()),
+            ],
+            'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Django listens for a disconnect until the response is sent.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        content = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+        return sent[0]['status'], json.loads(content), time.perf_counter() - started
+
+    def run_wsgi(self, checkouts):
+        application = get_wsgi_application()
+        started = time.perf_counter()
+        results = [self.wsgi_checkout(application, cart_id, token) for cart_id, token in checkouts]
+        return results, time.perf_counter() - started
+
+    def run_asgi(self, checkouts):
+        application = get_asgi_application()
+
+        async def serve():
+            slots = asyncio.Semaphore(CONCURRENCY)
+
+            async def checkout(cart_id, token):
+                async with slots:
+                    return await self.asgi_checkout(application, cart_id, token)
+
+            return await asyncio.gather(*(checkout(cart_id, token) for cart_id, token in checkouts))
+
+        started = time.perf_counter()
+        results = asyncio.run(serve())
+        return results, time.perf_counter() - started
+
+    def summarize(self, results, seconds):
+        self.assertEqual([status for status, _, _ in results], [200] * REQUESTS)
+        self.assertEqual(len({data['id'] for _, data, _ in results}), REQUESTS)
+        latencies = sorted(latency for _, _, latency in results)
+        return {
+            'requests_per_second': round(REQUESTS / seconds, 1),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        }
+
+    def test_asgi_overlaps_stripe_round_trips(self):
+        wsgi = self.summarize(*self.run_wsgi(self.checkouts[:REQUESTS]))
+        asgi = self.summarize(*self.run_asgi(self.checkouts[REQUESTS:]))
+
+        self.assertEqual(StockReservation.objects.count(), 2 * REQUESTS)
+        self.assertGreater(asgi['requests_per_second'], wsgi['requests_per_second'])
+
+        report = {
+            'vendor': connection.vendor,
+            'requests': REQUESTS,
+            'concurrency': CONCURRENCY,
+            'latency_ms': LATENCY * 1000,
+            'wsgi': wsgi,
+            'asgi': asgi,
+        }
+        report_path = os.environ.get('ASGI_BENCHMARK_REPORT')
+        if report_path:
+            with open(report_path, 'w') as report_file:
+                json.dump(report, report_file, indent=2, sort_keys=True)
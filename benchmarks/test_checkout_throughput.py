@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.test import SimpleTestCase, override_settings
+from drf_api import stripe_gateway
+from .fake_stripe import FakeStripeServer
+
+# Simulated Stripe round trip, checkout sessions created and buyer threads.
+LATENCY = 0.02
+SESSIONS = 60
+THREADS = 6
+
+LINE_ITEMS = [
+    {'price_data': {'currency': 'usd', 'product_data': {'name': 'Shirt'}, 'unit_amount': 1250}, 'quantity': 2},
+]
+
+
+class CheckoutThroughputBenchmark(SimpleTestCase):
+    """
+    Checkout session throughput against the local fake Stripe server.
+
+    `SESSIONS` checkout sessions are created from `THREADS` threads through
+    the pooled gateway client. The connection count shows the keep-alive
+    pool at work: it stays at one connection per thread however many calls
+    are made. Replaying every call with its idempotency key must not create
+    anything. Throughput and connection counts are written as JSON to the
+    path in the `CHECKOUT_BENCHMARK_REPORT` environment variable when set.
+    """
+
+    def setUp(self):
+        self.server = FakeStripeServer(latency=LATENCY).start()
+        overrides = override_settings(
+            STRIPE_API_BASE=self.server.url, STRIPE_SECRET_KEY='sk_test_fake', STRIPE_HTTP_POOL_SIZE=THREADS,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.server.stop)
+        self.addCleanup(stripe_gateway.reset_client)
+        stripe_gateway.reset_client()
+
+    def create_session(self, number):
+        return stripe_gateway.create_checkout_session(
+            line_items=LINE_ITEMS,
+            metadata={'cart_id': number},
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel',
+            idempotency_key=f'benchmark:{number}',
+        ).id
+
+    def run_sessions(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            ids = list(executor.map(self.create_session, range(SESSIONS)))
+        return ids, time.perf_counter() - started
+
+    def test_checkout_throughput(self):
+        ids, seconds = self.run_sessions()
+        self.assertEqual(len(set(ids)), SESSIONS)
+        self.assertLessEqual(self.server.stats['connections'], THREADS)
+        connections = self.server.stats['connections']
+
+        replayed_ids, replay_seconds = self.run_sessions()
+        self.assertEqual(replayed_ids, ids)
+        self.assertEqual(self.server.stats['requests'], SESSIONS)
+
+        report = {
+            'sessions': SESSIONS,
+            'threads': THREADS,
+            'latency_ms': LATENCY * 1000,
+            'sessions_per_second': round(SESSIONS / seconds, 1),
+            'replay_sessions_per_second': round(SESSIONS / replay_seconds, 1),
+            'connections': connections,
+        }
+        report_path = os.environ.get('CHECKOUT_BENCHMARK_REPORT')
+        if report_path:
+            with open(report_path, 'w') as report_file:
+                json.dump(report, report_file, indent=2, sort_keys=True)
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.test import APITestCase
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products.models import Product
+from reviews.models import Review
+
+BUDGETS_PATH = Path(__file__).with_name('query_budgets.json')
+
+# Name, URL and which seeded user (if any) the request is made as.
+ENDPOINTS = [
+    ('products', '/products/', None),
+    ('profiles', '/profiles/', None),
+    ('orders', '/orders/', 'buyer'),
+    ('order-history', '/order-history/', 'buyer'),
+    ('carts', '/carts/', 'staff'),
+    ('reviews', '/reviews/', 'buyer'),
+]
+
+class QueryTimer:
+    """
+    Database execute wrapper that counts queries and sums their duration.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+# Shops seeded before the first and the second measurement. One shop yields a
+# single row on most endpoints; twelve fill a whole page of PAGE_SIZE rows.
+SMALL_SHOPS = 1
+LARGE_SHOPS = 12
+
+
+class EndpointQueryBudgetTests(APITestCase):
+    """
+    Query-count regression suite for every routed list endpoint.
+
+    Each endpoint is measured twice: once with a single seeded shop and once
+    with enough shops to fill a page. The number of SQL queries must not grow
+    between the two and must stay within the budget checked in next to this
+    module in `query_budgets.json`. Query count, total SQL time and wall time
+    are collected, and written as JSON to the path in the
+    `QUERY_BENCHMARK_REPORT` environment variable when it is set.
+    """
+    results = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(BUDGETS_PATH) as budgets_file:
+            cls.budgets = json.load(budgets_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        report_path = os.environ.get('QUERY_BENCHMARK_REPORT')
+        if report_path:
+            with open(report_path, 'w') as report_file:
+                json.dump(cls.results, report_file, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.users = {
+            'buyer': User.objects.create_user(username='buyer', password='password'),
+            'staff': User.objects.create_superuser(username='staff', password='password'),
+        }
+        self.shops = 0
+
+    def seed_shops(self, count):
+        """
+        Add `count` shops. A shop is a seller with two reviewed products, an
+        order of those products placed by the buyer and a cart holding them.
+        """
+        buyer = self.users['buyer']
+        for _ in range(count):
+            self.shops += 1
+            seller = User.objects.create_user(username=f'seller{self.shops}', password='password')
+            products = [
+                Product.objects.create(
+                    owner=seller, name=f'Product {self.shops}-{i}',
+                    description='Seeded product', price=10 + i, stock=100,
+                )
+                for i in range(2)
+            ]
+            order = Order.objects.create(owner=buyer, total_price=21)
+            cart = Cart.objects.create(owner=seller)
+            for product in products:
+                Review.objects.create(product=product, owner=buyer, rating=4, comment='Good')
+                Review.objects.create(product=product, owner=seller, rating=5, comment='Mine')
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+                CartItem.objects.create(cart=cart, product=product, quantity=1, price=product.price)
+
+    def measure(self, url, user):
+        """
+        Request `url` once to warm up, then again while capturing SQL.
+
+        Returns:
+            dict: The query count, total SQL time and wall time in milliseconds.
+        """
+        self.client.force_authenticate(user=self.users[user] if user else None)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = self.client.get(url)
+            wall_time = time.perf_counter() - started
+        self.assertEqual(response.status_code, 200)
+        return {
+            'queries': timer.count,
+            'sql_ms': round(timer.seconds * 1000, 3),
+            'wall_ms': round(wall_time * 1000, 3),
+        }
+
+    def test_endpoints_stay_within_query_budgets(self):
+        small = {}
+        self.seed_shops(SMALL_SHOPS)
+        for name, url, user in ENDPOINTS:
+            small[name] = self.measure(url, user)
+
+        self.seed_shops(LARGE_SHOPS - SMALL_SHOPS)
+        for name, url, user in ENDPOINTS:
+            large = self.measure(url, user)
+            self.results[name] = {'url': url, 'small': small[name], 'large': large}
+            with self.subTest(endpoint=name):
+                self.assertEqual(
+                    large['queries'], small[name]['queries'],
+                    f'{url} ran {small[name]["queries"]} queries for {SMALL_SHOPS} shop(s) '
+                    f'but {large["queries"]} for {LARGE_SHOPS}',
+                )
+                self.assertLessEqual(
+                    large['queries'], self.budgets[name]['max_queries'],
+                    f'{url} exceeded its query budget',
+                )
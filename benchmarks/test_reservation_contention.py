@@ -0,0 +1,73 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import TransactionTestCase
+from cart.models import Cart
+from products.models import Product, StockReservation
+from products.stock import reserve_stock
+
+BUYERS = 200
+THREADS = 16
+STOCK = 50
+
+
+class ReservationContentionBenchmark(TransactionTestCase):
+    """
+    Hundreds of buyers reserving the last units of one SKU at once.
+
+    `BUYERS` carts each try to hold one unit of a product with `STOCK` units
+    from `THREADS` threads. Exactly `STOCK` reservations must succeed, the
+    held units must never exceed the stock, and every buyer must get an
+    answer. Throughput and latency percentiles are written as JSON to the
+    path in the `RESERVATION_BENCHMARK_REPORT` environment variable when set.
+
+    Threads need their own connections to the test database, so the
+    benchmark is skipped on an in-memory SQLite test database; run it on
+    PostgreSQL or with a file-backed SQLite test database (DATABASES TEST NAME).
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Needs a test database shared between threads.')
+        seller = User.objects.create_user(username='seller', password='password')
+        self.product = Product.objects.create(owner=seller, name='Hot item', price=10, stock=STOCK)
+        buyers = User.objects.bulk_create([User(username=f'buyer{index}') for index in range(BUYERS)])
+        self.carts = Cart.objects.bulk_create([Cart(owner=buyer) for buyer in buyers])
+
+    def reserve(self, cart):
+        started = time.perf_counter()
+        try:
+            short = reserve_stock(cart, {self.product.pk: 1})
+        finally:
+            connections.close_all()
+        return not short, time.perf_counter() - started
+
+    def test_no_oversell_under_contention(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            results = list(executor.map(self.reserve, self.carts))
+        seconds = time.perf_counter() - started
+
+        reserved = sum(1 for ok, _ in results if ok)
+        self.assertEqual(reserved, STOCK)
+        self.assertEqual(StockReservation.objects.count(), STOCK)
+        self.assertEqual(Product.objects.with_available_stock().get(pk=self.product.pk).available_stock, 0)
+
+        latencies = sorted(latency for _, latency in results)
+        report = {
+            'vendor': connection.vendor,
+            'buyers': BUYERS,
+            'threads': THREADS,
+            'stock': STOCK,
+            'reserved': reserved,
+            'attempts_per_second': round(BUYERS / seconds, 1),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        }
+        report_path = os.environ.get('RESERVATION_BENCHMARK_REPORT')
+        if report_path:
+            with open(report_path, 'w') as report_file:
+                json.dump(report, report_file, indent=2, sort_keys=True)
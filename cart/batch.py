@@ -0,0 +1,82 @@
+from django.db import transaction
+from products.models import Product
+from .models import Cart, CartItem
+
+ADD = 'add'
+REMOVE = 'remove'
+SET_QUANTITY = 'set_quantity'
+
+
+def apply_cart_operations(cart, operations):
+    """
+    Apply a list of add / remove / set-quantity operations to `cart` at once.
+
+    The operations are replayed in memory over the current items, then the
+    products they touch are loaded in one query and the resulting quantities
+    are checked against the stock not held by other carts' checkouts. If every operation is valid the changes are
+    written in one transaction with at most one bulk INSERT, one bulk UPDATE
+    and one DELETE, and the cart is touched once.
+
+    Args:
+        cart (Cart): The cart to change.
+        operations (list): Validated operations, dicts with `op`, `product`
+            and, for add and set_quantity, `quantity`.
+
+    Returns:
+        list: One dict of errors per operation (empty for valid ones) when
+        any operation is invalid, in which case nothing is written; None on
+        success.
+    """
+    with transaction.atomic():
+        # Serialize concurrent batches on the same cart.
+        Cart.objects.select_for_update().only('pk').get(pk=cart.pk)
+        items = {item.product_id: item for item in CartItem.objects.filter(cart=cart)}
+        quantities = {product_id: item.quantity for product_id, item in items.items()}
+        for operation in operations:
+            product_id = operation['product']
+            if operation['op'] == ADD:
+                quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+            elif operation['op'] == SET_QUANTITY:
+                quantities[product_id] = operation['quantity']
+            else:
+                quantities[product_id] = 0
+
+        touched = {operation['product'] for operation in operations}
+        # Units held by other carts' checkouts are not available.
+        products = Product.objects.only('id', 'price').with_available_stock(exclude_cart=cart).in_bulk(touched)
+        errors = [{} for _ in operations]
+        for index, operation in enumerate(operations):
+            product = products.get(operation['product'])
+            if product is None:
+                if operation['op'] != REMOVE:
+                    errors[index]['product'] = ['Product not found.']
+            elif quantities[product.pk] > product.available_stock:
+                errors[index]['quantity'] = ['Quantity exceeds stock.']
+        if any(errors):
+            return errors
+
+        to_create, to_update, to_delete = [], [], []
+        for product_id in touched:
+            quantity = quantities[product_id]
+            item = items.get(product_id)
+            if not quantity:
+                if item is not None:
+                    to_delete.append(item.pk)
+                continue
+            price = products[product_id].price * quantity
+            if item is None:
+                to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity, price=price))
+            elif item.quantity != quantity or item.price != price:
+                item.quantity = quantity
+                item.price = price
+                to_update.append(item)
+
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity', 'price'])
+        if to_delete:
+            CartItem.objects.filter(pk__in=to_delete).delete()
+        if to_create or to_update or to_delete:
+            cart.touch()
+    return None
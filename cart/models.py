@@ -1,15 +1,77 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 from products.models import Product
 
+class CartQuerySet(models.QuerySet):
+    """
+    QuerySet for Cart with the related rows needed by CartSerializer.
+    """
+
+    def for_serializer(self, fieldset=None):
+        """
+        Join the owner and prefetch the items with their products.
+
+        Args:
+            fieldset (SparseFieldset): The fields requested with `?fields=` /
+                `?omit=`, if any. Nested rows the request leaves out are not loaded.
+        """
+        queryset = self.select_related('owner')
+        if fieldset is None or fieldset.wants('items.product'):
+            return queryset.prefetch_related(models.Prefetch(
+                'items__product', queryset=Product.objects.for_serializer(fieldset, 'items.product')
+            ))
+        if fieldset.wants('items'):
+            return queryset.prefetch_related('items')
+        return queryset
+
+    def with_totals(self):
+        """
+        Annotate each cart with `item_count`, the number of units it holds, and
+        `subtotal`, their total at the current product prices.
+
+        Both are computed by the database in the same query as the carts.
+        """
+        line_total = models.ExpressionWrapper(
+            models.F('items__quantity') * models.F('items__product__price'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+        return self.annotate(
+            item_count=Coalesce(models.Sum('items__quantity'), 0),
+            subtotal=Coalesce(
+                models.Sum(line_total), models.Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
 class Cart(models.Model):
     owner = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f'Cart of {self.owner.username}'
 
+    def clear(self):
+        """
+        Delete every item of the cart in one statement and touch the cart once.
+        """
+        CartItem.objects.filter(cart=self).delete()
+        self.touch()
+
+    def touch(self):
+        """
+        Move `updated_at` forward, e.g. after changing items with bulk queries
+        that do not send the signals `cart.signals.touch_cart` listens to, or
+        after deleting items (see `cart.signals`).
+        """
+        self.updated_at = timezone.now()
+        Cart.objects.filter(pk=self.pk).update(updated_at=self.updated_at)
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from .batch import ADD, REMOVE, SET_QUANTITY
 from .models import Cart, CartItem
 from products.serializers import ProductSerializer
+from drf_api.fieldsets import SparseFieldsetMixin
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for cart item instances.
     
@@ -18,7 +20,7 @@ class CartItemSerializer(serializers.ModelSerializer):
             'cart': {'read_only': True}
         }
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for cart instances.
 
@@ -32,3 +34,38 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'owner', 'items', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+
+class CartSummarySerializer(serializers.Serializer):
+    """
+    Serializer for the totals of a cart, as annotated by `CartQuerySet.with_totals`.
+
+    `item_count` is the number of units in the cart and `subtotal` their total
+    at the current product prices.
+    """
+    item_count = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    updated_at = serializers.DateTimeField(allow_null=True)
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one operation of a cart batch.
+
+    `add` adds `quantity` units of the product, `set_quantity` sets its
+    quantity (0 removes it) and `remove` removes it from the cart.
+    """
+    op = serializers.ChoiceField(choices=[ADD, REMOVE, SET_QUANTITY])
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if data['op'] == ADD and not data.get('quantity'):
+            raise serializers.ValidationError({'quantity': 'A positive quantity is required.'})
+        if data['op'] == SET_QUANTITY and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return data
+
+class CartBatchSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of cart operations, applied in order.
+    """
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
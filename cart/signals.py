@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, pre_delete
+from django.utils import timezone
+from products.models import Product
+from .models import Cart, CartItem
+
+def touch_cart(sender, instance, **kwargs):
+    """
+    Signal receiver that moves a cart's `updated_at` forward whenever one of its
+    items is added or changed, so the cart's validators change with it.
+
+    Deleted items are not listened to, so item deletes stay a single DELETE
+    without loading the rows; whoever deletes items calls `Cart.touch()`.
+
+    Args:
+        sender (Model): The model class sending the signal (CartItem).
+        instance (CartItem): The instance of the model being saved.
+        **kwargs: Additional keyword arguments.
+    """
+    Cart.objects.filter(pk=instance.cart_id).update(updated_at=timezone.now())
+
+def touch_carts_of_deleted_product(sender, instance, **kwargs):
+    """
+    Signal receiver that moves `updated_at` forward on the carts holding a product
+    about to be deleted, whose items go with it.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model about to be deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    Cart.objects.filter(items__product=instance).update(updated_at=timezone.now())
+
+post_save.connect(touch_cart, sender=CartItem)
+pre_delete.connect(touch_carts_of_deleted_product, sender=Product)
@@ -1,9 +1,14 @@
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from .models import Cart, CartItem
+from .views import AsyncCartSummaryView
 from products.models import Product
+from products.stock import reserve_stock
 
 class CartTestCase(APITestCase):
     def setUp(self):
@@ -54,6 +59,64 @@ class CartTestCase(APITestCase):
         self.assertEqual(cart_item.quantity, 2)
         self.assertEqual(cart_item.price, 20.00)
 
+    def test_units_held_by_other_checkouts_are_not_available(self):
+        """
+        Ensure adding, updating and batching only count stock not held by other carts.
+        """
+        seller = User.objects.get(username='anotheruser')
+        product = Product.objects.create(owner=seller, name='Shirt', price=10.00, stock=3)
+        reserve_stock(Cart.objects.get(owner=seller), {product.pk: 2})
+        cart = Cart.objects.get(owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(reverse('cart-add-item'), {'product': product.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CartItem.objects.filter(cart=cart).exists())
+
+        response = self.client.post(reverse('cart-add-item'), {'product': product.id, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        item = CartItem.objects.get(cart=cart)
+
+        url = reverse('cart-update-quantity', args=[cart.id])
+        response = self.client.post(url, {'item_id': item.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        operations = [{'op': 'set_quantity', 'product': product.id, 'quantity': 2}]
+        response = self.client.post(reverse('cart-batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 1)
+
+    def test_item_deletes_are_single_statements_and_touch_the_cart(self):
+        """
+        Ensure removing and clearing items move `updated_at`, and clearing is one DELETE and one UPDATE.
+        """
+        seller = User.objects.get(username='anotheruser')
+        cart = Cart.objects.get(owner=self.user)
+        products = [Product.objects.create(owner=seller, name=f'Product {i}', price=10.00, stock=5) for i in range(3)]
+        items = [CartItem.objects.create(cart=cart, product=product, quantity=1, price=10.00) for product in products]
+        Cart.objects.filter(pk=cart.pk).update(updated_at=cart.created_at)
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(reverse('cart-remove-item', args=[cart.id]), {'item_id': items[0].id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertGreater(Cart.objects.get(pk=cart.pk).updated_at, cart.created_at)
+
+        Cart.objects.filter(pk=cart.pk).update(updated_at=cart.created_at)
+        with self.assertNumQueries(2):
+            cart.clear()
+        self.assertFalse(cart.items.exists())
+        self.assertGreater(Cart.objects.get(pk=cart.pk).updated_at, cart.created_at)
+
+    def test_deleting_a_product_touches_the_carts_holding_it(self):
+        seller = User.objects.get(username='anotheruser')
+        cart = Cart.objects.get(owner=self.user)
+        product = Product.objects.create(owner=seller, name='Shirt', price=10.00, stock=5)
+        CartItem.objects.create(cart=cart, product=product, quantity=1, price=10.00)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=cart.created_at)
+        product.delete()
+        self.assertFalse(cart.items.exists())
+        self.assertGreater(Cart.objects.get(pk=cart.pk).updated_at, cart.created_at)
+
     def test_admin_can_list_all_carts(self):
         """
         Ensure that an admin user can list all carts.
@@ -65,3 +128,100 @@ class CartTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], Cart.objects.count())
+
+    def test_cart_summary(self):
+        """
+        Ensure the summary returns the cart totals in a single query.
+        """
+        seller = User.objects.get(username='anotheruser')
+        shirt = Product.objects.create(owner=seller, name='Shirt', price=12.50, stock=10)
+        hat = Product.objects.create(owner=seller, name='Hat', price=5.00, stock=10)
+        cart = Cart.objects.get(owner=self.user)
+        CartItem.objects.create(cart=cart, product=shirt, quantity=2, price=25.00)
+        CartItem.objects.create(cart=cart, product=hat, quantity=3, price=15.00)
+        Product.objects.filter(pk=hat.pk).update(price=6.00)
+        self.client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('cart-summary'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['item_count'], 5)
+        self.assertEqual(response.data['subtotal'], '43.00')
+        self.assertIsNotNone(response.data['updated_at'])
+
+    def test_cart_summary_without_cart(self):
+        user = User.objects.create_user(username='newuser', password='password')
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('cart-summary'))
+        self.assertEqual(response.data, {'item_count': 0, 'subtotal': '0.00', 'updated_at': None})
+
+    def test_async_cart_summary(self):
+        """
+        Ensure the async summary view returns the same totals.
+        """
+        product = Product.objects.create(owner=self.admin_user, name='Shirt', price=12.50, stock=10)
+        CartItem.objects.create(cart=Cart.objects.get(owner=self.user), product=product, quantity=2, price=25.00)
+        request = APIRequestFactory().get('/carts/summary/')
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(AsyncCartSummaryView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['item_count'], response.data['subtotal']), (2, '25.00'))
+
+    def test_cart_batch(self):
+        """
+        Ensure a batch of operations is applied in one transaction with bulk queries.
+        """
+        seller = User.objects.get(username='anotheruser')
+        products = [
+            Product.objects.create(owner=seller, name=f'Product {index}', price=10.00, stock=5)
+            for index in range(4)
+        ]
+        cart = Cart.objects.get(owner=self.user)
+        CartItem.objects.create(cart=cart, product=products[0], quantity=1, price=10.00)
+        CartItem.objects.create(cart=cart, product=products[1], quantity=1, price=10.00)
+        CartItem.objects.create(cart=cart, product=products[2], quantity=1, price=10.00)
+        self.client.force_authenticate(user=self.user)
+        operations = [
+            {'op': 'add', 'product': products[0].id, 'quantity': 2},
+            {'op': 'remove', 'product': products[1].id},
+            {'op': 'set_quantity', 'product': products[2].id, 'quantity': 4},
+            {'op': 'add', 'product': products[3].id, 'quantity': 1},
+            {'op': 'add', 'product': products[3].id, 'quantity': 1},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('cart-batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        product_reads = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "products_product"' in query['sql']
+        ]
+        self.assertEqual(len(product_reads), 2)  # the stock check and the serialized cart
+        quantities = dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {products[0].id: 3, products[2].id: 4, products[3].id: 2})
+        self.assertEqual(CartItem.objects.get(cart=cart, product=products[2]).price, 40)
+        self.assertEqual(len(response.data['items']), 3)
+
+    def test_cart_batch_is_all_or_nothing(self):
+        """
+        Ensure nothing is applied when one operation exceeds stock or misses its product.
+        """
+        seller = User.objects.get(username='anotheruser')
+        product = Product.objects.create(owner=seller, name='Product', price=10.00, stock=2)
+        self.client.force_authenticate(user=self.user)
+        operations = [
+            {'op': 'add', 'product': product.id, 'quantity': 2},
+            {'op': 'add', 'product': product.id, 'quantity': 1},
+            {'op': 'set_quantity', 'product': 999999, 'quantity': 1},
+        ]
+        response = self.client.post(reverse('cart-batch'), {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['operations'], [
+            {'quantity': ['Quantity exceeds stock.']},
+            {'quantity': ['Quantity exceeds stock.']},
+            {'product': ['Product not found.']},
+        ])
+        self.assertFalse(CartItem.objects.exists())
+
+        response = self.client.post(reverse('cart-batch'), {'operations': [{'op': 'add', 'product': product.id}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
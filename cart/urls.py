@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CartViewSet
+from django.conf import settings
+from .views import CartViewSet, AsyncCartSummaryView
 
 router = DefaultRouter()
 router.register(r'carts', CartViewSet)
@@ -8,3 +9,7 @@ router.register(r'carts', CartViewSet)
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Takes precedence over the viewset's `summary` action.
+    urlpatterns.insert(0, path('carts/summary/', AsyncCartSummaryView.as_view(), name='cart-summary'))
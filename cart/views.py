@@ -1,19 +1,30 @@
+from django.db import transaction
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from drf_api.async_views import AsyncAPIView
+from drf_api.fieldsets import SparseFieldset
+from drf_api.mixins import CachedObjectMixin, ConditionalGetMixin
 from drf_api.permissions import IsOwnerOrReadOnly
 from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
+from .batch import apply_cart_operations
+from .serializers import CartBatchSerializer, CartSerializer, CartItemSerializer, CartSummarySerializer
 from products.models import Product
 
-class CartViewSet(viewsets.ModelViewSet):
+EMPTY_CART_SUMMARY = {'item_count': 0, 'subtotal': 0, 'updated_at': None}
+
+def cart_summary_values(user):
+    return Cart.objects.filter(owner=user).with_totals().values('item_count', 'subtotal', 'updated_at')
+
+class CartViewSet(CachedObjectMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing cart instances.
     The viewset supports retrieving all carts, adding items to carts,
     removing items from carts, and updating the quantity of items in carts.
+    List and detail responses carry ETag and Last-Modified validators.
     """
-    queryset = Cart.objects.all()
+    queryset = Cart.objects.for_serializer()
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
 
@@ -22,9 +33,21 @@ class CartViewSet(viewsets.ModelViewSet):
         Retrieves the queryset for Cart instances. If the user is staff, they can see all carts.
         Regular users see only their own carts.
         """
+        queryset = Cart.objects.for_serializer(SparseFieldset.from_request(self.request))
         if self.request.user.is_staff:
-            return Cart.objects.all()
-        return Cart.objects.filter(owner=self.request.user)
+            return queryset
+        return queryset.filter(owner=self.request.user)
+
+    def get_validator_querysets(self):
+        carts = self.get_queryset()
+        if self.lookup_field in self.kwargs:
+            carts = carts.filter(pk=self.kwargs[self.lookup_field])
+        carts = carts.order_by().values('pk')
+        return [
+            (Cart.objects.filter(pk__in=carts), 'updated_at'),
+            (CartItem.objects.filter(cart__in=carts), None),
+            *Product.objects.filter(cartitem__cart__in=carts).validator_querysets(),
+        ]
 
     def perform_create(self, serializer):
         """
@@ -35,6 +58,35 @@ class CartViewSet(viewsets.ModelViewSet):
             raise serializers.ValidationError({'non_field_errors': ["A cart already exists for this user."]})
         serializer.save(owner=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Return the item count, subtotal and last update of the user's cart.
+
+        Meant for the badge in the page header: it costs a single aggregate
+        query and never loads the items. A user without a cart gets zeros.
+        """
+        totals = cart_summary_values(request.user).first() or EMPTY_CART_SUMMARY
+        return Response(CartSummarySerializer(totals).data)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply several add / remove / set_quantity operations to the user's cart.
+
+        All operations are checked against stock first; if any is invalid
+        nothing is changed and the errors are returned per operation.
+        Otherwise the updated cart is returned.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart, _ = Cart.objects.get_or_create(owner=request.user)
+        errors = apply_cart_operations(cart, serializer.validated_data['operations'])
+        if errors:
+            return Response({'operations': errors}, status=status.HTTP_400_BAD_REQUEST)
+        cart = Cart.objects.for_serializer().get(pk=cart.pk)
+        return Response(CartSerializer(cart, context={'request': request}).data)
+
     @action(detail=False, methods=['post'])
     def add_item(self, request):
         """
@@ -51,18 +103,23 @@ class CartViewSet(viewsets.ModelViewSet):
                 return Response({'detail': 'Invalid quantity provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
             try:
-                product = Product.objects.get(id=product_id)
+                product = Product.objects.for_serializer().with_available_stock(exclude_cart=cart).get(id=product_id)
             except Product.DoesNotExist:
                 return Response({'detail': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart, product=product, defaults={'quantity': quantity, 'price': product.price * quantity}
-            )
-
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.price = cart_item.quantity * product.price
-                cart_item.save()
+            with transaction.atomic():
+                cart_item, created = CartItem.objects.get_or_create(
+                    cart=cart, product=product, defaults={'quantity': quantity, 'price': product.price * quantity}
+                )
+                if not created:
+                    cart_item.quantity += quantity
+                    cart_item.price = cart_item.quantity * product.price
+                # Units held by other carts' checkouts are not available.
+                if cart_item.quantity > product.available_stock:
+                    transaction.set_rollback(True)
+                    return Response({'detail': 'Quantity exceeds stock.'}, status=status.HTTP_400_BAD_REQUEST)
+                if not created:
+                    cart_item.save()
 
             serializer = CartItemSerializer(cart_item, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -75,7 +132,9 @@ class CartViewSet(viewsets.ModelViewSet):
     def remove_item(self, request, pk=None):
         cart = self.get_object()
         item_id = request.data.get('item_id')
-        CartItem.objects.filter(id=item_id, cart=cart).delete()
+        deleted, _ = CartItem.objects.filter(id=item_id, cart=cart).delete()
+        if deleted:
+            cart.touch()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'])
@@ -85,8 +144,11 @@ class CartViewSet(viewsets.ModelViewSet):
         quantity = request.data.get('quantity')
 
         try:
-            cart_item = CartItem.objects.get(id=item_id, cart=cart)
-            if quantity > cart_item.product.stock:
+            cart_item = CartItem.objects.select_related('product').get(id=item_id, cart=cart)
+            available = Product.objects.with_available_stock(exclude_cart=cart).values_list(
+                'available_stock', flat=True
+            ).get(pk=cart_item.product_id)
+            if quantity > available:
                 return Response({'detail': 'Quantity exceeds stock.'}, status=status.HTTP_400_BAD_REQUEST)
             cart_item.quantity = quantity
             cart_item.price = cart_item.quantity * cart_item.product.price
@@ -94,3 +156,13 @@ class CartViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
         except CartItem.DoesNotExist:
             return Response({'detail': 'Item not found in cart.'}, status=status.HTTP_404_NOT_FOUND)
+
+class AsyncCartSummaryView(AsyncAPIView):
+    """
+    Async counterpart of `CartViewSet.summary`, served when ASYNC_VIEWS is on.
+    """
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        totals = await cart_summary_values(request.user).afirst() or EMPTY_CART_SUMMARY
+        return Response(CartSummarySerializer(totals).data)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_api.settings')
+# Route the I/O-bound endpoints to their async views (see ASYNC_VIEWS).
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,43 @@
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, for I/O-bound endpoints.
+
+    Served through `drf_api.asgi`, a request waiting on Stripe or the database
+    does not hold a worker: the event loop serves other requests meanwhile.
+    DRF's own request checks are synchronous, so authentication, permissions
+    and throttling run in a worker thread before the handler is awaited.
+    Handlers reach the database with the async ORM or `sync_to_async`, and
+    blocking client libraries with `sync_to_async(..., thread_sensitive=False)`.
+
+    Under WSGI the view still works; Django runs it in an event loop per request.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = await handler(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
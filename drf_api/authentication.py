@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from profiles.models import Profile
+
+USER_KEY = 'auth:user:{pk}'
+
+# The password hash is left out of the cache; the rare code that needs it
+# loads it on access.
+USER_FIELDS = [
+    field.attname for field in User._meta.concrete_fields if field.attname != 'password'
+]
+PROFILE_FIELDS = ['id', 'owner_id', 'image']
+
+
+def invalidate_cached_user(user_id):
+    """
+    Drop the cached authentication entry of a user, now and after commit.
+    """
+    key = USER_KEY.format(pk=user_id)
+    cache.delete(key)
+    # Deleting again after commit evicts an entry stored by a concurrent
+    # request that read the rows before this transaction committed.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def load_user(user_id):
+    """
+    Return the user with `user_id` and its profile's id and image, cache first.
+
+    The user and profile are read with one query on a cache miss and stored
+    for AUTH_USER_CACHE_TIMEOUT seconds under the user id. The signal
+    receivers in `profiles.signals` delete the entry whenever the user or
+    their profile is saved or deleted.
+
+    The profile is attached to the user with only its id, owner and image
+    loaded, which is what `CurrentUserSerializer` needs; other profile fields
+    are loaded from the database when first accessed.
+
+    Args:
+        user_id (int): The id of the user, from the token.
+
+    Returns:
+        User: The user, or None if there is no such user.
+    """
+    key = USER_KEY.format(pk=user_id)
+    entry = cache.get(key)
+    if entry is None:
+        user = User.objects.select_related('profile').filter(pk=user_id).first()
+        if user is None:
+            return None
+        profile = getattr(user, 'profile', None)
+        entry = {
+            'user': [getattr(user, name) for name in USER_FIELDS],
+            'profile': [getattr(profile, name) for name in PROFILE_FIELDS] if profile else None,
+        }
+        # Image fields come back as FieldFile; store the file name.
+        if profile:
+            entry['profile'][2] = profile.image.name
+        cache.set(key, entry, settings.AUTH_USER_CACHE_TIMEOUT)
+    return build_user(entry)
+
+
+def build_user(entry):
+    user = User.from_db('default', USER_FIELDS, entry['user'])
+    profile = None
+    if entry['profile'] is not None:
+        profile = Profile.from_db('default', PROFILE_FIELDS, entry['profile'])
+        Profile.owner.field.set_cached_value(profile, user)
+    User.profile.related.set_cached_value(user, profile)
+    return user
+
+
+class CachedJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    JWT cookie authentication that reads the token's user from the cache.
+
+    Behaves like `JWTCookieAuthentication`, except that the user and its
+    profile's id and image come from `load_user`, so most authenticated
+    requests do not query the database before reaching the view.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
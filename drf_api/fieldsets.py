@@ -0,0 +1,123 @@
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_field_paths(value):
+    """
+    Split a comma separated `?fields=` / `?omit=` value into dotted paths.
+    """
+    return {path.strip() for path in value.split(',') if path.strip()}
+
+
+class SparseFieldset:
+    """
+    The fields a read request asked for with `?fields=` and `?omit=`.
+
+    Both parameters take comma separated field names, with dots to reach into
+    nested serializers, e.g. `?fields=id,items.product.name` or
+    `?omit=profile,items.product.phone_number`. Naming a nested field in
+    `fields` keeps it whole; naming one of its fields keeps only those.
+    Unknown names are ignored.
+    """
+
+    def __init__(self, include=None, omit=()):
+        self.include = include
+        self.omit = set(omit)
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Build the fieldset of `request`; writes always use every field.
+        """
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        include = parse_field_paths(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+        return cls(include, parse_field_paths(params.get(OMIT_PARAM, '')))
+
+    @property
+    def is_sparse(self):
+        return self.include is not None or bool(self.omit)
+
+    def fields_at(self, path, names):
+        """
+        Filter the field `names` of the serializer found at `path`.
+
+        Args:
+            path (str): Dotted path of the serializer from the root, '' for the root.
+            names (iterable): The serializer's field names.
+
+        Returns:
+            list: The names to keep, in their original order.
+        """
+        prefix = f'{path}.' if path else ''
+        kept = []
+        for name in names:
+            full = prefix + name
+            if full in self.omit:
+                continue
+            if self.include is not None and not self._included(full):
+                continue
+            kept.append(name)
+        return kept
+
+    def wants(self, path):
+        """
+        Tell whether the nested field at `path` is part of the response at all.
+        """
+        parts = path.split('.')
+        return all(self.fields_at('.'.join(parts[:depth]), [parts[depth]]) for depth in range(len(parts)))
+
+    def _included(self, full):
+        # A requested ancestor keeps its whole subtree.
+        parts = full.split('.')
+        if any('.'.join(parts[:depth]) in self.include for depth in range(1, len(parts) + 1)):
+            return True
+        return any(item.startswith(f'{full}.') for item in self.include)
+
+
+def requested_fields(request, path, serializer_class):
+    """
+    Return the fields of `serializer_class` the request keeps at `path`.
+
+    Returns:
+        list: The kept field names, or None when the request is not sparse.
+    """
+    fieldset = SparseFieldset.from_request(request)
+    if not fieldset.is_sparse:
+        return None
+    return fieldset.fields_at(path, serializer_class.Meta.fields)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin dropping the fields a read request did not ask for.
+
+    The serializer works out its own dotted path from its parents, so the
+    same class honours `?fields=` / `?omit=` at the root and when nested.
+    Dropped fields are never evaluated.
+    """
+
+    @cached_property
+    def fields(self):
+        fields = super().fields
+        fieldset = SparseFieldset.from_request(self.context.get('request'))
+        if fieldset.is_sparse:
+            kept = set(fieldset.fields_at(self.fieldset_path, list(fields)))
+            for name in list(fields):
+                if name not in kept:
+                    fields.pop(name)
+        return fields
+
+    @property
+    def fieldset_path(self):
+        names = []
+        field = self
+        while field is not None:
+            if field.field_name:
+                names.append(field.field_name)
+            field = field.parent
+        return '.'.join(reversed(names))
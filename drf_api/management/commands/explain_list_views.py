@@ -0,0 +1,230 @@
+import re
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.mixins import ListModelMixin
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# Plan fragments that point at a full table scan or an explicit sort step,
+# per database vendor. Covering index scans are excluded in `flag_plan_line`.
+SEQUENTIAL_SCAN_MARKERS = {
+    'sqlite': ['SCAN '],
+    'postgresql': ['Seq Scan on'],
+    'mysql': ['type: ALL'],
+}
+FILESORT_MARKERS = {
+    'sqlite': ['USE TEMP B-TREE FOR ORDER BY'],
+    'postgresql': ['Sort Key:'],
+    'mysql': ['Using filesort'],
+}
+
+
+def iter_list_views(patterns=None, prefix=''):
+    """
+    Yield `(route, view callback)` for every routed DRF list view.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_list_views(pattern.url_patterns, prefix + str(pattern.pattern))
+            continue
+        if not isinstance(pattern, URLPattern):
+            continue
+        callback = pattern.callback
+        view_class = getattr(callback, 'cls', None)
+        if view_class is None or not issubclass(view_class, ListModelMixin):
+            continue
+        route = (prefix + str(pattern.pattern)).replace('^', '').replace('$', '')
+        actions = getattr(callback, 'actions', None)
+        if actions is not None and actions.get('get') != 'list':
+            continue
+        if actions is None and '<' in route:
+            continue
+        if 'format' in route:
+            continue
+        yield route, callback
+
+
+def sample_value(model, lookup):
+    """
+    Pick a realistic filter value for `lookup` on `model`.
+
+    Uses the first declared choice, then the first stored value, then '1'.
+    """
+    field = None
+    current = model
+    for part in lookup.split('__'):
+        try:
+            field = current._meta.get_field(part)
+        except FieldDoesNotExist:
+            return '1'
+        if field.is_relation:
+            current = field.related_model
+    if getattr(field, 'choices', None):
+        return field.choices[0][0]
+    value = model._default_manager.values_list(lookup, flat=True).exclude(**{lookup: None}).first()
+    return '1' if value is None else value
+
+
+def flag_plan_line(vendor, line):
+    """
+    Classify a single line of query plan output.
+
+    Returns:
+        str: 'sequential scan', 'filesort' or None.
+    """
+    if any(marker in line for marker in FILESORT_MARKERS.get(vendor, [])):
+        return 'filesort'
+    if any(marker in line for marker in SEQUENTIAL_SCAN_MARKERS.get(vendor, [])):
+        # SQLite reports a walk over a whole index as `SCAN ... USING INDEX`;
+        # only a covering index scan avoids touching every row. Virtual table
+        # scans (e.g. FTS5 MATCH) are answered by the module's own index.
+        if vendor == 'sqlite' and ('USING COVERING INDEX' in line or 'VIRTUAL TABLE INDEX' in line):
+            return None
+        # Scans of a derived table (`SCAN (subquery-1)`, or the `qualify`
+        # wrapper Django puts around window functions for sliced prefetches)
+        # read rows an inner, separately reported step already produced.
+        if vendor == 'sqlite' and re.search(r'SCAN (\(subquery-\d+\)|qualify\b)', line):
+            return None
+        return 'sequential scan'
+    return None
+
+
+def is_bounded(sql, flag):
+    """
+    Tell whether a flagged plan step is expected for the query's shape.
+
+    Sorting rows fetched by a literal `IN (...)` list (the shape of prefetch
+    queries) only sorts a page worth of rows, and a query without a WHERE
+    clause of its own (subqueries aside) reads the table by definition, so
+    neither is reported.
+    """
+    upper = sql.upper()
+    if flag == 'filesort':
+        return ' IN (' in upper
+    outer = upper
+    while True:
+        stripped = re.sub(r'\([^()]*\)', '', outer)
+        if stripped == outer:
+            break
+        outer = stripped
+    return ' WHERE ' not in outer
+
+
+class Command(BaseCommand):
+    """
+    Run EXPLAIN on the queries generated by every routed list view.
+
+    Each list view is requested without parameters, once per filterset field
+    (with a sample value), with a search term and with each ordering field.
+    Every SELECT the request runs is explained, and plan lines showing a
+    sequential scan or a filesort are reported unless the step is bounded by
+    the page size (see `is_bounded`). Run it against a database holding some
+    data: an empty table makes the list skip its main SELECT. Use `--fail-on-warning` to
+    make the command exit non-zero so it can gate changes.
+
+    On PostgreSQL sequential scans are disabled for the EXPLAIN so that a
+    reported `Seq Scan` means no usable index exists, even on small tables.
+    """
+    help = 'EXPLAIN the queries of every list view and flag sequential scans and filesorts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-warning', action='store_true',
+            help='Exit with an error if any query is flagged.',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print the full plan of every explained query.',
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQUENTIAL_SCAN_MARKERS:
+            raise CommandError(f'Query plans for {vendor} are not supported.')
+
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        factory = APIRequestFactory(HTTP_HOST=host)
+        # A transient superuser lets user-scoped views build their querysets.
+        user = User(pk=0, username='explain', is_staff=True, is_superuser=True)
+        warnings = 0
+        for route, callback in iter_list_views():
+            view_class = callback.cls
+            path = '/' + route
+            for params in self.scenarios(view_class):
+                request = factory.get(path, params)
+                force_authenticate(request, user=user)
+                label = f"{path}?{'&'.join(f'{k}={v}' for k, v in params.items())}".rstrip('?')
+                for sql in self.capture_selects(callback, request):
+                    flags = self.explain(vendor, sql, options['verbose_plans'])
+                    for flag, line in flags:
+                        warnings += 1
+                        self.stdout.write(self.style.WARNING(f'{label}: {flag}: {line.strip()}'))
+                        self.stdout.write(f'    {sql[:300]}')
+
+        if warnings:
+            message = f'{warnings} query plan warning(s).'
+            if options['fail_on_warning']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans or filesorts found.'))
+
+    def scenarios(self, view_class):
+        """
+        Build the query parameter sets to explain for a list view.
+        """
+        queryset = getattr(view_class, 'queryset', None)
+        model = queryset.model if queryset is not None else None
+        yield {}
+        if model is not None:
+            for field in getattr(view_class, 'filterset_fields', None) or []:
+                yield {field: sample_value(model, field)}
+        backends = getattr(view_class, 'filter_backends', None) or []
+        if any(hasattr(backend, 'search_param') for backend in backends):
+            yield {'search': 'term'}
+        for field in getattr(view_class, 'ordering_fields', None) or []:
+            if field != '__all__':
+                yield {'ordering': field}
+
+    def capture_selects(self, callback, request):
+        """
+        Run the view and return the SQL of every SELECT it issued.
+
+        The request runs inside a transaction that is always rolled back.
+        """
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                callback(request)
+            transaction.set_rollback(True)
+        return [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def explain(self, vendor, sql, verbose):
+        """
+        EXPLAIN a captured query.
+
+        Returns:
+            list: `(flag, plan line)` pairs for the flagged lines of the plan.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            if vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            rows = cursor.fetchall()
+        lines = [' '.join(str(column) for column in row) for row in rows]
+        if verbose:
+            self.stdout.write(sql)
+            for line in lines:
+                self.stdout.write(f'    {line}')
+        return [
+            (flag, line) for line in lines
+            if (flag := flag_plan_line(vendor, line)) and not is_bounded(sql, flag)
+        ]
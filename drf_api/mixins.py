@@ -0,0 +1,90 @@
+import hashlib
+from django.db.models import Count, DateTimeField, Max, Sum, Value
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Answer `If-None-Match` / `If-Modified-Since` on `list` and `retrieve` with 304.
+
+    Views return the querysets their payload is built from in
+    `get_validator_querysets`, each paired with its timestamp field (or None).
+    The latest timestamp, row count and id sum of each queryset feed the
+    validators, so a repeat request never runs the serializer:
+
+    - the ETag hashes those aggregates with the full path, the user and the
+      media type, so added, changed and deleted rows all change it;
+    - Last-Modified is the latest timestamp. A deleted row does not move it,
+      which is why If-None-Match takes precedence when both are sent.
+    """
+
+    def get_validator_querysets(self):
+        """
+        Return `(queryset, timestamp field)` pairs describing the response.
+        """
+        raise NotImplementedError('Views using ConditionalGetMixin must define get_validator_querysets().')
+
+    def get_validators(self, request):
+        """
+        Compute the ETag and Last-Modified validators of the current request.
+
+        The per-queryset aggregates are combined with UNION ALL, so the
+        validators always cost a single query.
+
+        Returns:
+            tuple: The quoted ETag and the last modification time (or None).
+        """
+        parts = [request.get_full_path(), str(request.user.pk), str(request.accepted_media_type)]
+        summaries = []
+        for position, (queryset, timestamp_field) in enumerate(self.get_validator_querysets()):
+            last = Max(timestamp_field) if timestamp_field else Value(None, output_field=DateTimeField())
+            summaries.append(
+                queryset.order_by().values(position=Value(position)).annotate(
+                    count=Count('pk'), ids=Sum('pk'), last=last,
+                ).values_list('position', 'count', 'ids', 'last')
+            )
+        rows = sorted(summaries[0].union(*summaries[1:], all=True)) if summaries else []
+        last_modified = max((row[3] for row in rows if row[3] is not None), default=None)
+        parts.extend(f'{count}:{ids}:{last}' for _, count, ids, last in rows)
+        etag = quote_etag(hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        elif response.status_code != 304:
+            return response
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class CachedObjectMixin:
+    """
+    Load the object of a detail request once per request.
+
+    `IsOwnerOrReadOnly.has_permission` calls `get_object()` for detail
+    actions, DRF calls it again in `retrieve` / `update` / `destroy`, and some
+    `perform_update` hooks call it a third time. The first call fetches the
+    object (through `get_queryset`, so with its related rows) and runs the
+    object permission checks; later calls on the same view return that
+    instance.
+    """
+
+    def get_object(self):
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
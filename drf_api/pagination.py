@@ -0,0 +1,163 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over `(created_at, id)`.
+
+    Each page is fetched with a `WHERE (created_at, id) < (cursor)` condition
+    instead of an OFFSET, and no COUNT(*) is run, so every page costs the same
+    as the first one when `(created_at, id)` is indexed. Feeds are ordered
+    newest first unless the queryset is explicitly ordered by `created_at`.
+
+    Search results ordered by relevance (`-search_rank`, see
+    products/search.py) are paginated over `(search_rank, created_at, id)`
+    instead, so pages keep their relevance order.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    rank_field = 'search_rank'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        order_by = queryset.query.order_by
+        self.ranked = bool(order_by) and order_by[0] == f'-{self.rank_field}'
+        self.descending = self.ranked or not (order_by and order_by[0] == 'created_at')
+        cursor = self.decode_cursor(request)
+        if cursor and ('s' in cursor) != self.ranked:
+            raise NotFound(self.invalid_cursor_message)
+
+        # Walking backwards flips both the comparison and the ordering; the
+        # page is reversed again below so results always read in feed order.
+        reverse = cursor['r'] if cursor else False
+        newest_first = self.descending != reverse
+        prefix = '-' if newest_first else ''
+        keys = [(self.rank_field, 's')] if self.ranked else []
+        keys += [('created_at', 'c'), ('id', 'i')]
+        queryset = queryset.order_by(*(f'{prefix}{field}' for field, _ in keys))
+        if cursor:
+            lookup = 'lt' if newest_first else 'gt'
+            condition = Q()
+            for index, (field, key) in enumerate(keys):
+                equal = {previous: cursor[previous_key] for previous, previous_key in keys[:index]}
+                condition |= Q(**equal, **{f'{field}__{lookup}': cursor[key]})
+            queryset = queryset.filter(condition)
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.next_item = self.previous_item = None
+        if page:
+            if has_more or reverse:
+                self.next_item = page[-1]
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_item = page[0]
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_item is None:
+            return None
+        return self.encode_cursor(self.next_item, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_item is None:
+            return None
+        return self.encode_cursor(self.previous_item, reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        """
+        Build the URL of the page before or after `obj`.
+        """
+        cursor = {'c': obj.created_at.isoformat(), 'i': obj.pk, 'r': reverse}
+        if self.ranked:
+            cursor['s'] = getattr(obj, self.rank_field)
+        payload = json.dumps(cursor)
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """
+        Parse the cursor query parameter.
+
+        Returns:
+            dict: The `created_at`, `id`, direction and, for ranked results,
+            `search_rank` of the cursor, or None on the first page.
+
+        Raises:
+            NotFound: If the cursor cannot be decoded.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            decoded = {
+                'c': datetime.fromisoformat(cursor['c']),
+                'i': int(cursor['i']),
+                'r': bool(cursor['r']),
+            }
+            if 's' in cursor:
+                decoded['s'] = float(cursor['s'])
+            return decoded
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination with opt-in keyset pagination.
+
+    Requests carrying `?pagination=cursor` (or a `cursor` parameter from a
+    previous keyset page) are paginated with KeysetPagination; all others
+    keep the default `count`/`next`/`previous` page number format.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        ):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
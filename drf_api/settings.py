@@ -1,4 +1,6 @@
 import os
+from django.core.exceptions import ImproperlyConfigured
+from datetime import timedelta
 import dj_database_url
 from pathlib import Path
 from corsheaders.defaults import default_headers
@@ -11,6 +13,15 @@ if os.path.exists('env.py'):
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+# Stripe HTTP client, see drf_api/stripe_gateway.py. STRIPE_API_BASE points
+# the client at another server, e.g. benchmarks/fake_stripe.py.
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get('STRIPE_CONNECT_TIMEOUT', 3.05))
+STRIPE_READ_TIMEOUT = float(os.environ.get('STRIPE_READ_TIMEOUT', 20))
+STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get('STRIPE_MAX_NETWORK_RETRIES', 2))
+STRIPE_HTTP_POOL_SIZE = int(os.environ.get('STRIPE_HTTP_POOL_SIZE', 10))
+# Invoice items of one invoice created in parallel; keep it within the pool.
+STRIPE_INVOICE_ITEM_CONCURRENCY = int(os.environ.get('STRIPE_INVOICE_ITEM_CONCURRENCY', 8))
 
 
 
@@ -57,6 +68,9 @@ INSTALLED_APPS = [
     'orders',
     'cart',
     'reviews',
+    'jobs',
+    'outbox',
+    'drf_api',
     'django_extensions',
 ]
 
@@ -173,7 +187,15 @@ CLOUDINARY_STORAGE = {
     'CLOUDINARY_URL': os.environ.get('CLOUDINARY_URL')
 }
 MEDIA_URL = '/media/'
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# Uploaded images and their renditions are stored on Cloudinary. With
+# MEDIA_STORAGE=local they go to MEDIA_ROOT instead, served by the
+# development server, so the image pipeline runs without Cloudinary.
+LOCAL_MEDIA = os.environ.get('MEDIA_STORAGE') == 'local'
+if LOCAL_MEDIA:
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+else:
+    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -183,6 +205,8 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Messages per second sent by `manage.py send_outbox`.
+EMAIL_OUTBOX_RATE_LIMIT = float(os.environ.get('EMAIL_OUTBOX_RATE_LIMIT', 5))
 
 MAILJET_API_KEY = os.environ.get('MJ_APIKEY_PUBLIC')
 MAILJET_API_SECRET = os.environ.get('MJ_APIKEY_PRIVATE')
@@ -202,7 +226,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication'
         if DEV
-        else 'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
+        else 'drf_api.authentication.CachedJWTCookieAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -218,5 +242,46 @@ REST_AUTH_SERIALIZERS = {
     'USER_DETAILS_SERIALIZER': 'drf_api.serializers.CurrentUserSerializer'
 }
 
+# Seconds before a worker rebuilds its in-memory product suggestion index,
+# bounding how long changes made by other workers can be missing from it.
+SUGGEST_INDEX_MAX_AGE = int(os.environ.get('SUGGEST_INDEX_MAX_AGE', 300))
+
+# Cached product responses and JWT users are invalidated by signals, so every
+# worker must share one cache in production: a per-process cache would keep
+# serving what another worker invalidated. Only development may run without it.
+if 'REDIS_URL' not in os.environ and not DEV:
+    raise ImproperlyConfigured('REDIS_URL must be set unless DEV=1.')
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Upper bound, in seconds, on how long a cached product list or detail
+# response is served; signals normally replace it much sooner.
+PRODUCT_CACHE_TIMEOUT = int(os.environ.get('PRODUCT_CACHE_TIMEOUT', 300))
+# Serve the async implementations of the I/O-bound endpoints (checkout,
+# contact form, Stripe webhook, cart summary). On by default when served
+# through drf_api.asgi; under WSGI the sync views are cheaper.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+# Upper bound, in seconds, on how long the user and profile resolved from a
+# JWT are served from the cache; signals normally drop them much sooner.
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))
+# How long stock stays held for a cart after it starts a checkout. Stripe
+# checkout sessions expire with the holds, and Stripe refuses an expiry less
+# than 30 minutes away, so the TTL keeps a margin above that.
+STRIPE_CHECKOUT_MIN_EXPIRY = timedelta(minutes=30)
+STOCK_RESERVATION_TTL = timedelta(minutes=int(os.environ.get('STOCK_RESERVATION_TTL_MINUTES', 35)))
+if STOCK_RESERVATION_TTL < STRIPE_CHECKOUT_MIN_EXPIRY + timedelta(minutes=1):
+    raise ImproperlyConfigured('STOCK_RESERVATION_TTL_MINUTES must be at least 31.')
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
@@ -0,0 +1,121 @@
+import threading
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_client():
+    """
+    Build a Stripe client on a keep-alive connection pool.
+
+    The pool is shared by every thread of the process, so concurrent calls
+    reuse warm TLS connections instead of opening one per request. Network
+    errors are retried by the Stripe library (with the idempotency key of
+    the request, so a retried POST is not applied twice).
+
+    Returns:
+        stripe.StripeClient: A client configured from the STRIPE_* settings.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE, pool_block=False,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    http_client = stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT), session=session,
+    )
+    base_addresses = {'api': settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else {}
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        http_client=http_client,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        base_addresses=base_addresses,
+    )
+
+
+def get_client():
+    """
+    Return the process-wide Stripe client, building it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_client()
+    return _client
+
+
+def reset_client():
+    """
+    Drop the process-wide client, e.g. after the STRIPE_* settings changed.
+    """
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def request_options(idempotency_key):
+    """
+    Request options sending `idempotency_key`, namespaced to this app.
+
+    Keys are derived from our own ids (e.g. the order number), so retrying
+    the same operation, from a job retry or a network retry, returns the
+    original Stripe object instead of creating a second one.
+    """
+    return {'idempotency_key': f'trade-corner:{idempotency_key}'}
+
+
+def create_checkout_session(line_items, metadata, success_url, cancel_url, idempotency_key, expires_at=None):
+    params = {
+        'payment_method_types': ['card'],
+        'line_items': line_items,
+        'mode': 'payment',
+        'success_url': success_url,
+        'cancel_url': cancel_url,
+        'metadata': metadata,
+    }
+    if expires_at:
+        params['expires_at'] = expires_at
+    return get_client().checkout.sessions.create(params=params, options=request_options(idempotency_key))
+
+
+def create_customer(email, name, address, idempotency_key):
+    params = {'email': email, 'name': name}
+    if address:
+        params['address'] = address
+    return get_client().customers.create(params=params, options=request_options(idempotency_key))
+
+
+def create_invoice_item(customer_id, amount, description, idempotency_key):
+    return get_client().invoice_items.create(params={
+        'customer': customer_id,
+        'amount': amount,
+        'currency': 'usd',
+        'description': description,
+    }, options=request_options(idempotency_key))
+
+
+def create_invoice(customer_id, metadata, idempotency_key):
+    return get_client().invoices.create(params={
+        'customer': customer_id,
+        'collection_method': 'send_invoice',
+        'days_until_due': 30,
+        'pending_invoice_items_behavior': 'include',
+        'metadata': metadata,
+    }, options=request_options(idempotency_key))
+
+
+def finalize_invoice(invoice_id, idempotency_key):
+    return get_client().invoices.finalize_invoice(invoice_id, options=request_options(idempotency_key))
+
+
+def create_refund(payment_intent_id, metadata, idempotency_key):
+    return get_client().refunds.create(params={
+        'payment_intent': payment_intent_id,
+        'metadata': metadata,
+    }, options=request_options(idempotency_key))
@@ -1,9 +1,38 @@
-from django.core.mail import send_mail
+from django.core import mail
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from asgiref.sync import async_to_sync
+from unittest import skipUnless
 from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from io import StringIO
+from django.utils import timezone
+from products.models import Product, StockReservation
+from products.search import get_search_backend
+from products.stock import reserve_stock
+from orders.models import Order, OrderItem
+from orders.views import create_stripe_invoice
+from reviews.models import Review
+from cart.models import Cart, CartItem
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from drf_api.fieldsets import SparseFieldset
+from outbox.models import OutgoingEmail
+from benchmarks.fake_stripe import FakeStripeServer
+from drf_api import stripe_gateway
+from django.test import override_settings
+from django.core.cache import cache
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+from drf_api.authentication import CachedJWTCookieAuthentication, load_user
+from drf_api.views import AsyncCheckoutSessionView, AsyncContactUsView
+from profiles.models import Profile
+from datetime import timedelta
 import os
+import stripe
+import time
 
 class ContactUsViewTests(APITestCase):
     def setUp(self):
@@ -19,22 +48,18 @@ class ContactUsViewTests(APITestCase):
             'message': ''
         }
 
-    @patch('drf_api.views.send_mail')
-    def test_contact_us_view_success(self, mock_send_mail):
+    def test_contact_us_view_success(self):
         """
-        Test successful contact form submission and email sending.
+        Test successful contact form submission queues the email.
         """
-        mock_send_mail.return_value = 1  # Mock a successful email send
         response = self.client.post(self.url, self.valid_payload, format='json')
 
-        # Ensure send_mail was called with the right parameters
-        mock_send_mail.assert_called_once_with(
-            'New Contact Form Submission from John Doe',
-            'Message from John Doe (john.doe@example.com):\n\nThis is a test message.',
-            'john.doe@example.com',
-            [os.environ.get('EMAIL_HOST_USER')],
-            fail_silently=False,
-        )
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.subject, 'New Contact Form Submission from John Doe')
+        self.assertEqual(email.body, 'Message from John Doe (john.doe@example.com):\n\nThis is a test message.')
+        self.assertEqual(email.from_email, 'john.doe@example.com')
+        self.assertEqual(email.recipients, [address for address in [os.environ.get('EMAIL_HOST_USER')] if address])
+        self.assertEqual(len(mail.outbox), 0)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['detail'], 'Message sent successfully.')
@@ -45,3 +70,588 @@ class ContactUsViewTests(APITestCase):
         """
         response = self.client.post(self.url, self.invalid_payload, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.products = [
+            Product.objects.create(owner=self.user, name=f'Product {i}', price=10.00, stock=1)
+            for i in range(25)
+        ]
+        # Give a run of products the same timestamp so ties are broken by id.
+        Product.objects.filter(pk__in=[p.pk for p in self.products[5:15]]).update(
+            created_at=timezone.now()
+        )
+        self.expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids, response
+
+    def test_cursor_mode_walks_every_row_once_in_order(self):
+        """
+        Test that following `next` links visits every product once, newest first.
+        """
+        ids, _ = self.collect('/products/?pagination=cursor')
+        self.assertEqual(ids, self.expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        """
+        Test that the `previous` link of a page returns the page before it.
+        """
+        first = self.client.get('/products/?pagination=cursor')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']],
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_cursor_mode_honours_ascending_ordering(self):
+        """
+        Test that `?ordering=created_at` walks the feed oldest first.
+        """
+        ids, _ = self.collect('/products/?pagination=cursor&ordering=created_at')
+        self.assertEqual(ids, list(reversed(self.expected)))
+
+    def test_page_number_mode_is_default(self):
+        """
+        Test that requests without the opt-in keep page number pagination.
+        """
+        response = self.client.get('/products/')
+        self.assertEqual(response.data['count'], 25)
+
+    def test_cursor_mode_keeps_search_relevance_order(self):
+        """
+        Test that cursor pages of a search follow relevance, then recency.
+        """
+        for count, product in enumerate(self.products[::3], start=1):
+            product.description = ' '.join(['product'] * count)
+            product.save()
+        expected = list(
+            get_search_backend().search(Product.objects.all(), 'product')
+            .order_by('-search_rank', '-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertNotEqual(expected, self.expected)
+
+        ids, _ = self.collect('/products/?pagination=cursor&search=product')
+        self.assertEqual(ids, expected)
+
+        first = self.client.get('/products/?pagination=cursor&search=product')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']],
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL ranks are reals, see PostgresProductSearch.')
+    def test_ranked_cursor_round_trips_postgres_ranks(self):
+        """
+        Test that every search rank read from PostgreSQL filters back to its own row.
+        """
+        for count, product in enumerate(self.products, start=1):
+            product.description = ' '.join(['product'] * (count % 7 + 1)) + ' filler' * count
+            product.save()
+        ranked = get_search_backend().search(Product.objects.all(), 'product')
+        for product_id, rank in ranked.values_list('id', 'search_rank'):
+            self.assertIn(product_id, ranked.filter(search_rank=rank).values_list('id', flat=True))
+
+        ids, _ = self.collect('/products/?pagination=cursor&search=product')
+        self.assertEqual(ids, list(ranked.order_by('-search_rank', '-created_at', '-id').values_list('id', flat=True)))
+
+    def test_feed_cursor_is_refused_for_search_results(self):
+        """
+        Test that a cursor taken from the unranked feed is not applied to ranked results.
+        """
+        cursor = self.client.get('/products/?pagination=cursor').data['next'].split('cursor=')[1]
+        response = self.client.get(f'/products/?search=product&cursor={cursor}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor returns 404.
+        """
+        response = self.client.get('/products/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExplainListViewsCommandTests(APITestCase):
+    def setUp(self):
+        for i in range(3):
+            user = User.objects.create_user(username=f'user{i}', password='password')
+            Product.objects.create(owner=user, name=f'Product {i}', price=10.00, stock=1, category='men')
+            Order.objects.create(owner=user, total_price=10.00, status='Pending')
+
+    def test_filtered_lists_use_indexes(self):
+        """
+        Test that the filter + ordering combinations of products and orders are index-backed.
+        """
+        out = StringIO()
+        call_command('explain_list_views', stdout=out)
+        flagged = [line for line in out.getvalue().splitlines() if 'scan:' in line or 'filesort:' in line]
+        for filter_name in ['category=', 'size=', 'owner__profile=', 'status=', 'total_price=', 'owner__username=']:
+            self.assertFalse(
+                [line for line in flagged if filter_name in line],
+                f'{filter_name} query plan was flagged',
+            )
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.product = Product.objects.create(owner=self.user, name='Product', price=10.00, stock=5)
+        self.client.force_authenticate(self.user)
+
+    def assertNotModified(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+        return response
+
+    def test_product_detail_answers_if_none_match_and_if_modified_since(self):
+        url = f'/products/{self.product.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.assertNotModified(url, if_none_match=etag)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertTrue(all('SUM(' in query['sql'] for query in queries))
+        self.assertNotModified(url, if_modified_since=response['Last-Modified'])
+
+        Review.objects.create(product=self.product, owner=self.user, rating=5, comment='great')
+        response = self.client.get(url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['review_count'], 1)
+
+    def test_validators_follow_profile_and_deletions(self):
+        url = f'/profiles/{self.user.profile.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, if_none_match=etag)
+
+        self.product.delete()
+        response = self.client.get(url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['products_count'], 0)
+        self.assertEqual(response.data['latest_products'], [])
+
+    def test_validators_are_per_user(self):
+        url = f'/profiles/{self.user.profile.id}/'
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password'))
+        response = self.client.get(url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_owner'])
+
+    def test_order_history(self):
+        order = Order.objects.create(owner=self.user, total_price=10.00)
+        etag = self.client.get('/order-history/')['ETag']
+        self.assertNotModified('/order-history/', if_none_match=etag)
+
+        order.status = 'Shipped'
+        order.save()
+        response = self.client.get('/order-history/', headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cart_item_changes_change_the_cart_validators(self):
+        cart = Cart.objects.create(owner=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.product, quantity=1, price=10.00)
+        for url in ['/carts/', f'/carts/{cart.id}/']:
+            etag = self.client.get(url)['ETag']
+            self.assertNotModified(url, if_none_match=etag)
+
+            response = self.client.post(
+                f'/carts/{cart.id}/update_quantity/', {'item_id': item.id, 'quantity': item.quantity + 1},
+                format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            item.refresh_from_db()
+            response = self.client.get(url, headers={'if_none_match': etag})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.product = Product.objects.create(
+            owner=self.user, name='Product', description='Long text', price=10.00, stock=5
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_fields_at_resolves_nested_paths(self):
+        fieldset = SparseFieldset({'id', 'items.product.name', 'profile'}, {'profile.reviews'})
+        self.assertEqual(fieldset.fields_at('', ['id', 'owner', 'items', 'profile']), ['id', 'items', 'profile'])
+        self.assertEqual(fieldset.fields_at('items', ['id', 'product', 'quantity']), ['product'])
+        self.assertEqual(fieldset.fields_at('items.product', ['id', 'name', 'price']), ['name'])
+        self.assertEqual(fieldset.fields_at('profile', ['city', 'products', 'reviews']), ['city', 'products'])
+        self.assertTrue(fieldset.wants('profile.products'))
+        self.assertFalse(fieldset.wants('profile.reviews'))
+        self.assertFalse(fieldset.wants('owner'))
+
+    def test_product_list_renders_and_selects_only_requested_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/products/', {'fields': 'id,name,price,image'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name', 'price', 'image'])
+        select = queries[-1]['sql']
+        self.assertNotIn('auth_user', select)
+        self.assertNotIn('"description"', select)
+
+        response = self.client.get('/products/', {'omit': 'description,phone_number,is_owner'})
+        item = response.data['results'][0]
+        self.assertNotIn('description', item)
+        self.assertNotIn('is_owner', item)
+        self.assertEqual(item['owner'], 'testuser')
+
+    def test_nested_fields_and_omitted_relations(self):
+        cart = Cart.objects.create(owner=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1, price=10.00)
+        response = self.client.get(f'/carts/{cart.id}/', {'fields': 'id,items.quantity,items.product.name'})
+        self.assertEqual(response.data, {'id': cart.id, 'items': [{'product': {'name': 'Product'}, 'quantity': 1}]})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/carts/{cart.id}/', {'omit': 'items'})
+        self.assertNotIn('items', response.data)
+        self.assertFalse(any('cart_cartitem' in query['sql'] and 'SUM(' not in query['sql'] for query in queries))
+
+        Order.objects.create(owner=self.user, total_price=10.00)
+        response = self.client.get('/order-history/', {'omit': 'profile,items'})
+        self.assertEqual(
+            list(response.data['results'][0]),
+            ['id', 'order_number', 'owner', 'total_price', 'created_at', 'updated_at', 'status'],
+        )
+
+    def test_writes_ignore_sparse_parameters(self):
+        response = self.client.patch(
+            f'/products/{self.product.id}/?fields=id', {'name': 'Renamed'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Renamed')
+
+
+class StripeGatewayTests(APITestCase):
+    """
+    Run the Stripe calls against the fake Stripe server of the benchmarks.
+    """
+
+    def setUp(self):
+        self.server = FakeStripeServer().start()
+        overrides = override_settings(STRIPE_API_BASE=self.server.url, STRIPE_SECRET_KEY='sk_test_fake')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.server.stop)
+        self.addCleanup(stripe_gateway.reset_client)
+        stripe_gateway.reset_client()
+
+        self.user = User.objects.create_user(username='buyer', password='password')
+        self.product = Product.objects.create(owner=self.user, name='Shirt', price=12.50, stock=5)
+        self.cart = Cart.objects.create(owner=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, price=25)
+
+    def test_checkout_session_is_idempotent_per_cart_state(self):
+        """
+        Ensure a double submitted checkout returns the same session.
+        """
+        self.client.force_authenticate(user=self.user)
+        url = reverse('create-checkout-session')
+        first = self.client.post(url, {'cart_id': self.cart.id}, format='json')
+        second = self.client.post(url, {'cart_id': self.cart.id}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertTrue(first.data['id'].startswith('cs_test_'))
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(self.server.stats['requests'], 1)
+        reservation = StockReservation.objects.get()
+        self.assertEqual((reservation.cart, reservation.product, reservation.quantity), (self.cart, self.product, 2))
+
+    def test_price_change_between_submits_gets_a_new_session(self):
+        """
+        Ensure a price changed between two submits of the same cart does not reuse the idempotency key.
+        """
+        self.client.force_authenticate(user=self.user)
+        url = reverse('create-checkout-session')
+        first = self.client.post(url, {'cart_id': self.cart.id}, format='json')
+        Product.objects.filter(pk=self.product.pk).update(price=15.00)
+        second = self.client.post(url, {'cart_id': self.cart.id}, format='json')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(second.data['id'], first.data['id'])
+        self.assertEqual(self.server.stats['requests'], 2)
+
+    def test_checkout_session_expires_with_the_holds(self):
+        """
+        Ensure the session expires with the holds, and renewed holds get a new session.
+        """
+        self.client.force_authenticate(user=self.user)
+        url = reverse('create-checkout-session')
+        first = self.client.post(url, {'cart_id': self.cart.id}, format='json').data['id']
+        reservation = StockReservation.objects.get()
+        self.assertEqual(self.server.objects[first]['expires_at'], int(reservation.expires_at.timestamp()))
+
+        # Holds too close to expiry for Stripe are renewed before the next checkout.
+        later = timezone.now() + timedelta(minutes=6)
+        with patch('django.utils.timezone.now', return_value=later):
+            second = self.client.post(url, {'cart_id': self.cart.id}, format='json')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(second.data['id'], first)
+        reservation = StockReservation.objects.get()
+        self.assertGreater(reservation.expires_at, later + timedelta(minutes=30))
+        self.assertEqual(self.server.objects[second.data['id']]['expires_at'], int(reservation.expires_at.timestamp()))
+
+    def test_fake_server_refuses_a_reused_key_with_other_params(self):
+        session = dict(
+            line_items=[], success_url='https://example.com/s', cancel_url='https://example.com/c',
+            idempotency_key='checkout:reused',
+        )
+        stripe_gateway.create_checkout_session(metadata={'cart_id': 1}, **session)
+        with self.assertRaises(stripe.IdempotencyError):
+            stripe_gateway.create_checkout_session(metadata={'cart_id': 2}, **session)
+        with self.assertRaises(stripe.InvalidRequestError):
+            stripe_gateway.create_checkout_session(
+                metadata={'cart_id': 3}, expires_at=int(time.time()) + 29 * 60,
+                **{**session, 'idempotency_key': 'checkout:short'},
+            )
+
+    def test_checkout_without_stock_is_refused(self):
+        """
+        Ensure no checkout session is created when other carts hold the stock.
+        """
+        rival = Cart.objects.create(owner=User.objects.create_user(username='rival', password='password'))
+        reserve_stock(rival, {self.product.pk: 4})
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('create-checkout-session'), {'cart_id': self.cart.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['products'], [self.product.pk])
+        self.assertEqual(self.server.stats['requests'], 0)
+
+    def test_invoice_calls_reuse_one_connection(self):
+        """
+        Ensure the invoice calls share a keep-alive connection and retry safely.
+        """
+        order = Order.objects.create(owner=self.user, total_price=25)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, price=25)
+        details = {'email': 'buyer@example.com', 'name': 'Buyer', 'address': None}
+
+        url = create_stripe_invoice(details, order)
+        self.assertTrue(url.startswith(f'{self.server.url}/invoices/in_'))
+        self.assertEqual(self.server.stats, {'connections': 1, 'requests': 4})
+        invoice = self.server.objects[url.rsplit('/', 1)[1]]
+        self.assertEqual(invoice['amount_due'], 2500)
+        self.assertEqual(invoice['metadata'], {'order_number': order.order_number})
+
+        self.assertEqual(create_stripe_invoice(details, order), url)
+        self.assertEqual(self.server.stats['requests'], 4)
+
+    def test_invoice_items_are_created_concurrently(self):
+        """
+        Ensure invoice lines are submitted in parallel and the stage timings are logged.
+        """
+        self.server.latency = 0.05
+        order = Order.objects.create(owner=self.user, total_price=80)
+        for index in range(8):
+            product = Product.objects.create(owner=self.user, name=f'Item {index}', price=10, stock=5)
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=10)
+        details = {'email': 'buyer@example.com', 'name': 'Buyer', 'address': None}
+
+        with self.assertLogs('orders.views', level='INFO') as logs:
+            url = create_stripe_invoice(details, order)
+
+        invoice = self.server.objects[url.rsplit('/', 1)[1]]
+        self.assertEqual(invoice['amount_due'], 8000)
+        # Sequential calls never have more than one request in flight.
+        self.assertGreater(self.server.peak_in_flight, 1)
+        self.assertRegex(logs.output[0], r'\(8 items\) took customer [\d.]+ms, items [\d.]+ms, invoice')
+
+
+class CachedObjectTests(APITestCase):
+    """
+    Detail requests load their object once, although the permission check,
+    DRF and perform_update all ask for it.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.product = Product.objects.create(owner=self.user, name='Shirt', price=10, stock=5)
+        self.review = Review.objects.create(owner=self.user, product=self.product, rating=4, comment='Good')
+        self.order = Order.objects.create(owner=self.user, total_price=10)
+        self.client.force_authenticate(user=self.user)
+
+    def object_loads(self, queries, table, pk):
+        return [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+            and (f'"{table}"."id" = {pk}' in query['sql'])
+        ]
+
+    def test_review_update_loads_review_once(self):
+        url = reverse('review-detail', args=[self.review.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'comment': 'Great'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The view's load, and the locked read of the stored rating by reviews.signals.
+        self.assertEqual(len(self.object_loads(queries, 'reviews_review', self.review.id)), 2)
+
+    def test_product_update_loads_product_once(self):
+        url = reverse('product-detail', args=[self.product.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'stock': 4}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.object_loads(queries, 'products_product', self.product.id)), 1)
+
+    def test_order_update_loads_order_once(self):
+        url = reverse('order-detail', args=[self.order.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'status': 'Processing'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.object_loads(queries, 'orders_order', self.order.id)), 1)
+
+    def test_other_users_are_still_refused(self):
+        other = User.objects.create_user(username='other', password='password')
+        self.client.force_authenticate(user=other)
+        response = self.client.patch(reverse('review-detail', args=[self.review.id]), {'comment': 'Mine'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+# Views copy DEFAULT_AUTHENTICATION_CLASSES when they are defined, so the
+# production class is patched in rather than set with override_settings.
+@patch.object(APIView, 'authentication_classes', [CachedJWTCookieAuthentication])
+class CachedJWTAuthenticationTests(APITestCase):
+    """
+    The user of a JWT, with its profile id and image, comes from the cache
+    until the user or profile changes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='password')
+        self.url = '/dj-rest-auth/user/'
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries
+
+    def test_repeated_requests_do_not_query_the_user(self):
+        first, queries = self.get_user()
+        self.assertEqual(len(queries), 1)
+        second, queries = self.get_user()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.data['profile_id'], self.user.profile.id)
+        self.assertTrue(second.data['profile_image'])
+
+    def test_profile_change_invalidates_the_cached_user(self):
+        self.get_user()
+        profile = Profile.objects.get(owner=self.user)
+        profile.image = 'images/new_image'
+        profile.save()
+        response, queries = self.get_user()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('new_image', response.data['profile_image'])
+
+    def test_deactivated_user_is_refused(self):
+        self.get_user()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_refused(self):
+        self.get_user()
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_profile_fields_load_on_access(self):
+        self.get_user()
+        Profile.objects.filter(owner=self.user).update(city='Oslo')
+        user = load_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.profile.city, 'Oslo')
+
+
+class AsyncViewTests(APITestCase):
+    """
+    The async implementations served when ASYNC_VIEWS is on behave like
+    their sync counterparts.
+    """
+
+    def setUp(self):
+        self.server = FakeStripeServer().start()
+        overrides = override_settings(STRIPE_API_BASE=self.server.url, STRIPE_SECRET_KEY='sk_test_fake')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.server.stop)
+        self.addCleanup(stripe_gateway.reset_client)
+        stripe_gateway.reset_client()
+
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username='buyer', password='password')
+        self.product = Product.objects.create(owner=self.user, name='Shirt', price=12.50, stock=5)
+        self.cart = Cart.objects.create(owner=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, price=25)
+
+    def checkout(self, user=None, cart_id=None):
+        request = self.factory.post('/create-checkout-session/', {'cart_id': cart_id or self.cart.id}, format='json')
+        force_authenticate(request, user=user or self.user)
+        return async_to_sync(AsyncCheckoutSessionView.as_view())(request)
+
+    def test_checkout_session(self):
+        first = self.checkout()
+        second = self.checkout()
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertTrue(first.data['id'].startswith('cs_test_'))
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(self.server.stats['requests'], 1)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+
+    def test_checkout_without_stock_is_refused(self):
+        rival = Cart.objects.create(owner=User.objects.create_user(username='rival', password='password'))
+        reserve_stock(rival, {self.product.pk: 4})
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.server.stats['requests'], 0)
+
+    def test_checkout_of_missing_cart(self):
+        self.assertEqual(self.checkout(cart_id=self.cart.id + 1).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_checkout_requires_authentication(self):
+        request = self.factory.post('/create-checkout-session/', {'cart_id': self.cart.id}, format='json')
+        response = async_to_sync(AsyncCheckoutSessionView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_failed_checkout_releases_the_stock(self):
+        with patch('drf_api.views.stripe_gateway.create_checkout_session', side_effect=RuntimeError('down')):
+            response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_contact_form(self):
+        request = self.factory.post('/contact-us/', {
+            'name': 'John Doe', 'email': 'john.doe@example.com', 'message': 'Hello',
+        }, format='json')
+        response = async_to_sync(AsyncContactUsView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(OutgoingEmail.objects.get().subject, 'New Contact Form Submission from John Doe')
+
+        request = self.factory.post('/contact-us/', {'name': ''}, format='json')
+        response = async_to_sync(AsyncContactUsView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_options(self):
+        response = async_to_sync(AsyncContactUsView.as_view())(self.factory.options('/contact-us/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -13,10 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
-from .views import root_route, logout_route, ContactUsView, create_checkout_session
+from .views import (
+    root_route, logout_route, ContactUsView, create_checkout_session,
+    AsyncContactUsView, AsyncCheckoutSessionView,
+)
+
+if settings.ASYNC_VIEWS:
+    contact_us = AsyncContactUsView.as_view()
+    checkout_session = AsyncCheckoutSessionView.as_view()
+else:
+    contact_us = ContactUsView.as_view()
+    checkout_session = create_checkout_session
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -31,6 +43,10 @@ urlpatterns = [
     path('dj-rest-auth/logout/', logout_route),
     path('dj-rest-auth/', include('dj_rest_auth.urls')),
     path('dj-rest-auth/registration/', include('dj_rest_auth.registration.urls')),
-    path('contact-us/', ContactUsView.as_view(), name='contact_us'),
-    path('create-checkout-session/', create_checkout_session, name='create-checkout-session'),
+    path('contact-us/', contact_us, name='contact_us'),
+    path('create-checkout-session/', checkout_session, name='create-checkout-session'),
 ]
+
+if settings.LOCAL_MEDIA:
+    # Only serves files when DEBUG is on.
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -4,17 +4,25 @@ from .settings import (
     JWT_AUTH_COOKIE, JWT_AUTH_REFRESH_COOKIE, JWT_AUTH_SAMESITE,
     JWT_AUTH_SECURE,
 )
-from django.core.mail import send_mail
+from outbox.mail import queue_mail
 from rest_framework import status
 from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
+from .async_views import AsyncAPIView
 from .serializers import ContactSerializer
-import os, stripe
+import hashlib
+import json
+import os
+from . import stripe_gateway
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
 from cart.models import Cart
 from products.models import Product
+from products.stock import release_reservations, reserve_stock
 from orders.models import Order, OrderItem
 from decimal import Decimal
 import uuid
@@ -22,9 +30,6 @@ from orders.models import Order, OrderItem
 from rest_framework.permissions import AllowAny
 
 
-# Initialize Stripe API key
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 # Logging setup for debugging
 import logging
 logger = logging.getLogger(__name__)
@@ -76,28 +81,32 @@ class ContactUsView(APIView):
     def post(self, request):
         serializer = ContactSerializer(data=request.data)
         if serializer.is_valid():
-            name = serializer.validated_data.get('name')
-            email = serializer.validated_data.get('email')
-            message = serializer.validated_data.get('message')
+            queue_contact_message(**serializer.validated_data)
+            return Response({"detail": "Message sent successfully."}, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            subject = f"New Contact Form Submission from {name}"
-            email_message = f"Message from {name} ({email}):\n\n{message}"
-            recipient_list = recipient_list=[os.environ.get('EMAIL_HOST_USER')]
 
-            try:
-                send_mail(
-                    subject,
-                    email_message,
-                    email,
-                    recipient_list,
-                    fail_silently=False,
-                )
-                return Response({"detail": "Message sent successfully."}, status=status.HTTP_200_OK)
-            except Exception as e:
-                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+class AsyncContactUsView(AsyncAPIView):
+    """
+    Async counterpart of ContactUsView, served when ASYNC_VIEWS is on.
+    """
+    permission_classes = [AllowAny]
+
+    async def post(self, request):
+        serializer = ContactSerializer(data=request.data)
+        if serializer.is_valid():
+            await sync_to_async(queue_contact_message)(**serializer.validated_data)
+            return Response({"detail": "Message sent successfully."}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def queue_contact_message(name, email, message):
+    subject = f"New Contact Form Submission from {name}"
+    email_message = f"Message from {name} ({email}):\n\n{message}"
+    recipient_list = [os.environ.get('EMAIL_HOST_USER')]
+    return queue_mail(subject, email_message, email, recipient_list)
+
+
 @api_view(['POST'])
 def create_checkout_session(request):
     try:
@@ -105,33 +114,118 @@ def create_checkout_session(request):
         if not cart_id:
             return Response({'error': 'cart_id is required'}, status=400)
 
-        cart = Cart.objects.get(id=cart_id)
+        cart, cart_items, out_of_stock, expires_at = reserve_cart(cart_id)
+        if out_of_stock:
+            return Response({'error': 'Not enough stock', 'products': out_of_stock}, status=409)
 
-        line_items = [
-            {
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': {
-                        'name': item.product.name,
-                    },
-                    'unit_amount': int(float(item.product.price) * 100),
-                },
-                'quantity': item.quantity,
-            }
-            for item in cart.items.all()
-        ]
-
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            success_url='https://trade-corner-018d2b5f7079.herokuapp.com/payment-success',
-            cancel_url='https://trade-corner-018d2b5f7079.herokuapp.com/payment-failure',
-            metadata={'cart_id': cart_id}
-        )
+        try:
+            checkout_session = open_checkout_session(cart, cart_id, cart_items, expires_at)
+        except Exception:
+            release_reservations(cart)
+            raise
 
         return Response({'id': checkout_session.id})
     except Cart.DoesNotExist:
         return Response({'error': 'Cart not found'}, status=404)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
+
+
+class AsyncCheckoutSessionView(AsyncAPIView):
+    """
+    Async counterpart of `create_checkout_session`, served when ASYNC_VIEWS is on.
+
+    The Stripe call runs in a thread of its own, so the event loop keeps
+    serving other requests during the round trip.
+    """
+
+    async def post(self, request):
+        try:
+            cart_id = request.data.get('cart_id')
+            if not cart_id:
+                return Response({'error': 'cart_id is required'}, status=400)
+
+            cart, cart_items, out_of_stock, expires_at = await sync_to_async(reserve_cart)(cart_id)
+            if out_of_stock:
+                return Response({'error': 'Not enough stock', 'products': out_of_stock}, status=409)
+
+            try:
+                checkout_session = await sync_to_async(open_checkout_session, thread_sensitive=False)(
+                    cart, cart_id, cart_items, expires_at
+                )
+            except Exception:
+                await sync_to_async(release_reservations)(cart)
+                raise
+
+            return Response({'id': checkout_session.id})
+        except Cart.DoesNotExist:
+            return Response({'error': 'Cart not found'}, status=404)
+        except Exception as e:
+            return Response({'error': str(e)}, status=500)
+
+
+def reserve_cart(cart_id):
+    """
+    Load a cart with its items and products and reserve their stock.
+
+    Holds made by an earlier checkout of the same cart contents are kept
+    while they still last longer than the shortest expiry Stripe accepts,
+    so a double submit gets the same holds and the same session.
+
+    Returns:
+        tuple: The cart, its items, the IDs of the products short of stock
+        (see `reserve_stock`), empty if the stock was reserved, and when the
+        holds expire.
+
+    Raises:
+        Cart.DoesNotExist: If there is no cart with `cart_id`.
+    """
+    cart = Cart.objects.get(id=cart_id)
+    cart_items = list(cart.items.select_related('product'))
+
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    renew_before = timezone.now() + settings.STRIPE_CHECKOUT_MIN_EXPIRY
+    out_of_stock = reserve_stock(cart, quantities, renew_before=renew_before)
+    expires_at = None
+    if not out_of_stock:
+        expires_at = cart.reservations.aggregate(expires_at=Min('expires_at'))['expires_at']
+    return cart, cart_items, out_of_stock, expires_at
+
+
+def open_checkout_session(cart, cart_id, cart_items, expires_at):
+    """
+    Create the Stripe checkout session of a cart whose stock is reserved.
+
+    The session expires with the holds, at `expires_at`.
+
+    Only talks to Stripe, so it can run outside the request's thread.
+    """
+    line_items = [
+        {
+            'price_data': {
+                'currency': 'usd',
+                'product_data': {
+                    'name': item.product.name,
+                },
+                'unit_amount': int(float(item.product.price) * 100),
+            },
+            'quantity': item.quantity,
+        }
+        for item in cart_items
+    ]
+
+    # The same cart contents, prices and holds map to the same session on a
+    # double submit; renewed holds or a changed price get a new session, since
+    # Stripe refuses a key reused with other parameters.
+    expiry = int(expires_at.timestamp()) if expires_at else None
+    digest = hashlib.sha256(json.dumps(line_items, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return stripe_gateway.create_checkout_session(
+        line_items=line_items,
+        metadata={'cart_id': cart_id},
+        success_url='https://trade-corner-018d2b5f7079.herokuapp.com/payment-success',
+        cancel_url='https://trade-corner-018d2b5f7079.herokuapp.com/payment-failure',
+        expires_at=expiry,
+        idempotency_key=f'checkout:{cart.pk}:{cart.updated_at.timestamp()}:{expiry}:{digest}',
+    )
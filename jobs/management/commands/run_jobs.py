@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from jobs.queue import run_pending
+
+
+class Command(BaseCommand):
+    """
+    Run queued background jobs.
+
+    The worker claims due jobs in batches and runs them one by one, sleeping
+    when the queue is empty. With `--once` it exits as soon as no job is due,
+    which suits cron and tests.
+    """
+    help = 'Run queued background jobs (with --once, exit when the queue is empty).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no job is due instead of polling for new ones.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='Number of jobs claimed at a time.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait before polling an empty queue again.',
+        )
+
+    def handle(self, *args, **options):
+        total_succeeded = total_failed = 0
+        while True:
+            succeeded, failed = run_pending(options['batch_size'])
+            total_succeeded += succeeded
+            total_failed += failed
+            if succeeded or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {total_succeeded + total_failed} job(s): {total_succeeded} succeeded, {total_failed} failed.'
+        ))
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.utils import timezone
+
+# A running job whose worker has not finished it within this delay is
+# considered abandoned (e.g. the worker was killed) and is picked up again.
+JOB_LOCK_TIMEOUT = timedelta(minutes=10)
+
+class JobQuerySet(models.QuerySet):
+    """
+    QuerySet for Job with the queries used by the worker.
+    """
+
+    def due(self, now=None):
+        """
+        Filter the jobs ready to run: pending jobs whose `run_after` has
+        passed, and running jobs whose lock has expired with attempts left.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status=Job.PENDING, run_after__lte=now)
+            | models.Q(
+                status=Job.RUNNING, locked_at__lt=now - JOB_LOCK_TIMEOUT, attempts__lt=models.F('max_attempts'),
+            )
+        )
+
+    def abandoned(self, now=None):
+        """
+        Filter the running jobs whose lock expired on their last attempt.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            status=Job.RUNNING, locked_at__lt=now - JOB_LOCK_TIMEOUT, attempts__gte=models.F('max_attempts'),
+        )
+
+    def claim(self, limit):
+        """
+        Mark up to `limit` due jobs as running and return them.
+
+        On databases supporting `SELECT ... FOR UPDATE SKIP LOCKED` several
+        workers can claim from the same table without picking the same jobs.
+        Jobs abandoned on their last attempt are marked as failed first.
+
+        Args:
+            limit (int): Maximum number of jobs to claim.
+
+        Returns:
+            list: The claimed jobs, oldest first.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            self.abandoned(now).update(
+                status=Job.FAILED, locked_at=None, last_error='Abandoned on its last attempt.', updated_at=now,
+            )
+            ids = list(
+                self.due(now).order_by('run_after', 'id')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            self.filter(pk__in=ids).update(
+                status=Job.RUNNING, locked_at=now, attempts=models.F('attempts') + 1, updated_at=now,
+            )
+        return list(self.filter(pk__in=ids).order_by('run_after', 'id'))
+
+class Job(models.Model):
+    """
+    A background job stored in the database and run by `manage.py run_jobs`.
+
+    `name` selects the handler registered with `jobs.registry.register` and
+    `payload` holds its keyword arguments. Jobs can be attached to the object
+    they work on (e.g. an order) through `related_object`.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    related_object = GenericForeignKey('content_type', 'object_id')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='job_status_run_after_idx'),
+            models.Index(fields=['content_type', 'object_id'], name='job_related_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.id} ({self.status})'
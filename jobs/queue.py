@@ -0,0 +1,94 @@
+import logging
+import traceback
+from datetime import timedelta
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from .models import Job
+from .registry import get_handler
+
+logger = logging.getLogger(__name__)
+
+# Delay before the first retry; it doubles with every failed attempt.
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+
+def enqueue(name, payload=None, related=None, delay=None, max_attempts=5):
+    """
+    Queue a job for the worker.
+
+    The row is inserted in the current transaction, so the job commits or
+    rolls back together with the data it works on and the worker never sees
+    it before that data is committed.
+
+    Args:
+        name (str): Name of the registered handler.
+        payload (dict): JSON serializable keyword arguments of the handler.
+        related (Model): Object the job is tracked against, if any.
+        delay (timedelta): How long to wait before the first attempt.
+        max_attempts (int): Attempts before the job is marked as failed.
+
+    Returns:
+        Job: The queued job.
+    """
+    job = Job(name=name, payload=payload or {}, max_attempts=max_attempts)
+    if delay:
+        job.run_after = timezone.now() + delay
+    if related is not None:
+        job.content_type = ContentType.objects.get_for_model(related)
+        job.object_id = related.pk
+    job.save()
+    return job
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff before the next attempt, after `attempts` failures.
+    """
+    return min(RETRY_BASE_DELAY * 2 ** min(attempts - 1, 16), RETRY_MAX_DELAY)
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome.
+
+    A failed attempt is retried with exponential backoff until the job has
+    used `max_attempts`, after which it is marked as failed.
+
+    Returns:
+        bool: Whether the job succeeded.
+    """
+    try:
+        get_handler(job.name)(**job.payload)
+    except Exception:
+        logger.exception(f'Job {job.pk} ({job.name}) failed on attempt {job.attempts}.')
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        succeeded = False
+    else:
+        job.status = Job.SUCCEEDED
+        job.last_error = ''
+        succeeded = True
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_after', 'locked_at', 'last_error', 'updated_at'])
+    return succeeded
+
+
+def run_pending(batch_size=10):
+    """
+    Claim and run one batch of due jobs.
+
+    Returns:
+        tuple: The number of jobs that succeeded and failed.
+    """
+    succeeded = failed = 0
+    for job in Job.objects.claim(batch_size):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
@@ -0,0 +1,22 @@
+# Job handlers by name, filled by the @register decorator.
+HANDLERS = {}
+
+
+def register(name):
+    """
+    Register the decorated function as the handler of the jobs called `name`.
+
+    Handlers are called with the job payload as keyword arguments. Raising
+    an exception fails the attempt and schedules a retry.
+    """
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    try:
+        return HANDLERS[name]
+    except KeyError:
+        raise LookupError(f'No job handler registered for {name!r}.')
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .models import Job, JOB_LOCK_TIMEOUT
+from .queue import enqueue, retry_delay, run_pending
+from .registry import register
+
+calls = []
+
+
+@register('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@register('tests.fail')
+def fail():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_pending_runs_due_jobs(self):
+        """
+        Ensure due jobs run with their payload and are marked as succeeded.
+        """
+        job = enqueue('tests.record', {'value': 1})
+        enqueue('tests.record', {'value': 2}, delay=timedelta(hours=1))
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(calls, [1])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(job.locked_at)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """
+        Ensure failed attempts are rescheduled until max_attempts is reached.
+        """
+        job = enqueue('tests.fail', max_attempts=2)
+        before = timezone.now()
+        self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreaterEqual(job.run_after, before + retry_delay(1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertEqual(run_pending(), (0, 0))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_delay_doubles_and_is_capped(self):
+        self.assertEqual(retry_delay(2), retry_delay(1) * 2)
+        self.assertEqual(retry_delay(50), timedelta(hours=1))
+
+    def test_abandoned_job_is_claimed_again(self):
+        """
+        Ensure a running job whose lock expired is picked up by another worker.
+        """
+        job = enqueue('tests.record', {'value': 3})
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_at=timezone.now() - JOB_LOCK_TIMEOUT - timedelta(seconds=1),
+        )
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(calls, [3])
+
+    def test_job_abandoned_on_its_last_attempt_fails(self):
+        """
+        Ensure an expired lock is not reclaimed once the job used all its attempts.
+        """
+        job = enqueue('tests.record', {'value': 5})
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=5, locked_at=timezone.now() - JOB_LOCK_TIMEOUT - timedelta(seconds=1),
+        )
+        self.assertEqual(run_pending(), (0, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_at), (Job.FAILED, None))
+        self.assertEqual(calls, [])
+
+    def test_run_jobs_command(self):
+        enqueue('tests.record', {'value': 4})
+        enqueue('tests.fail', max_attempts=1)
+        out = StringIO()
+        call_command('run_jobs', once=True, stdout=out)
+        self.assertIn('Ran 2 job(s): 1 succeeded, 1 failed.', out.getvalue())
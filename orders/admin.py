@@ -1,7 +1,8 @@
 # orders/admin.py
 
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, StripeEvent
 
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(StripeEvent)
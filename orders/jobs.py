@@ -0,0 +1,161 @@
+import logging
+import traceback
+from datetime import datetime, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from drf_api import stripe_gateway
+from jobs.queue import enqueue, retry_delay
+from jobs.registry import register
+from products.models import StockReservation
+from .models import Order, StripeEvent
+from .views import (
+    create_stripe_invoice, process_order_from_session, send_checkout_refund_email, send_checkout_rejected_alert,
+    send_order_confirmation_email,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@register('orders.create_invoice')
+def create_order_invoice(order_id, customer_details):
+    """
+    Create the Stripe invoice of an order and queue its confirmation email.
+
+    The invoice URL and the email are saved together, so a retry after they
+    were stored does nothing.
+
+    Args:
+        order_id (int): The ID of the order to invoice.
+        customer_details (dict): The customer email, name and address of the
+            checkout session.
+    """
+    order = Order.objects.prefetch_related('items').get(pk=order_id)
+    if order.invoice_url:
+        return
+    invoice_url = create_stripe_invoice(customer_details, order)
+    with transaction.atomic():
+        order.invoice_url = invoice_url
+        order.save(update_fields=['invoice_url', 'updated_at'])
+        send_order_confirmation_email(customer_details['email'], order, invoice_url)
+
+
+@register('orders.refund_rejected_checkout')
+def refund_rejected_checkout(event_id):
+    """
+    Refund a paid checkout session whose order could not be created.
+
+    The customer was charged when the session completed, so the payment is
+    refunded and the customer and the shop are emailed. The refund is keyed
+    on the event, so a retry of this job cannot refund twice. A session
+    without a captured payment is only reported, for manual handling.
+
+    Args:
+        event_id (str): The Stripe ID of the failed `checkout.session.completed` event.
+    """
+    event = StripeEvent.objects.get(event_id=event_id)
+    session = event.payload['data']['object']
+    payment_intent = session.get('payment_intent')
+    refund_id = None
+    if payment_intent:
+        refund = stripe_gateway.create_refund(
+            payment_intent, {'cart_id': session.get('metadata', {}).get('cart_id'), 'event_id': event_id},
+            idempotency_key=f'refund:{event_id}',
+        )
+        refund_id = refund.id
+    else:
+        logger.error(f"Stripe event {event_id} was rejected without a payment to refund.")
+    with transaction.atomic():
+        send_checkout_refund_email(session['customer_details']['email'], refunded=refund_id is not None)
+        send_checkout_rejected_alert(event, event.error, refund_id)
+
+
+def handle_checkout_session_completed(event):
+    process_order_from_session(event.payload['data']['object'])
+
+
+def reject_checkout_session_completed(event):
+    enqueue('orders.refund_rejected_checkout', {'event_id': event.event_id})
+
+
+def handle_checkout_session_expired(event):
+    """
+    Release the holds the expired session was created for.
+
+    Holds share the expiry of their session (see `drf_api.views.reserve_cart`)
+    and holds renewed for a later checkout of the cart expire later, so only
+    the cart's holds expiring no later than this session are released.
+    """
+    session = event.payload['data']['object']
+    cart_id = session.get('metadata', {}).get('cart_id')
+    if cart_id:
+        expires_at = datetime.fromtimestamp(session.get('expires_at') or event.payload['created'], tz=dt_timezone.utc)
+        StockReservation.objects.filter(cart_id=cart_id, expires_at__lte=expires_at).delete()
+
+
+# Handlers of the event types in STRIPE_EVENT_TYPES.
+STRIPE_EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_session_completed,
+    'checkout.session.expired': handle_checkout_session_expired,
+}
+# Compensations for events their handler rejected, run when they are marked failed.
+STRIPE_EVENT_REJECTION_HANDLERS = {
+    'checkout.session.completed': reject_checkout_session_completed,
+}
+
+
+@register('orders.process_stripe_events')
+def process_stripe_events(limit=100):
+    """
+    Process the pending Stripe events, oldest first.
+
+    Each event is locked, handled and marked as processed in one
+    transaction, so an event is applied exactly once even when several
+    workers drain the queue. A handler rejecting the event with a
+    ValidationError (e.g. the products are out of stock) marks it as failed
+    and runs its compensation from STRIPE_EVENT_REJECTION_HANDLERS in the
+    same transaction (a rejected paid checkout is refunded). Any other
+    exception rolls the handler back and records the error on the event,
+    which is retried with exponential backoff by a queued run until it used
+    `StripeEvent.MAX_ATTEMPTS`, then marked as failed. Either way the run
+    moves on, so one broken event does not hold up the ones after it.
+
+    Args:
+        limit (int): Maximum number of events processed by this run.
+    """
+    now = timezone.now()
+    pending = StripeEvent.objects.filter(
+        Q(retry_after__isnull=True) | Q(retry_after__lte=now), status=StripeEvent.PENDING,
+    ).order_by('created', 'id')
+    for pk in list(pending.values_list('pk', flat=True)[:limit]):
+        with transaction.atomic():
+            event = pending.select_for_update(skip_locked=True).filter(pk=pk).first()
+            if event is None:
+                continue
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    STRIPE_EVENT_HANDLERS[event.type](event)
+            except serializers.ValidationError as exc:
+                logger.error(f"Stripe event {event.event_id} failed: {exc.detail}")
+                event.status = StripeEvent.FAILED
+                event.error = str(exc.detail)
+                if event.type in STRIPE_EVENT_REJECTION_HANDLERS:
+                    STRIPE_EVENT_REJECTION_HANDLERS[event.type](event)
+            except Exception:
+                logger.exception(f"Stripe event {event.event_id} failed on attempt {event.attempts}.")
+                event.error = traceback.format_exc()
+                if event.attempts >= StripeEvent.MAX_ATTEMPTS:
+                    event.status = StripeEvent.FAILED
+                else:
+                    delay = retry_delay(event.attempts)
+                    event.retry_after = timezone.now() + delay
+                    enqueue('orders.process_stripe_events', delay=delay)
+                    event.save(update_fields=['attempts', 'retry_after', 'error'])
+                    continue
+            else:
+                event.status = StripeEvent.PROCESSED
+                event.error = ''
+            event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'processed_at', 'error', 'attempts'])
@@ -0,0 +1,59 @@
+from decimal import ROUND_HALF_UP, Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from orders.models import OrderItem
+
+SNAPSHOT_FIELDS = ['product_name', 'unit_price', 'product_image', 'seller']
+
+
+class Command(BaseCommand):
+    """
+    Fill the product snapshot of order items saved before snapshots existed.
+
+    Items are read with their product in batches and written back with one
+    bulk UPDATE per batch. The unit price is the purchase-time one, derived
+    from the line total stored in `price`, since the product's price may have
+    changed since; only the name, image and seller come from the product.
+    Items whose product was already deleted cannot be backfilled and are
+    reported.
+    """
+    help = 'Copy product name, image and seller and the unit price paid onto order items missing a snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of order items updated per query.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = OrderItem.objects.filter(product_name='')
+        items = pending.filter(product__isnull=False).select_related('product').order_by('pk')
+        updated = 0
+        batch = []
+        for item in items.iterator(chunk_size=batch_size):
+            item.take_snapshot(unit_price=self.unit_price_paid(item))
+            batch.append(item)
+            if len(batch) == batch_size:
+                updated += self.write(batch)
+                batch = []
+        if batch:
+            updated += self.write(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} order item snapshot(s).'))
+        orphaned = pending.filter(product__isnull=True).count()
+        if orphaned:
+            self.stdout.write(self.style.WARNING(
+                f'{orphaned} order item(s) have no product left to copy from.'
+            ))
+
+    @staticmethod
+    def unit_price_paid(item):
+        if not item.quantity:
+            return item.price
+        return (item.price / item.quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    def write(self, batch):
+        with transaction.atomic():
+            OrderItem.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+        return len(batch)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_orderitem_product_image_orderitem_product_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='invoice_url',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+    ]
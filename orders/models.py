@@ -1,6 +1,33 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericRelation
 from products.models import Product
+from profiles.models import Profile, owner_preview_prefetches
+
+class OrderQuerySet(models.QuerySet):
+    """
+    QuerySet for Order with the related rows needed by OrderSerializer.
+    """
+
+    def for_serializer(self, fieldset=None):
+        """
+        Join the owner, and prefetch the owner's profile with its counts and
+        previews (see `ProfileQuerySet.for_serializer`) and the items. Items
+        serialize from their product snapshot, so products are not loaded.
+
+        Args:
+            fieldset (SparseFieldset): The fields requested with `?fields=` /
+                `?omit=`, if any. Nested rows the request leaves out are not loaded.
+        """
+        queryset = self.select_related('owner')
+        if fieldset is None or fieldset.wants('profile'):
+            queryset = queryset.prefetch_related(
+                models.Prefetch('owner__profile', queryset=Profile.objects.with_counts(fieldset, 'profile')),
+                *owner_preview_prefetches('owner__', fieldset, 'profile'),
+            )
+        if fieldset is None or fieldset.wants('items'):
+            return queryset.prefetch_related('items')
+        return queryset
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -17,9 +44,19 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    invoice_url = models.URLField(max_length=500, blank=True, editable=False)
+    jobs = GenericRelation('jobs.Job')
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='order_owner_created_id_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(fields=['total_price', '-created_at', '-id'], name='order_total_created_idx'),
+        ]
 
     def __str__(self):
         return f'Order {self.order_number} by {self.owner.username}'
@@ -34,13 +71,84 @@ class Order(models.Model):
         return str(uuid.uuid4()).replace("-", "").upper()[:20]
 
 class OrderItem(models.Model):
+    """
+    A line of an order.
+
+    The product's name, unit price, image URL and seller are copied onto the
+    item when it is first saved, so orders render without touching products
+    and keep showing what was bought after the product changes or is deleted.
+    """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    product_name = models.CharField(max_length=255, blank=True, editable=False)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    product_image = models.URLField(max_length=500, blank=True, editable=False)
+    seller = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, editable=False, related_name='sold_items'
+    )
 
     class Meta:
         unique_together = [['order', 'product']]
 
     def __str__(self):
-        return f'{self.quantity} x {self.product.name}'
+        return f'{self.quantity} x {self.product_name}'
+
+    def save(self, *args, **kwargs):
+        if self.product_id and not self.product_name:
+            self.take_snapshot()
+        super().save(*args, **kwargs)
+
+    def take_snapshot(self, unit_price=None):
+        """
+        Copy the current state of the product onto the item.
+
+        Args:
+            unit_price (Decimal): The price paid per unit, when it is known to
+                differ from the product's current price.
+        """
+        product = self.product
+        self.product_name = product.name
+        self.unit_price = product.price if unit_price is None else unit_price
+        self.product_image = product.image.url if product.image else ''
+        self.seller_id = product.owner_id
+
+class StripeEvent(models.Model):
+    """
+    A Stripe webhook event, stored when received and processed by a job.
+
+    The unique `event_id` makes repeated deliveries of the same event no-ops.
+    An event whose handler raises an unexpected error is retried after
+    `retry_after` until it used `MAX_ATTEMPTS`, then marked as failed.
+    """
+    MAX_ATTEMPTS = 5
+
+    PENDING = 'pending'
+    PROCESSED = 'processed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSED, 'Processed'),
+        (FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created = models.DateTimeField(help_text='When Stripe created the event.')
+    received_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(fields=['status', 'created', 'id'], name='stripe_event_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.type} {self.event_id} ({self.status})'
@@ -2,25 +2,30 @@ from rest_framework import serializers
 from .models import Order, OrderItem
 from products.models import Product
 from profiles.serializers import ProfileSerializer
-from products.serializers import ProductSerializer
+from drf_api.fieldsets import SparseFieldsetMixin
 import uuid
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for OrderItem instances.
     
     This serializer links an OrderItem to its respective Order and Product.
-    It now includes full product details instead of just the product ID.
+    Product details come from the snapshot stored on the item at purchase
+    time, so rendering an item never reads the product itself.
     """
-    product = ProductSerializer(read_only=True)  # Use ProductSerializer to include full product details
+    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
     order = serializers.PrimaryKeyRelatedField(queryset=Order.objects.all())
+    seller = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'order', 'product', 'quantity', 'price']
+        fields = [
+            'id', 'order', 'product', 'product_name', 'unit_price', 'product_image',
+            'seller', 'quantity', 'price'
+        ]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Order instances.
 
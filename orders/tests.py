@@ -1,9 +1,27 @@
 from django.urls import reverse
-from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework import serializers, status
+from rest_framework.test import APIRequestFactory, APITestCase
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
-from products.models import Product
-from .models import Order, OrderItem
+from products.models import Product, StockReservation
+from products.stock import reserve_stock
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+from unittest.mock import patch
+from benchmarks.fake_stripe import FakeStripeServer
+from cart.models import Cart, CartItem
+from drf_api import stripe_gateway
+from jobs.models import Job
+from outbox.models import OutgoingEmail
+from .models import Order, OrderItem, StripeEvent
+from .jobs import create_order_invoice, process_stripe_events
+from .views import AsyncStripeWebhookView, process_order_from_session
 
 class OrderTests(APITestCase):
     def setUp(self):
@@ -112,3 +130,297 @@ class OrderItemTests(APITestCase):
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['quantity'], 1)
+
+class OrderItemSnapshotTests(APITestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='testpass')
+        self.seller = User.objects.create_user(username='seller', password='testpass')
+        self.client.login(username='buyer', password='testpass')
+        self.product = Product.objects.create(name='Test Product', price=10.00, stock=100, owner=self.seller)
+        self.order = Order.objects.create(owner=self.buyer, total_price=20.00)
+        self.item = OrderItem.objects.create(order=self.order, product=self.product, quantity=2, price=20.00)
+
+    def test_item_keeps_snapshot_after_product_changes(self):
+        """
+        Ensure order items keep the product details from purchase time.
+        """
+        self.product.name = 'Renamed Product'
+        self.product.price = 15.00
+        self.product.save()
+        response = self.client.get(reverse('order-detail', args=[self.order.id]))
+        item = response.data['items'][0]
+        self.assertEqual(item['product_name'], 'Test Product')
+        self.assertEqual(item['unit_price'], '10.00')
+        self.assertEqual(item['seller'], self.seller.id)
+        self.assertTrue(item['product_image'])
+
+        self.product.delete()
+        self.item.refresh_from_db()
+        self.assertIsNone(self.item.product)
+        self.assertEqual(str(self.item), '2 x Test Product')
+
+    def test_order_history_does_not_read_products(self):
+        """
+        Ensure order items are rendered without querying products.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order-history'), {'omit': 'profile'})
+        item = response.data['results'][0]['items'][0]
+        self.assertEqual(item['product'], self.product.id)
+        self.assertEqual(item['product_name'], 'Test Product')
+        product_reads = [
+            query['sql'] for query in queries
+            if 'FROM "products_product"' in query['sql'] and 'UNION ALL' not in query['sql']
+        ]
+        self.assertEqual(product_reads, [])
+
+    def test_backfill_command(self):
+        """
+        Ensure the backfill command fills snapshots missing on older items.
+        """
+        OrderItem.objects.update(product_name='', unit_price=None, product_image='', seller=None)
+        Product.objects.filter(pk=self.product.pk).update(price=12.00)
+        out = StringIO()
+        call_command('backfill_order_item_snapshots', stdout=out)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.product_name, 'Test Product')
+        self.assertEqual(self.item.unit_price, Decimal('10.00'))
+        self.assertEqual(self.item.seller, self.seller)
+        self.assertIn('Backfilled 1 order item snapshot(s).', out.getvalue())
+
+
+class ProcessOrderFromSessionTests(APITestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='testpass')
+        self.seller = User.objects.create_user(username='seller', password='testpass')
+        self.cart = Cart.objects.create(owner=self.buyer)
+        self.products = [
+            Product.objects.create(name=f'Product {index}', price=10.00, stock=5, owner=self.seller)
+            for index in range(5)
+        ]
+        for product in self.products:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2, price=20.00)
+        self.session = {
+            'customer_details': {'email': 'buyer@example.com', 'name': 'Buyer', 'address': {'city': 'Dublin'}},
+            'metadata': {'cart_id': self.cart.id},
+        }
+
+    def test_order_is_created_in_constant_queries(self):
+        """
+        Ensure the order, its items and the stock updates do not cost a query per item.
+        """
+        reserve_stock(self.cart, {product.pk: 2 for product in self.products})
+        with CaptureQueriesContext(connection) as queries:
+            process_order_from_session(self.session)
+        self.assertLessEqual(len(queries), 11)
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, Decimal('100.00'))
+        self.assertEqual(order.items.count(), 5)
+        self.assertEqual(order.items.first().product_name, self.products[0].name)
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('stock', flat=True)), [3, 3, 3, 3, 3]
+        )
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(list(order.jobs.values_list('name', flat=True)), ['orders.create_invoice'])
+
+    def test_insufficient_stock_rolls_back(self):
+        """
+        Ensure an order is not created when a product runs out of stock.
+        """
+        Product.objects.filter(pk=self.products[2].pk).update(stock=1)
+        with self.assertRaises(serializers.ValidationError):
+            process_order_from_session(self.session)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 5)
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('stock', flat=True)), [5, 5, 1, 5, 5]
+        )
+        self.assertFalse(Job.objects.exists())
+
+    @patch('orders.jobs.create_stripe_invoice', return_value='https://invoice.example.com')
+    def test_invoice_and_email_run_as_jobs(self, mock_invoice):
+        """
+        Ensure the invoice is created by the worker, which queues the confirmation email.
+        """
+        order = process_order_from_session(self.session)
+        mock_invoice.assert_not_called()
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+        call_command('run_jobs', once=True, stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.invoice_url, 'https://invoice.example.com')
+        mock_invoice.assert_called_once_with(self.session['customer_details'], order)
+        self.assertEqual(order.jobs.get().status, Job.SUCCEEDED)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipients, ['buyer@example.com'])
+        self.assertIn('https://invoice.example.com', email.body)
+
+        # A retry of the job does not invoice or email twice.
+        create_order_invoice(order.pk, self.session['customer_details'])
+        mock_invoice.assert_called_once()
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+
+@patch('orders.jobs.create_stripe_invoice', return_value='https://invoice.example.com')
+@patch('orders.views.stripe.Webhook.construct_event', side_effect=lambda payload, *args: json.loads(payload))
+class StripeWebhookTests(APITestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='testpass')
+        self.seller = User.objects.create_user(username='seller', password='testpass')
+        self.cart = Cart.objects.create(owner=self.buyer)
+        self.product = Product.objects.create(name='Test Product', price=10.00, stock=5, owner=self.seller)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, price=20.00)
+        self.url = reverse('stripe-order-webhook')
+
+    def event(self, event_id='evt_1', event_type='checkout.session.completed', cart_id=None):
+        return {
+            'id': event_id,
+            'type': event_type,
+            'created': 1700000000,
+            'data': {'object': {
+                'customer_details': {'email': 'buyer@example.com', 'name': 'Buyer', 'address': None},
+                'metadata': {'cart_id': cart_id or self.cart.id},
+            }},
+        }
+
+    def post(self, event):
+        return self.client.post(self.url, event, format='json', HTTP_STRIPE_SIGNATURE='sig')
+
+    def test_webhook_stores_event_and_returns_immediately(self, mock_construct, mock_invoice):
+        """
+        Ensure the webhook only stores the event; the order is created by the worker.
+        """
+        response = self.post(self.event())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PENDING)
+        self.assertFalse(Order.objects.exists())
+
+        call_command('run_jobs', once=True, stdout=StringIO())
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.PROCESSED)
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(Order.objects.get().owner, self.buyer)
+
+    def test_duplicate_delivery_is_ignored(self, mock_construct, mock_invoice):
+        """
+        Ensure a repeated delivery of an event does not create a second order.
+        """
+        self.post(self.event())
+        call_command('run_jobs', once=True, stdout=StringIO())
+        response = self.post(self.event())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Job.objects.filter(name='orders.process_stripe_events').count(), 1)
+
+    def test_async_webhook_stores_event_once(self, mock_construct, mock_invoice):
+        """
+        Ensure the async webhook view stores events like the sync one.
+        """
+        view = async_to_sync(AsyncStripeWebhookView.as_view())
+        for _ in range(2):
+            request = APIRequestFactory().post(self.url, self.event(), format='json', HTTP_STRIPE_SIGNATURE='sig')
+            self.assertEqual(view(request).status_code, status.HTTP_200_OK)
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PENDING)
+        self.assertEqual(Job.objects.filter(name='orders.process_stripe_events').count(), 1)
+
+    def test_unhandled_event_types_are_not_stored(self, mock_construct, mock_invoice):
+        response = self.post(self.event(event_type='invoice.paid'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_rejected_event_is_marked_failed(self, mock_construct, mock_invoice):
+        """
+        Ensure an event whose order cannot be created is recorded as failed.
+        """
+        self.post(self.event(cart_id=999))
+        call_command('run_jobs', once=True, stdout=StringIO())
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, StripeEvent.FAILED)
+        self.assertIn('Cart not found', event.error)
+        self.assertEqual(Job.objects.get(name='orders.process_stripe_events').status, Job.SUCCEEDED)
+        self.assertTrue(Job.objects.filter(name='orders.refund_rejected_checkout').exists())
+
+    def test_broken_event_is_retried_without_blocking_the_queue(self, mock_construct, mock_invoice):
+        """
+        Ensure an event failing with an unexpected error is retried later, then failed, while later events proceed.
+        """
+        broken = self.event(event_id='evt_broken')
+        broken['data']['object']['customer_details'] = None
+        self.post(broken)
+        self.post(self.event(event_id='evt_2'))
+        with self.assertLogs('orders.jobs', level='ERROR'):
+            call_command('run_jobs', once=True, stdout=StringIO())
+
+        event = StripeEvent.objects.get(event_id='evt_broken')
+        self.assertEqual((event.status, event.attempts), (StripeEvent.PENDING, 1))
+        self.assertIn('TypeError', event.error)
+        self.assertIsNotNone(event.retry_after)
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_2').status, StripeEvent.PROCESSED)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Job.objects.filter(name='orders.process_stripe_events', status=Job.PENDING).count(), 1)
+
+        for _ in range(StripeEvent.MAX_ATTEMPTS - 1):
+            StripeEvent.objects.filter(pk=event.pk).update(retry_after=None)
+            with self.assertLogs('orders.jobs', level='ERROR'):
+                process_stripe_events()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (StripeEvent.FAILED, StripeEvent.MAX_ATTEMPTS))
+
+    @override_settings(EMAIL_HOST_USER='shop@example.com')
+    def test_paid_checkout_without_stock_is_refunded(self, mock_construct, mock_invoice):
+        """
+        Ensure a paid checkout whose products sold out is refunded and both parties are emailed.
+        """
+        server = FakeStripeServer().start()
+        overrides = override_settings(STRIPE_API_BASE=server.url, STRIPE_SECRET_KEY='sk_test_fake')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(server.stop)
+        self.addCleanup(stripe_gateway.reset_client)
+        stripe_gateway.reset_client()
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+        event = self.event()
+        event['data']['object'].update(id='cs_test_1', payment_intent='pi_1')
+
+        self.post(event)
+        for _ in range(2):
+            call_command('run_jobs', once=True, stdout=StringIO())
+
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.FAILED)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Job.objects.get(name='orders.refund_rejected_checkout').status, Job.SUCCEEDED)
+        refunds = [item for item in server.objects.values() if item['object'] == 'refund']
+        self.assertEqual([refund['payment_intent'] for refund in refunds], ['pi_1'])
+        self.assertEqual(refunds[0]['metadata'], {'cart_id': str(self.cart.id), 'event_id': 'evt_1'})
+        recipients = sorted(email.recipients[0] for email in OutgoingEmail.objects.all())
+        self.assertEqual(recipients, ['buyer@example.com', 'shop@example.com'])
+        self.assertIn('refunded', OutgoingEmail.objects.get(recipients=['buyer@example.com']).body)
+        self.assertEqual(self.cart.items.count(), 1)
+
+    def expired_event(self, event_id='evt_1'):
+        event = self.event(event_id=event_id, event_type='checkout.session.expired')
+        event['data']['object']['expires_at'] = int(StockReservation.objects.get().expires_at.timestamp())
+        return event
+
+    def test_expired_checkout_releases_reservations(self, mock_construct, mock_invoice):
+        reserve_stock(self.cart, {self.product.pk: 2})
+        self.post(self.expired_event())
+        call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PROCESSED)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_checkout_keeps_holds_of_a_newer_checkout(self, mock_construct, mock_invoice):
+        """
+        Ensure the expiry of a first session does not release the holds of the next one.
+        """
+        reserve_stock(self.cart, {self.product.pk: 2})
+        expired = self.expired_event()
+        reserve_stock(self.cart, {self.product.pk: 1}, ttl=timedelta(minutes=60))
+        self.post(expired)
+        call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PROCESSED)
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
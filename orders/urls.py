@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, OrderItemViewSet, OrderHistoryView, stripe_order_webhook
+from django.conf import settings
+from .views import OrderViewSet, OrderItemViewSet, OrderHistoryView, stripe_order_webhook, AsyncStripeWebhookView
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet)
@@ -9,6 +10,10 @@ router.register(r'order-items', OrderItemViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('order-history/', OrderHistoryView.as_view(), name='order-history'),
-    path('stripe-webhook/', stripe_order_webhook, name='stripe-order-webhook'),
+    path(
+        'stripe-webhook/',
+        AsyncStripeWebhookView.as_view() if settings.ASYNC_VIEWS else stripe_order_webhook,
+        name='stripe-order-webhook',
+    ),
 
 ]
@@ -3,57 +3,123 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db import transaction
-from django.core.mail import send_mail
 from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from cart.models import Cart
-from .models import Order, OrderItem
+from .models import Order, OrderItem, StripeEvent
 from .serializers import OrderSerializer, OrderItemSerializer
 from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
+from drf_api.async_views import AsyncAPIView
+from drf_api.fieldsets import SparseFieldset
+from drf_api.mixins import CachedObjectMixin, ConditionalGetMixin
+from drf_api import stripe_gateway
+from drf_api.pagination import OptionalKeysetPagination
+from jobs.queue import enqueue
+from outbox.mail import queue_mail
+from products.stock import decrement_stock, release_reservations
+from profiles.models import Profile
+import json
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
 from decimal import Decimal
 import stripe
 import logging
 
 logger = logging.getLogger(__name__)
-stripe.api_key = settings.STRIPE_SECRET_KEY
+
+# Stripe event types stored by the webhook; see orders/jobs.py for their handlers.
+STRIPE_EVENT_TYPES = {'checkout.session.completed', 'checkout.session.expired'}
 
 # Webhook for Stripe payments
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def stripe_order_webhook(request):
-    payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
-    event = None
+    """
+    Verify and store a Stripe event, then acknowledge it straight away.
+
+    The event is processed by the `orders.process_stripe_events` job. Events
+    are stored under their Stripe id, so a repeated delivery is acknowledged
+    without being stored or processed again. Event types nothing handles
+    are acknowledged and dropped.
+    """
+    event = construct_stripe_event(request)
+    if event is None:
+        return Response(status=400)
+
+    if event['type'] in STRIPE_EVENT_TYPES:
+        store_stripe_event(json.loads(request.body))
+
+    return Response(status=200)
+
+class AsyncStripeWebhookView(AsyncAPIView):
+    """
+    Async counterpart of `stripe_order_webhook`, served when ASYNC_VIEWS is on.
+    """
+    permission_classes = [AllowAny]
+
+    async def post(self, request):
+        event = construct_stripe_event(request)
+        if event is None:
+            return Response(status=400)
+
+        if event['type'] in STRIPE_EVENT_TYPES:
+            await sync_to_async(store_stripe_event)(json.loads(request.body))
+
+        return Response(status=200)
 
+def construct_stripe_event(request):
+    """
+    Verify the signature of a Stripe webhook request and return its event.
+
+    Returns:
+        stripe.Event: The event, or None if the payload or signature is invalid.
+    """
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
+        return stripe.Webhook.construct_event(request.body, sig_header, settings.STRIPE_WEBHOOK_SECRET)
     except ValueError as e:
         logger.error(f"Invalid payload: {e}")
-        return Response(status=400)
     except stripe.error.SignatureVerificationError as e:
         logger.error(f"Signature verification failed: {e}")
-        return Response(status=400)
+    return None
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        process_order_from_session(session)
+def store_stripe_event(data):
+    """
+    Store a verified Stripe event and queue its processing, once per event id.
 
-    return Response(status=200)
+    Returns:
+        bool: Whether the event was new.
+    """
+    with transaction.atomic():
+        _, created = StripeEvent.objects.get_or_create(event_id=data['id'], defaults={
+            'type': data['type'],
+            'payload': data,
+            'created': datetime.fromtimestamp(data['created'], tz=dt_timezone.utc),
+        })
+        if created:
+            enqueue('orders.process_stripe_events')
+    return created
 
 # Order ViewSet for managing orders
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(CachedObjectMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing Order instances.
     """
-    queryset = Order.objects.all()
+    queryset = Order.objects.for_serializer()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['order_number', 'owner__username', 'status', 'total_price']
     search_fields = ['order_number', 'owner__username', 'status']
 
+    def get_queryset(self):
+        return Order.objects.for_serializer(SparseFieldset.from_request(self.request))
+
     def perform_create(self, serializer):
         pass  # Order creation handled by the Stripe webhook
 
@@ -65,10 +131,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             subject = f"Order {instance.order_number} Status Update"
             message = f"Dear {self.request.user.username},\n\nYour order {instance.order_number} status has been updated to {instance.status}."
             recipient_list = [self.request.user.email]
-            try:
-                send_mail(subject, message, settings.EMAIL_HOST_USER, recipient_list, fail_silently=False)
-            except Exception as e:
-                raise serializers.ValidationError({"error": "Failed to send status update email."})
+            queue_mail(subject, message, settings.EMAIL_HOST_USER, recipient_list)
         return order
 
     @action(detail=True, methods=['post'])
@@ -101,99 +164,192 @@ class OrderItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 # Order History View for retrieving a user's order history
-class OrderHistoryView(generics.ListAPIView):
+class OrderHistoryView(ConditionalGetMixin, generics.ListAPIView):
     """
     API view for retrieving a list of orders belonging to the authenticated user.
+    Responses carry ETag and Last-Modified validators so polling clients get a 304
+    until one of their orders, its items or their profile changes.
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalKeysetPagination
 
     def get_queryset(self):
         """
         Return the queryset of orders for the current authenticated user.
         """
-        return Order.objects.filter(owner=self.request.user)
+        fieldset = SparseFieldset.from_request(self.request)
+        return Order.objects.for_serializer(fieldset).filter(owner=self.request.user)
+
+    def get_validator_querysets(self):
+        user = self.request.user
+        return [
+            (Order.objects.filter(owner=user), 'updated_at'),
+            (OrderItem.objects.filter(order__owner=user), None),
+            *Profile.objects.filter(owner=user).validator_querysets(),
+        ]
 
 # Stripe invoice creation and processing
-def create_stripe_invoice(session, cart, total_price, order_number):
-    stripe_customer = stripe.Customer.create(
-        email=session['customer_details']['email'],
-        name=session['customer_details']['name'],
-        address=session['customer_details']['address']
-    )
+@contextmanager
+def stage_timer(timings, stage):
+    """
+    Record how long the wrapped block took, in milliseconds, as `timings[stage]`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 1)
 
-    for item in cart.items.all():
-        stripe.InvoiceItem.create(
-            customer=stripe_customer.id,
-            amount=int(item.product.price * 100),
-            currency="usd",
-            description=f"{item.product.name} (Quantity: {item.quantity})"
+def create_stripe_invoice(customer_details, order):
+    """
+    Create, finalize and return the URL of the Stripe invoice of `order`.
+
+    The invoice lines are computed up front from the order items' product
+    snapshot and submitted concurrently, at most
+    STRIPE_INVOICE_ITEM_CONCURRENCY at a time, so the invoice latency does
+    not grow linearly with the number of items. Every call carries an
+    idempotency key derived from the order, so a retried job picks up the
+    objects created by the failed attempt. The duration of each stage is
+    logged.
+    """
+    key = f'order:{order.order_number}'
+    lines = [
+        {
+            'amount': int(item.price * 100),
+            'description': f"{item.product_name} (Quantity: {item.quantity})",
+            'idempotency_key': f'{key}:item:{item.pk}',
+        }
+        for item in order.items.all()
+    ]
+    timings = {}
+
+    with stage_timer(timings, 'customer'):
+        stripe_customer = stripe_gateway.create_customer(
+            email=customer_details['email'],
+            name=customer_details['name'],
+            address=customer_details['address'],
+            idempotency_key=f'{key}:customer',
         )
 
-    invoice = stripe.Invoice.create(
-        customer=stripe_customer.id,
-        collection_method='send_invoice',
-        days_until_due=30,
-        metadata={
-            'order_number': order_number
-        }
-    )
+    with stage_timer(timings, 'items'):
+        if lines:
+            workers = min(len(lines), settings.STRIPE_INVOICE_ITEM_CONCURRENCY)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # list() re-raises the first failed call.
+                list(executor.map(
+                    lambda line: stripe_gateway.create_invoice_item(customer_id=stripe_customer.id, **line),
+                    lines,
+                ))
+
+    with stage_timer(timings, 'invoice'):
+        invoice = stripe_gateway.create_invoice(
+            customer_id=stripe_customer.id,
+            metadata={'order_number': order.order_number},
+            idempotency_key=f'{key}:invoice',
+        )
 
-    stripe.Invoice.finalize_invoice(invoice.id)
+    with stage_timer(timings, 'finalize'):
+        invoice = stripe_gateway.finalize_invoice(invoice.id, idempotency_key=f'{key}:finalize')
 
+    logger.info(
+        f"Stripe invoice for order {order.order_number} ({len(lines)} items) took "
+        + ', '.join(f'{stage} {ms}ms' for stage, ms in timings.items())
+    )
     return invoice.hosted_invoice_url
 
 # Order processing from Stripe session
 def process_order_from_session(session):
-    customer_email = session['customer_details']['email']
+    """
+    Turn the cart of a completed checkout session into an order.
+
+    The cart items and their products are read once, the order items are
+    inserted with a single bulk INSERT and the stock of every product is
+    decremented by one conditional UPDATE, so the number of queries does not
+    grow with the size of the cart. If any product no longer has enough stock
+    the whole order is rolled back. The stock held for the cart at checkout
+    is taken by the decrement, so its reservations are released.
+
+    The Stripe invoice and the confirmation email are slow network calls, so
+    they are left to a background job queued with the order (see orders/jobs.py)
+    and the transaction only holds its locks for the database writes.
+    """
+    customer_details = session['customer_details']
     cart_id = session.get('metadata', {}).get('cart_id')
 
     try:
         cart = Cart.objects.get(id=cart_id)
-        total_price = calculate_total_price(cart)
-        order_number = generate_order_number()
+    except Cart.DoesNotExist:
+        logger.error(f"Cart with ID {cart_id} not found.")
+        raise serializers.ValidationError({'detail': 'Cart not found for the session.'})
 
-        with transaction.atomic():
-            order = Order.objects.create(
-                owner=cart.owner,
-                order_number=order_number,
-                total_price=total_price
-            )
+    cart_items = list(cart.items.select_related('product'))
+    total_price = calculate_total_price(cart_items)
+    order_number = generate_order_number()
 
-            for item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price * item.quantity
-                )
-                update_product_stock(item.product, item.quantity)
+    with transaction.atomic():
+        order = Order.objects.create(
+            owner_id=cart.owner_id,
+            order_number=order_number,
+            total_price=total_price
+        )
+        OrderItem.objects.bulk_create(build_order_items(order, cart_items))
 
-            cart.items.all().delete()
+        out_of_stock = decrement_stock(cart_quantities(cart_items))
+        if out_of_stock:
+            logger.error(f"Not enough stock for products {out_of_stock} in cart {cart_id}.")
+            raise serializers.ValidationError({'detail': 'Some products in the cart are out of stock.'})
 
-            invoice_url = create_stripe_invoice(session, cart, total_price, order_number)
+        cart.clear()
+        release_reservations(cart)
 
-            send_order_confirmation_email(customer_email, order, invoice_url)
+        enqueue('orders.create_invoice', {
+            'order_id': order.pk,
+            'customer_details': {
+                'email': customer_details['email'],
+                'name': customer_details.get('name'),
+                'address': customer_details.get('address'),
+            },
+        }, related=order)
 
-    except Cart.DoesNotExist:
-        logger.error(f"Cart with ID {cart_id} not found.")
-        raise serializers.ValidationError({'detail': 'Cart not found for the session.'})
+    return order
 
 # Helper functions
-def calculate_total_price(cart):
+def calculate_total_price(cart_items):
     total_price = Decimal(0)
-    for item in cart.items.all():
+    for item in cart_items:
         total_price += item.product.price * item.quantity
     return total_price
 
 def generate_order_number():
     return str(uuid.uuid4()).replace("-", "").upper()[:20]
 
-def update_product_stock(product, quantity):
-    product.stock -= quantity
-    if product.stock <= 0:
-        product.available = False
-    product.save()
+def build_order_items(order, cart_items):
+    """
+    Build the unsaved order items of `cart_items`, with their product snapshot.
+
+    `bulk_create` does not call `OrderItem.save()`, so the snapshot is taken here.
+    """
+    order_items = []
+    for item in cart_items:
+        order_item = OrderItem(
+            order=order,
+            product=item.product,
+            quantity=item.quantity,
+            price=item.product.price * item.quantity
+        )
+        order_item.take_snapshot()
+        order_items.append(order_item)
+    return order_items
+
+def cart_quantities(cart_items):
+    """
+    Total quantity of each product in `cart_items`, keyed by product ID.
+    """
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
 
 def send_order_confirmation_email(customer_email, order, invoice_url):
     subject = f"Your Order Confirmation - {order.order_number}"
@@ -214,7 +370,41 @@ def send_order_confirmation_email(customer_email, order, invoice_url):
     Best regards,
     Trade Corner Team
     """
-    try:
-        send_mail(subject, message, settings.EMAIL_HOST_USER, [customer_email], fail_silently=False)
-    except Exception as e:
-        raise serializers.ValidationError({"error": f"Failed to send confirmation email. Error: {str(e)}"})
+    return queue_mail(subject, message, settings.EMAIL_HOST_USER, [customer_email])
+
+
+def send_checkout_refund_email(customer_email, refunded):
+    subject = "We could not complete your order"
+    if refunded:
+        payment = "Your payment has been refunded in full; it can take 5-10 business days to appear on your statement."
+    else:
+        payment = "Our team will get in touch about your payment shortly."
+    message = f"""
+    Dear {customer_email},
+
+    We're sorry, but we could not complete your order after your payment
+    went through, most likely because products in your cart sold out in the
+    meantime.
+
+    {payment}
+
+    Best regards,
+    Trade Corner Team
+    """
+    return queue_mail(subject, message, settings.EMAIL_HOST_USER, [customer_email])
+
+
+def send_checkout_rejected_alert(event, error, refund_id):
+    """
+    Tell the shop about a paid checkout that did not become an order.
+    """
+    session = event.payload['data']['object']
+    subject = f"Checkout rejected after payment - {event.event_id}"
+    message = f"""
+    The checkout session {session.get('id')} of cart {session.get('metadata', {}).get('cart_id')} was paid,
+    but no order could be created: {error}
+
+    Refund: {refund_id or 'none issued, the payment needs manual handling'}
+    Customer: {session['customer_details'].get('email')}
+    """
+    return queue_mail(subject, message, settings.EMAIL_HOST_USER, [settings.EMAIL_HOST_USER])
@@ -0,0 +1,123 @@
+import logging
+import time
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from jobs.queue import retry_delay
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Queue an email for the outbox sender; a drop-in for `send_mail`.
+
+    Only a row is inserted, in the caller's transaction, so request handlers
+    never wait on SMTP and an email is only sent if the change it reports
+    is committed.
+
+    Args:
+        subject (str): The subject line.
+        message (str): The plain text body.
+        from_email (str): The sender, or None for DEFAULT_FROM_EMAIL.
+        recipient_list (list): The recipient addresses.
+
+    Returns:
+        OutgoingEmail: The queued email.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or '',
+        recipients=[address for address in recipient_list if address],
+    )
+
+
+class RateLimiter:
+    """
+    Space calls to `wait` at least `1 / rate` seconds apart.
+    """
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self.next_at = None
+
+    def wait(self):
+        now = self.clock()
+        if self.next_at is not None and now < self.next_at:
+            self.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def send_pending(batch_size=50, rate=None, connection=None):
+    """
+    Send one batch of due emails over a single email backend connection.
+
+    The connection is opened once for the batch and reused for every
+    message. Each message is handed to `send_messages` on its own so that a
+    failure is recorded against that email only; it is retried with
+    exponential backoff until `max_attempts`, then marked as failed. If the
+    connection cannot be opened, every claimed email is recorded as failed
+    this way.
+
+    Args:
+        batch_size (int): Maximum number of emails to send.
+        rate (float): Maximum messages per second, or None for no limit.
+        connection: An email backend connection; EMAIL_BACKEND by default.
+
+    Returns:
+        tuple: The number of emails sent and failed.
+    """
+    emails = OutgoingEmail.objects.claim(batch_size)
+    if not emails:
+        return 0, 0
+    limiter = RateLimiter(rate)
+    sent = failed = 0
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.exception(f'Opening the email connection failed; {len(emails)} email(s) put back.')
+        for email in emails:
+            record_failure(email, exc)
+        return 0, len(emails)
+    try:
+        for email in emails:
+            limiter.wait()
+            message = EmailMessage(
+                email.subject, email.body, email.from_email or None, email.recipients, connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                logger.exception(f'Sending email {email.pk} failed on attempt {email.attempts}.')
+                record_failure(email, exc)
+                failed += 1
+            else:
+                email.status = OutgoingEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                email.locked_at = None
+                email.save(update_fields=['status', 'send_after', 'sent_at', 'locked_at', 'last_error'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def record_failure(email, exc):
+    """
+    Release a claimed email after a failed attempt: back to pending with
+    backoff, or failed once it used `max_attempts`.
+    """
+    email.last_error = str(exc)
+    if email.attempts >= email.max_attempts:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.status = OutgoingEmail.PENDING
+        email.send_after = timezone.now() + retry_delay(email.attempts)
+    email.locked_at = None
+    email.save(update_fields=['status', 'send_after', 'sent_at', 'locked_at', 'last_error'])
@@ -0,0 +1,46 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from outbox.mail import send_pending
+
+
+class Command(BaseCommand):
+    """
+    Deliver the emails queued in the outbox.
+
+    Due emails are sent in batches, each batch over one connection of the
+    configured EMAIL_BACKEND, at most `--rate` messages per second. With
+    `--once` the command exits as soon as no email is due.
+    """
+    help = 'Send queued outbox emails (with --once, exit when the outbox is empty).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no email is due instead of polling for new ones.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Number of emails sent over one connection.',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=settings.EMAIL_OUTBOX_RATE_LIMIT,
+            help='Maximum messages per second (0 for no limit).',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5.0,
+            help='Seconds to wait before polling an empty outbox again.',
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_pending(options['batch_size'], options['rate'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} email(s), {total_failed} failed.'))
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from django.db import models, transaction
+from django.utils import timezone
+
+# A claimed email not sent within this delay (e.g. the sender was killed)
+# is picked up again.
+EMAIL_LOCK_TIMEOUT = timedelta(minutes=10)
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    """
+    QuerySet for OutgoingEmail with the queries used by the sender.
+    """
+
+    def due(self, now=None):
+        """
+        Filter the emails ready to send: pending emails whose `send_after`
+        has passed, and claimed emails whose lock has expired with attempts
+        left.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status=OutgoingEmail.PENDING, send_after__lte=now)
+            | models.Q(
+                status=OutgoingEmail.SENDING, locked_at__lt=now - EMAIL_LOCK_TIMEOUT,
+                attempts__lt=models.F('max_attempts'),
+            )
+        )
+
+    def abandoned(self, now=None):
+        """
+        Filter the claimed emails whose lock expired on their last attempt.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            status=OutgoingEmail.SENDING, locked_at__lt=now - EMAIL_LOCK_TIMEOUT,
+            attempts__gte=models.F('max_attempts'),
+        )
+
+    def claim(self, limit):
+        """
+        Mark up to `limit` due emails as being sent and return them.
+
+        Emails abandoned on their last attempt are marked as failed first.
+
+        Args:
+            limit (int): Maximum number of emails to claim.
+
+        Returns:
+            list: The claimed emails, oldest first.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            self.abandoned(now).update(
+                status=OutgoingEmail.FAILED, locked_at=None, last_error='Abandoned on its last attempt.',
+            )
+            ids = list(
+                self.due(now).order_by('send_after', 'id')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            self.filter(pk__in=ids).update(
+                status=OutgoingEmail.SENDING, locked_at=now, attempts=models.F('attempts') + 1,
+            )
+        return list(self.filter(pk__in=ids).order_by('send_after', 'id'))
+
+class OutgoingEmail(models.Model):
+    """
+    An email queued by a request and delivered by `manage.py send_outbox`.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    send_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['send_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'send_after', 'id'], name='email_status_send_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {", ".join(self.recipients)} ({self.status})'
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .mail import RateLimiter, queue_mail, send_pending
+from .models import EMAIL_LOCK_TIMEOUT, OutgoingEmail
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP down')
+
+
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('SMTP unreachable')
+
+
+class OutboxTests(TestCase):
+    def test_queue_mail_does_not_send(self):
+        email = queue_mail('Subject', 'Body', None, ['a@example.com', None])
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertEqual(email.recipients, ['a@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_send_pending_reuses_one_connection(self):
+        """
+        Ensure a batch is delivered over a single connection.
+        """
+        for index in range(3):
+            queue_mail(f'Subject {index}', 'Body', 'shop@example.com', [f'{index}@example.com'])
+        CountingBackend.opened = 0
+        self.assertEqual(send_pending(connection=CountingBackend()), (3, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual([message.subject for message in mail.outbox], ['Subject 0', 'Subject 1', 'Subject 2'])
+        self.assertEqual(mail.outbox[0].from_email, 'shop@example.com')
+        self.assertFalse(OutgoingEmail.objects.exclude(status=OutgoingEmail.SENT).exists())
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_failed_email_is_retried_later(self):
+        email = queue_mail('Subject', 'Body', None, ['a@example.com'])
+        self.assertEqual(send_pending(connection=FailingBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertGreater(email.send_after, timezone.now())
+        self.assertEqual(email.last_error, 'SMTP down')
+
+        OutgoingEmail.objects.update(send_after=timezone.now() - timedelta(seconds=1), attempts=4)
+        self.assertEqual(send_pending(connection=FailingBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+
+    def test_connection_failure_puts_the_batch_back(self):
+        """
+        Ensure emails claimed for a connection that cannot be opened are retried later.
+        """
+        for index in range(2):
+            queue_mail(f'Subject {index}', 'Body', None, [f'{index}@example.com'])
+        with self.assertLogs('outbox.mail', level='ERROR'):
+            self.assertEqual(send_pending(connection=UnreachableBackend()), (0, 2))
+        for email in OutgoingEmail.objects.all():
+            self.assertEqual((email.status, email.attempts, email.locked_at), (OutgoingEmail.PENDING, 1, None))
+            self.assertGreater(email.send_after, timezone.now())
+            self.assertEqual(email.last_error, 'SMTP unreachable')
+
+    def test_email_abandoned_on_its_last_attempt_fails(self):
+        """
+        Ensure an expired claim is not retried once the email used all its attempts.
+        """
+        stale = timezone.now() - EMAIL_LOCK_TIMEOUT - timedelta(seconds=1)
+        last = queue_mail('Last', 'Body', None, ['a@example.com'])
+        retried = queue_mail('Retried', 'Body', None, ['b@example.com'])
+        OutgoingEmail.objects.filter(pk=last.pk).update(status=OutgoingEmail.SENDING, locked_at=stale, attempts=5)
+        OutgoingEmail.objects.filter(pk=retried.pk).update(status=OutgoingEmail.SENDING, locked_at=stale, attempts=2)
+        self.assertEqual(send_pending(), (1, 0))
+        last.refresh_from_db()
+        self.assertEqual((last.status, last.locked_at), (OutgoingEmail.FAILED, None))
+        self.assertEqual([message.subject for message in mail.outbox], ['Retried'])
+
+    def test_rate_limiter_spaces_messages(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limiter.wait()
+        self.assertEqual(sleeps, [0.25, 0.25])
+
+    def test_send_outbox_command(self):
+        queue_mail('Subject', 'Body', None, ['a@example.com'])
+        out = StringIO()
+        with patch('outbox.mail.time.sleep'):
+            call_command('send_outbox', once=True, stdout=out)
+        self.assertIn('Sent 1 email(s), 0 failed.', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,82 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from reviews.models import Review
+from .models import Product
+
+
+def apply_review_delta(product_id, count_delta, rating_delta):
+    """
+    Atomically adjust the stored review aggregates of a single product.
+
+    The update is expressed with F() so concurrent review writes never
+    overwrite each other's increments.
+
+    Args:
+        product_id (int): The ID of the product whose aggregates change.
+        count_delta (int): Change to apply to `review_count`.
+        rating_delta (int): Change to apply to `rating_sum`.
+    """
+    if not count_delta and not rating_delta:
+        return
+    Product.objects.filter(pk=product_id).update(
+        review_count=F('review_count') + count_delta,
+        rating_sum=F('rating_sum') + rating_delta,
+    )
+
+
+def _review_subquery(aggregate):
+    return Coalesce(
+        Subquery(
+            Review.objects.filter(product=OuterRef('pk'))
+            .order_by()
+            .values('product')
+            .annotate(value=aggregate)
+            .values('value'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def rebuild_review_aggregates(queryset=None):
+    """
+    Recompute `review_count` and `rating_sum` from the reviews table.
+
+    Runs as a single UPDATE statement with correlated subqueries.
+
+    Args:
+        queryset (QuerySet, optional): Products to rebuild. Defaults to all.
+
+    Returns:
+        int: The number of products updated.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    return queryset.update(
+        review_count=_review_subquery(Count('id')),
+        rating_sum=_review_subquery(Sum('rating')),
+    )
+
+
+def find_review_aggregate_mismatches(queryset=None):
+    """
+    Compare the stored review aggregates against the reviews table.
+
+    Args:
+        queryset (QuerySet, optional): Products to check. Defaults to all.
+
+    Returns:
+        list: Dicts with the stored and actual values for every product
+        whose aggregates have drifted.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    rows = queryset.order_by('pk').annotate(
+        actual_count=_review_subquery(Count('id')),
+        actual_sum=_review_subquery(Sum('rating')),
+    ).values('pk', 'review_count', 'rating_sum', 'actual_count', 'actual_sum')
+    return [
+        row for row in rows
+        if row['review_count'] != row['actual_count']
+        or row['rating_sum'] != row['actual_sum']
+    ]
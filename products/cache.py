@@ -0,0 +1,156 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from drf_api.fieldsets import SparseFieldset
+from .models import Product
+
+CATALOGUE_VERSION_KEY = 'products:version'
+LIST_VERSION_KEY = 'products:list:version'
+DETAIL_VERSION_KEY = 'products:detail:{pk}:version'
+RESPONSE_KEY = 'products:response:{kind}:{version}:{digest}'
+
+
+def _get_versions(keys):
+    """
+    Return the current version of each key, creating missing ones.
+
+    Versions start from a nanosecond timestamp rather than 1, so a version
+    key that was evicted never comes back with a value an old entry used.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def _bump_now_and_on_commit(keys):
+    # Bumping again after commit evicts anything cached by a concurrent
+    # request that read the rows before this transaction committed.
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_products(product_ids=()):
+    """
+    Invalidate cached product lists and the detail responses of `product_ids`.
+    """
+    keys = [LIST_VERSION_KEY]
+    keys.extend(DETAIL_VERSION_KEY.format(pk=pk) for pk in product_ids)
+    _bump_now_and_on_commit(keys)
+
+
+def invalidate_all_products():
+    """
+    Invalidate every cached product response, e.g. after a bulk rebuild.
+    """
+    _bump_now_and_on_commit([CATALOGUE_VERSION_KEY])
+
+
+def invalidate_owner_products(owner_id):
+    """
+    Invalidate cached product lists and every product detail of one owner.
+    """
+    invalidate_products(Product.objects.filter(owner_id=owner_id).values_list('pk', flat=True))
+
+
+def anonymize(data):
+    """
+    Reset the per-user fields of a product payload so it can be shared.
+    """
+    for item in _product_items(data):
+        if 'is_owner' in item:
+            item['is_owner'] = False
+    return data
+
+
+def personalize(data, user):
+    """
+    Fill the per-user fields of a shared product payload for `user`.
+    """
+    if user.is_authenticated:
+        for item in _product_items(data):
+            if 'is_owner' in item:
+                item['is_owner'] = item.get('owner') == user.username
+    return data
+
+
+def _product_items(data):
+    if isinstance(data, dict) and 'results' in data:
+        return data['results']
+    return [data]
+
+
+class ProductResponseCacheMixin:
+    """
+    Cache successful `list` and `retrieve` responses of product views.
+
+    Payloads are stored as anonymous responses and keyed by the full request
+    URI (so filters, search, ordering and page are part of the key) and by
+    version counters that the signal receivers in `products.signals` bump
+    whenever a Product, Review or Profile changes. `is_owner` is filled in
+    per request, so anonymous and logged-in traffic share the same entries.
+    """
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request, LIST_VERSION_KEY, 'list')
+        return self.cached_response(key, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        key = self.get_response_cache_key(request, DETAIL_VERSION_KEY.format(pk=lookup), 'detail')
+        return self.cached_response(key, super().retrieve, request, *args, **kwargs)
+
+    def get_cached_validators(self, request, compute):
+        """
+        Return the conditional GET validators of a detail request, cached like its response.
+
+        The entry sits under the same product version as the response, so it is
+        replaced whenever the queries `compute` runs could give a new answer.
+        """
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        kind = f'validators:{request.user.pk}:{request.accepted_media_type}'
+        key = self.get_response_cache_key(request, DETAIL_VERSION_KEY.format(pk=lookup), kind)
+        validators = cache.get(key)
+        if validators is None:
+            validators = compute(request)
+            cache.set(key, validators, settings.PRODUCT_CACHE_TIMEOUT)
+        return validators
+
+    def cached_response(self, key, handler, request, *args, **kwargs):
+        # `is_owner` is restored from `owner`, so it cannot be shared without it.
+        if SparseFieldset.from_request(request).fields_at('', ['owner', 'is_owner']) == ['is_owner']:
+            return handler(request, *args, **kwargs)
+        data = cache.get(key)
+        if data is not None:
+            return Response(personalize(data, request.user))
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, anonymize(_copy(response.data)), settings.PRODUCT_CACHE_TIMEOUT)
+        return response
+
+    def get_response_cache_key(self, request, version_key, kind):
+        versions = _get_versions([CATALOGUE_VERSION_KEY, version_key])
+        digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        return RESPONSE_KEY.format(kind=kind, version='.'.join(map(str, versions)), digest=digest)
+
+
+def _copy(data):
+    if isinstance(data, dict):
+        return {key: _copy(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_copy(value) for value in data]
+    return data
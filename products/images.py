@@ -0,0 +1,124 @@
+import hashlib
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+# Rendition name -> (width, height, crop). Cropped renditions fill the box
+# exactly; the others are scaled down to fit in it and never scaled up.
+RENDITIONS = {
+    'thumbnail': (200, 200, True),
+    'card': (600, 600, False),
+    'full': (1600, 1600, False),
+}
+# File extension -> (Pillow format, save options) of every rendition.
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+class HeaderOnlyImageField(serializers.ImageField):
+    """
+    ImageField that checks uploads by parsing only the image header.
+
+    DRF's ImageField validates with Django's form field, which has Pillow
+    `verify()` the whole file inside the request. Opening the file is enough
+    to read its format and dimensions from the header; the pixels are only
+    decoded by the rendition job. Like Django's field, the opened image is
+    attached to the file as `image` and its MIME type as `content_type`.
+    """
+
+    def to_internal_value(self, data):
+        file_object = serializers.FileField.to_internal_value(self, data)
+        try:
+            with Image.open(file_object) as image:
+                file_object.image = image
+                file_object.content_type = Image.MIME.get(image.format)
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        finally:
+            file_object.seek(0)
+        return file_object
+
+
+def needs_renditions(product):
+    """
+    Whether the product has an uploaded image its renditions were not made from.
+
+    The default image has no renditions; clients show `image` instead.
+    """
+    image = product.image
+    default = product._meta.get_field('image').default
+    return bool(image.name) and image.name != default and (
+        product.image_renditions.get('source') != image.name
+    )
+
+
+def render_image(image_file, prefix):
+    """
+    Save every rendition of an image, in every format, to the default storage.
+
+    Args:
+        image_file (File): The original image.
+        prefix (str): Storage path the rendition file names start with.
+
+    Returns:
+        dict: Storage names of the files by rendition and format.
+    """
+    with Image.open(image_file) as original:
+        original = ImageOps.exif_transpose(original).convert('RGB')
+        names = {}
+        for rendition, (width, height, crop) in RENDITIONS.items():
+            if crop:
+                image = ImageOps.fit(original, (width, height), Image.LANCZOS)
+            else:
+                image = original.copy()
+                image.thumbnail((width, height), Image.LANCZOS)
+            names[rendition] = {}
+            for extension, (image_format, options) in RENDITION_FORMATS.items():
+                buffer = BytesIO()
+                image.save(buffer, image_format, **options)
+                names[rendition][extension] = default_storage.save(
+                    f'{prefix}-{rendition}.{extension}', ContentFile(buffer.getvalue())
+                )
+    return names
+
+
+def render_product_renditions(product):
+    """
+    Render the renditions of a product's current image.
+
+    Returns:
+        dict: The value for `Product.image_renditions`: the storage names of
+        the files (see `render_image`) and the image name they were made from.
+    """
+    source = product.image.name
+    digest = hashlib.md5(source.encode('utf-8')).hexdigest()[:12]
+    with product.image.open('rb') as image_file:
+        renditions = render_image(image_file, f'renditions/products/{product.pk}/{digest}')
+    renditions['source'] = source
+    return renditions
+
+
+def delete_renditions(renditions):
+    for rendition in RENDITIONS:
+        for name in renditions.get(rendition, {}).values():
+            default_storage.delete(name)
+
+
+def rendition_urls(product):
+    """
+    URLs of the renditions of a product's image, by rendition and format.
+
+    Returns:
+        dict: The URLs, or None while the current image has no renditions yet.
+    """
+    renditions = product.image_renditions
+    if not renditions or renditions.get('source') != product.image.name:
+        return None
+    return {
+        rendition: {extension: default_storage.url(name) for extension, name in renditions[rendition].items()}
+        for rendition in RENDITIONS
+    }
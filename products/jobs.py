@@ -0,0 +1,33 @@
+from django.utils import timezone
+from jobs.registry import register
+from .cache import invalidate_products
+from .images import delete_renditions, needs_renditions, render_product_renditions
+from .models import Product
+
+
+@register('products.render_image')
+def render_product_image(product_id):
+    """
+    Generate the renditions of a product's image and record them on the product.
+
+    The renditions are only recorded if the product still has the image they
+    were made from; otherwise they are deleted and the job queued for the
+    newer image renders it. The files of the previous renditions are deleted
+    once the new ones are recorded.
+
+    Args:
+        product_id (int): The ID of the product.
+    """
+    product = Product.objects.filter(pk=product_id).only('image', 'image_renditions').first()
+    if product is None or not needs_renditions(product):
+        return
+    renditions = render_product_renditions(product)
+    updated = Product.objects.filter(pk=product.pk, image=renditions['source']).update(
+        image_renditions=renditions, updated_at=timezone.now(),
+    )
+    if not updated:
+        delete_renditions(renditions)
+        return
+    # update() sends no signals, so the cached responses are dropped here.
+    invalidate_products([product.pk])
+    delete_renditions(product.image_renditions)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.cache import invalidate_all_products
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the product full-text search index from the products table.
+    """
+    help = 'Rebuild the product full-text search index.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+            invalidate_all_products()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the product search index with {type(backend).__name__}.'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from products.cache import invalidate_all_products
+from products.aggregates import (
+    find_review_aggregate_mismatches, rebuild_review_aggregates,
+)
+
+
+class Command(BaseCommand):
+    """
+    Rebuild or verify the review aggregates stored on each product.
+
+    Without options the stored `review_count` and `rating_sum` columns are
+    recomputed from the reviews table. With `--verify` nothing is written and
+    the command fails if any product's stored values have drifted.
+    """
+    help = 'Rebuild (or verify with --verify) the review aggregates stored on products.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare stored aggregates with the reviews table.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = find_review_aggregate_mismatches()
+            for row in mismatches:
+                self.stderr.write(
+                    f"Product {row['pk']}: stored {row['review_count']} reviews / "
+                    f"{row['rating_sum']} rating sum, actual {row['actual_count']} / "
+                    f"{row['actual_sum']}"
+                )
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} product(s) have stale review aggregates.')
+            self.stdout.write(self.style.SUCCESS('Review aggregates are consistent.'))
+            return
+
+        with transaction.atomic():
+            updated = rebuild_review_aggregates()
+            invalidate_all_products()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt review aggregates for {updated} product(s).'))
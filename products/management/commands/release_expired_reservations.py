@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from products.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    """
+    Delete the stock reservations that have expired.
+
+    Expired holds already stop counting against the available stock; this
+    sweeper keeps the reservations table small. Run it periodically, e.g.
+    from a scheduler every few minutes.
+    """
+    help = 'Delete expired stock reservations.'
+
+    def handle(self, *args, **options):
+        deleted = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Released {deleted} expired reservation(s).'))
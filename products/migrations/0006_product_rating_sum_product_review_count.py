@@ -0,0 +1,50 @@
+# Generated by Django 5.0.7 on 2026-10-17 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_review_aggregates(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Review = apps.get_model("reviews", "Review")
+
+    def review_subquery(aggregate):
+        return Coalesce(
+            Subquery(
+                Review.objects.filter(product=OuterRef("pk"))
+                .order_by()
+                .values("product")
+                .annotate(value=aggregate)
+                .values("value"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Product.objects.update(
+        review_count=review_subquery(Count("id")),
+        rating_sum=review_subquery(Sum("rating")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_category_product_size"),
+        ("reviews", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_review_aggregates, migrations.RunPython.noop),
+    ]
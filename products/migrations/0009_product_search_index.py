@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE products_product ADD COLUMN search_vector tsvector"
+        )
+        schema_editor.execute(
+            "CREATE INDEX products_product_search_idx "
+            "ON products_product USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            """
+            UPDATE products_product
+            SET search_vector =
+                setweight(to_tsvector('english', coalesce(products_product.name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(auth_user.username, '')), 'B')
+                || setweight(to_tsvector('english', coalesce(products_product.description, '')), 'C')
+            FROM auth_user
+            WHERE auth_user.id = products_product.owner_id
+            """
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE products_product_fts "
+            "USING fts5(name, owner, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            """
+            INSERT INTO products_product_fts (rowid, name, owner, description)
+            SELECT products_product.id, products_product.name, auth_user.username,
+                   products_product.description
+            FROM products_product
+            INNER JOIN auth_user ON auth_user.id = products_product.owner_id
+            """
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS products_product_search_idx")
+        schema_editor.execute(
+            "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_product_product_owner_created_idx_and_more"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_stockreservation_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Storage names of the resized copies of the image; see products/images.py.'),
+        ),
+    ]
@@ -1,5 +1,87 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# ProductSerializer fields read from the owner's profile.
+OWNER_PROFILE_FIELDS = {
+    'profile_id', 'profile_image', 'street_address', 'city', 'state',
+    'postal_code', 'country', 'phone_number',
+}
+# Columns that may be left out of the SELECT when their field is not serialized.
+DEFERRABLE_FIELDS = [
+    'updated_at', 'name', 'description', 'price', 'stock', 'image', 'image_filter',
+    'image_renditions', 'category', 'size',
+]
+
+class ProductQuerySet(models.QuerySet):
+    """
+    QuerySet for Product with the joins needed by ProductSerializer.
+    """
+
+    def for_serializer(self, fieldset=None, path=''):
+        """
+        Join the owner and the owner's profile in the same query.
+
+        ProductSerializer reads `owner.username` and several `owner.profile`
+        fields; review statistics come from columns on the product itself, so
+        a page of products serializes without any per-row queries.
+
+        Args:
+            fieldset (SparseFieldset): The fields requested with `?fields=` /
+                `?omit=`, or None for all of them. Joins and columns that no
+                requested field reads are left out.
+            path (str): Dotted path of the ProductSerializer in the response.
+        """
+        if fieldset is None or not fieldset.is_sparse:
+            return self.select_related('owner__profile')
+        fields = set(fieldset.fields_at(path, [
+            'owner', 'is_owner', 'review_count', 'average_rating',
+            *OWNER_PROFILE_FIELDS, *DEFERRABLE_FIELDS,
+        ]))
+        queryset = self
+        if fields & OWNER_PROFILE_FIELDS:
+            queryset = queryset.select_related('owner__profile')
+        elif 'owner' in fields:
+            queryset = queryset.select_related('owner')
+        deferred = [name for name in DEFERRABLE_FIELDS if name not in fields]
+        if 'image_renditions' in fields and 'image' in deferred:
+            # Rendition URLs are only served for the current image.
+            deferred.remove('image')
+        if 'average_rating' not in fields:
+            deferred.append('rating_sum')
+            if 'review_count' not in fields:
+                deferred.append('review_count')
+        return queryset.defer(*deferred) if deferred else queryset
+
+    def with_available_stock(self, exclude_cart=None):
+        """
+        Annotate `available_stock`: the stock minus the units held by active
+        reservations, optionally ignoring those of `exclude_cart`.
+        """
+        reservations = StockReservation.objects.all()
+        if exclude_cart is not None:
+            reservations = reservations.exclude(cart=exclude_cart)
+        return self.annotate(available_stock=models.F('stock') - reservations.held_quantity())
+
+    def validator_querysets(self):
+        """
+        Querysets whose timestamps and ids determine how these products serialize.
+
+        Returns:
+            list: `(queryset, timestamp field)` pairs for the products, their
+            reviews (which feed the review statistics) and their owners' profiles,
+            as used by `drf_api.mixins.ConditionalGetMixin`.
+        """
+        from profiles.models import Profile
+        from reviews.models import Review
+
+        products = self.order_by().values('pk')
+        return [
+            (self, 'updated_at'),
+            (Review.objects.filter(product__in=products), 'updated_at'),
+            (Profile.objects.filter(owner__products__in=products), 'updated_at'),
+        ]
 
 class Product(models.Model):
     """
@@ -42,15 +124,134 @@ class Product(models.Model):
     image_filter = models.CharField(
         max_length=32, choices=image_filter_choices, default='normal'
     )
+    image_renditions = models.JSONField(
+        default=dict, blank=True, editable=False,
+        help_text='Storage names of the resized copies of the image; see products/images.py.',
+    )
     category = models.CharField(
         max_length=50, choices=CATEGORY_CHOICES, default='women'
     )
     size = models.CharField(
         max_length=2, choices=SIZE_CHOICES, blank=True, null=True
     )
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
+    # Columns written only by conditional UPDATEs: the review aggregates
+    # (products/aggregates.py) and the renditions of the rendition job.
+    DERIVED_FIELDS = ('review_count', 'rating_sum', 'image_renditions')
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='product_owner_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_category_created_idx'),
+            models.Index(fields=['size', '-created_at', '-id'], name='product_size_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.id} {self.name}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored image name, so saves can tell a new image from an old one
+        # (see `products.signals.queue_image_renditions`).
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'image' in fields:
+            self._loaded_image = self.image.name
+
+    def save(self, *args, force_insert=False, update_fields=None, **kwargs):
+        """
+        Save the product without overwriting its derived columns.
+
+        A full save of a loaded product writes every column with the values
+        it was read with, which would undo a review or a rendition stored
+        since. Unless `update_fields` says otherwise, saving an existing
+        product therefore leaves out `DERIVED_FIELDS` (and, like Django,
+        the deferred fields). Creating a product saves every column.
+        """
+        if update_fields is None and not force_insert and not self._state.adding:
+            skipped = set(self.DERIVED_FIELDS) | self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped and field.name not in skipped
+            ]
+        super().save(*args, force_insert=force_insert, update_fields=update_fields, **kwargs)
+        if update_fields is None or 'image' in update_fields:
+            self._loaded_image = self.image.name
+
+    @property
+    def average_rating(self):
+        """
+        Average review rating, derived from the stored review aggregates.
+
+        Returns:
+            float: The average rating, or 0 if the product has no reviews.
+        """
+        if not self.review_count:
+            return 0
+        return self.rating_sum / self.review_count
+
+class StockReservationQuerySet(models.QuerySet):
+    """
+    QuerySet for StockReservation.
+    """
+
+    def active(self, now=None):
+        """
+        Filter the reservations that have not expired.
+        """
+        return self.filter(expires_at__gt=now or timezone.now())
+
+    def held_quantity(self, product_ref='pk', now=None):
+        """
+        Subquery summing the active reservations of the outer query's product.
+
+        Args:
+            product_ref (str): Field of the outer query holding the product ID.
+        """
+        return Coalesce(
+            models.Subquery(
+                self.active(now).filter(product=models.OuterRef(product_ref)).order_by()
+                .values('product').annotate(held=models.Sum('quantity')).values('held'),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        )
+
+class StockReservation(models.Model):
+    """
+    A hold on `quantity` units of a product for a cart during checkout.
+
+    Held units are not available to other buyers until the reservation
+    expires, is released or is converted into a stock decrement when the
+    order is created.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    cart = models.ForeignKey('cart.Cart', on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockReservationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='reservation_cart_product_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_exp_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product_id} for cart {self.cart_id} until {self.expires_at}'
@@ -0,0 +1,220 @@
+import re
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+SQLITE_FTS_TABLE = 'products_product_fts'
+POSTGRES_SEARCH_CONFIG = 'english'
+# Product fields a search entry is built from; saves limited to other
+# fields (`update_fields`) leave the entry alone.
+SEARCH_SOURCE_FIELDS = {'name', 'description', 'category', 'owner', 'owner_id'}
+
+
+class PostgresProductSearch:
+    """
+    Product search on a weighted `tsvector` column with a GIN index.
+
+    The `search_vector` column is created by migration rather than declared on
+    the model, and is filled from the product name (weight A), the owner's
+    username (weight B) and the description (weight C).
+    """
+
+    def index(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE products_product
+                SET search_vector =
+                    setweight(to_tsvector(%s, coalesce(products_product.name, '')), 'A')
+                    || setweight(to_tsvector(%s, coalesce(auth_user.username, '')), 'B')
+                    || setweight(to_tsvector(%s, coalesce(products_product.description, '')), 'C')
+                FROM auth_user
+                WHERE auth_user.id = products_product.owner_id
+                AND products_product.id = ANY(%s)
+                """,
+                [POSTGRES_SEARCH_CONFIG] * 3 + [list(product_ids)],
+            )
+
+    def remove(self, product_ids):
+        # The vector lives on the product row and goes away with it.
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM products_product')
+            self.index([row[0] for row in cursor.fetchall()])
+
+    def search(self, queryset, term):
+        tsquery = self.build_query(term)
+        if tsquery is None:
+            return queryset.none()
+        query = f"to_tsquery('{POSTGRES_SEARCH_CONFIG}', %s)"
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT id FROM products_product WHERE search_vector @@ {query}', [tsquery])
+        ).annotate(
+            # ts_rank_cd returns a real; as a double it round-trips exactly
+            # through keyset cursors (see drf_api.pagination.KeysetPagination).
+            search_rank=RawSQL(
+                f'ts_rank_cd(products_product.search_vector, {query})::float8', [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    @staticmethod
+    def build_query(term):
+        """
+        Turn free text into a `to_tsquery` expression matching every word.
+
+        The last word is matched as a prefix (`:*`), so a search typed as far
+        as "leather jack" already finds "Leather jacket".
+
+        Returns:
+            str: The tsquery text, or None if the term has no words.
+        """
+        words = re.findall(r'\w+', term)
+        if not words:
+            return None
+        return ' & '.join(f"'{word}'" for word in words) + ':*'
+
+
+class SQLiteProductSearch:
+    """
+    Product search on an FTS5 virtual table, for development on SQLite.
+
+    The table is keyed by product id (its rowid) and ranked with bm25, giving
+    the name ten times and the owner's username five times the weight of the
+    description.
+    """
+    rank_sql = f'-bm25({SQLITE_FTS_TABLE}, 10.0, 5.0, 1.0)'
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid IN ({placeholders})', product_ids
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {SQLITE_FTS_TABLE} (rowid, name, owner, description)
+                SELECT products_product.id, products_product.name, auth_user.username,
+                       products_product.description
+                FROM products_product
+                INNER JOIN auth_user ON auth_user.id = products_product.owner_id
+                WHERE products_product.id IN ({placeholders})
+                """,
+                product_ids,
+            )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid IN ({placeholders})', product_ids
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_FTS_TABLE}')
+            cursor.execute(
+                f"""
+                INSERT INTO {SQLITE_FTS_TABLE} (rowid, name, owner, description)
+                SELECT products_product.id, products_product.name, auth_user.username,
+                       products_product.description
+                FROM products_product
+                INNER JOIN auth_user ON auth_user.id = products_product.owner_id
+                """
+            )
+
+    def search(self, queryset, term):
+        match = self.build_match(term)
+        if match is None:
+            return queryset.none()
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', [match]
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT {self.rank_sql} FROM {SQLITE_FTS_TABLE} '
+                f'WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = products_product.id',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    @staticmethod
+    def build_match(term):
+        """
+        Turn free text into an FTS5 query matching every word as a prefix.
+
+        Returns:
+            str: The MATCH expression, or None if the term has no words.
+        """
+        words = re.findall(r'\w+', term)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"*' for word in words)
+
+
+class LikeProductSearch:
+    """
+    Unindexed fallback for databases without a full-text engine.
+    """
+
+    def index(self, product_ids):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, term):
+        condition = Q()
+        for word in term.split():
+            condition &= (
+                Q(name__icontains=word)
+                | Q(description__icontains=word)
+                | Q(owner__username__icontains=word)
+            )
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def get_search_backend():
+    """
+    Return the product search backend for the default database.
+    """
+    if connection.vendor == 'postgresql':
+        return PostgresProductSearch()
+    if connection.vendor == 'sqlite':
+        return SQLiteProductSearch()
+    return LikeProductSearch()
+
+
+class ProductSearchFilter(filters.BaseFilterBackend):
+    """
+    Filter backend running `?search=` through the product full-text index.
+
+    Matches are ordered by relevance, newest first among equal ranks, unless
+    the request asks for an explicit `?ordering=`.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        queryset = get_search_backend().search(queryset, term)
+        if not request.query_params.get(self.ordering_param):
+            queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+        return queryset
@@ -1,15 +1,17 @@
 from rest_framework import serializers
+from drf_api.fieldsets import SparseFieldsetMixin
+from .images import HeaderOnlyImageField, rendition_urls
 from .models import Product
-from reviews.models import Review
-from django.db.models import Avg
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Product instances.
 
     This serializer provides detailed information about products, including owner
     details, location, and review statistics. It includes various read-only fields
-    to display related user profile information and computed fields for reviews.
+    to display related user profile information. Review statistics are read from
+    the aggregates stored on the product rather than computed per row.
+    Read requests can narrow the output with `?fields=` / `?omit=`.
     """
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
@@ -21,13 +23,17 @@ class ProductSerializer(serializers.ModelSerializer):
     postal_code = serializers.ReadOnlyField(source='owner.profile.postal_code')
     country = serializers.SerializerMethodField()
     phone_number = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
-    average_rating = serializers.SerializerMethodField()
+    review_count = serializers.ReadOnlyField()
+    average_rating = serializers.ReadOnlyField()
+    image = HeaderOnlyImageField(required=False)
+    image_renditions = serializers.SerializerMethodField()
 
     def validate_image(self, value):
         """
         Validate the image field to ensure the file size and dimensions are within acceptable limits.
 
+        The dimensions come from the image header; the upload is not decoded.
+
         Raises:
             ValidationError: If the image exceeds the size or dimension constraints.
         """
@@ -47,7 +53,17 @@ class ProductSerializer(serializers.ModelSerializer):
             bool: True if the request user is the owner, otherwise False.
         """
         request = self.context['request']
-        return request.user == obj.owner if request else False
+        return request.user.is_authenticated and obj.owner_id == request.user.pk if request else False
+
+    def get_image_renditions(self, obj):
+        """
+        Retrieve the URLs of the resized copies of the product image.
+
+        Returns:
+            dict: URLs by rendition ('thumbnail', 'card', 'full') and format
+            ('webp', 'jpeg'), or None until they are generated for the current image.
+        """
+        return rendition_urls(obj)
 
     def get_phone_number(self, obj):
         """
@@ -67,30 +83,29 @@ class ProductSerializer(serializers.ModelSerializer):
         """
         return obj.owner.profile.country.name if obj.owner.profile.country else None
 
-    def get_review_count(self, obj):
-        """
-        Calculate the total number of reviews for the product.
-
-        Returns:
-            int: The count of reviews associated with the product.
-        """
-        return obj.reviews.count()
-
-    def get_average_rating(self, obj):
-        """
-        Calculate the average rating of the product based on its reviews.
-
-        Returns:
-            float: The average rating of the product, or 0 if there are no reviews.
-        """
-        return obj.reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-
     class Meta:
         model = Product
         fields = [
             'id', 'owner', 'is_owner', 'profile_id', 'profile_image',
             'created_at', 'updated_at', 'name', 'description', 'price',
-            'stock', 'image', 'image_filter', 'street_address', 'city', 
+            'stock', 'image', 'image_renditions', 'image_filter', 'street_address', 'city', 
             'state', 'postal_code', 'country', 'phone_number',
             'review_count', 'average_rating','category', 'size'
         ]
+
+
+class ProductPreviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Compact product representation for the previews embedded in profiles.
+
+    Reads only columns of the product itself, so previews need no joins.
+    """
+    review_count = serializers.ReadOnlyField()
+    average_rating = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'created_at', 'name', 'price', 'image', 'category',
+            'review_count', 'average_rating',
+        ]
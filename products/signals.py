@@ -0,0 +1,162 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from jobs.queue import enqueue
+from profiles.models import Profile
+from reviews.models import Review
+from .cache import invalidate_owner_products, invalidate_products
+from .images import needs_renditions
+from .models import Product
+from .search import SEARCH_SOURCE_FIELDS, get_search_backend
+from .suggest import suggest_index
+
+def index_product(sender, instance, **kwargs):
+    """
+    Signal receiver that refreshes a product's full-text search entry after it is saved,
+    unless the save was limited to fields the entry is not built from.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model being saved.
+        **kwargs: Additional keyword arguments.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not SEARCH_SOURCE_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index([instance.pk])
+
+def unindex_product(sender, instance, **kwargs):
+    """
+    Signal receiver that removes a deleted product from the full-text search index.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model that was deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    get_search_backend().remove([instance.pk])
+
+def reindex_owner_products(sender, instance, created, **kwargs):
+    """
+    Signal receiver that refreshes the search entries of a user's products, which
+    include the owner's username, when an existing user is saved.
+
+    Args:
+        sender (Model): The model class sending the signal (User).
+        instance (User): The instance of the model being saved.
+        created (bool): A boolean indicating whether a new record was created.
+        **kwargs: Additional keyword arguments.
+    """
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    product_ids = list(instance.products.values_list('pk', flat=True))
+    if product_ids:
+        get_search_backend().index(product_ids)
+
+def update_suggestions(sender, instance, **kwargs):
+    """
+    Signal receiver that patches the in-process typeahead index once a product save commits.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model being saved.
+        **kwargs: Additional keyword arguments.
+    """
+    product_id, name, category = instance.pk, instance.name, instance.category
+    transaction.on_commit(lambda: suggest_index.update(product_id, name, category))
+
+def remove_suggestions(sender, instance, **kwargs):
+    """
+    Signal receiver that drops a deleted product from the typeahead index once the delete commits.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model that was deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: suggest_index.remove(product_id))
+
+def invalidate_product_responses(sender, instance, **kwargs):
+    """
+    Signal receiver that invalidates the cached list responses and the cached detail
+    response of a saved or deleted product.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model being saved or deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    invalidate_products([instance.pk])
+
+def queue_image_renditions(sender, instance, **kwargs):
+    """
+    Signal receiver that queues the rendition job of a product saved with a new image.
+
+    Saves keeping the image name the product was loaded with queue nothing,
+    even while the renditions of that image are still being made.
+
+    Args:
+        sender (Model): The model class sending the signal (Product).
+        instance (Product): The instance of the model being saved.
+        **kwargs: Additional keyword arguments.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if 'image' in instance.get_deferred_fields():
+        return
+    if getattr(instance, '_loaded_image', None) == instance.image.name:
+        return
+    if needs_renditions(instance):
+        enqueue('products.render_image', {'product_id': instance.pk}, related=instance)
+
+def invalidate_reviewed_product_responses(sender, instance, **kwargs):
+    """
+    Signal receiver that invalidates the cached responses of the product a review
+    belongs to, and of the product it was moved away from, if any.
+
+    Args:
+        sender (Model): The model class sending the signal (Review).
+        instance (Review): The instance of the model being saved or deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    product_ids = {instance.product_id}
+    previous = getattr(instance, '_previous_rating', None)
+    if previous is not None:
+        product_ids.add(previous[0])
+    invalidate_products(product_ids)
+
+def invalidate_owner_product_responses(sender, instance, **kwargs):
+    """
+    Signal receiver that invalidates the cached responses of every product of a user
+    whose profile (or username) changed, since products embed both. User saves
+    limited to other fields, like the `last_login` update of every login, are
+    ignored.
+
+    Args:
+        sender (Model): The model class sending the signal (Profile or User).
+        instance (Profile | User): The instance of the model being saved or deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    if kwargs.get('created'):
+        return
+    update_fields = kwargs.get('update_fields')
+    if sender is User and update_fields is not None and 'username' not in update_fields:
+        return
+    invalidate_owner_products(instance.owner_id if sender is Profile else instance.pk)
+
+post_save.connect(index_product, sender=Product)
+post_delete.connect(unindex_product, sender=Product)
+post_save.connect(reindex_owner_products, sender=User)
+post_save.connect(update_suggestions, sender=Product)
+post_delete.connect(remove_suggestions, sender=Product)
+post_save.connect(queue_image_renditions, sender=Product)
+post_save.connect(invalidate_product_responses, sender=Product)
+post_delete.connect(invalidate_product_responses, sender=Product)
+post_save.connect(invalidate_reviewed_product_responses, sender=Review)
+post_delete.connect(invalidate_reviewed_product_responses, sender=Review)
+post_save.connect(invalidate_owner_product_responses, sender=Profile)
+post_delete.connect(invalidate_owner_product_responses, sender=Profile)
+post_save.connect(invalidate_owner_product_responses, sender=User)
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from .cache import invalidate_products
+from .models import Product, StockReservation
+
+
+def decrement_stock(quantities):
+    """
+    Atomically take `quantities` out of the stock of several products.
+
+    A single UPDATE decrements every product, and only matches products that
+    still have enough stock, so concurrent buyers never overwrite each other's
+    decrements and stock never goes below zero. Either every product is
+    decremented or the caller must roll back: run it inside a transaction.
+
+    Args:
+        quantities (dict): Quantity to take out, keyed by product ID.
+
+    Returns:
+        list: The IDs of the products without enough stock; empty when every
+        product was decremented.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return []
+    enough_stock = Q()
+    for pk, quantity in quantities.items():
+        enough_stock |= Q(pk=pk, stock__gte=quantity)
+    now = timezone.now()
+    updated = Product.objects.filter(enough_stock).update(
+        stock=F('stock') - Case(
+            *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+            output_field=IntegerField(),
+        ),
+        updated_at=now,
+    )
+    if updated != len(quantities):
+        # The decremented rows carry this update's timestamp; the rest were short.
+        decremented = set(Product.objects.filter(pk__in=quantities, updated_at=now).values_list('pk', flat=True))
+        return sorted(pk for pk in quantities if pk not in decremented)
+    invalidate_products(quantities)
+    return []
+
+
+def reserve_stock(cart, quantities, ttl=None, renew_before=None):
+    """
+    Hold `quantities` of several products for `cart` until they expire.
+
+    The products are written to first, which takes their row locks (the
+    database write lock on SQLite), so concurrent checkouts of the same
+    products queue up and each one counts the holds committed before it.
+    The cart's previous holds are replaced, unless they already hold exactly
+    `quantities` and last until `renew_before`: then they are kept with their
+    expiry, so a repeated checkout of the same cart maps to the same holds.
+    Either every product is held or none is.
+
+    Args:
+        cart (Cart): The cart checking out.
+        quantities (dict): Quantity to hold, keyed by product ID.
+        ttl (timedelta): How long the holds last; STOCK_RESERVATION_TTL by default.
+        renew_before (datetime): Replace matching holds expiring before then;
+            by default matching holds are always replaced.
+
+    Returns:
+        list: The IDs of the products without enough available stock; empty
+        when everything was reserved.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    # Whole seconds, like the expiry of the Stripe session made for the holds.
+    expires_at = (timezone.now() + (ttl or settings.STOCK_RESERVATION_TTL)).replace(microsecond=0)
+    with transaction.atomic():
+        Product.objects.filter(pk__in=quantities).update(stock=F('stock'))
+        if renew_before is not None:
+            held = StockReservation.objects.filter(cart=cart).values_list('product_id', 'quantity', 'expires_at')
+            if held and {pk: quantity for pk, quantity, _ in held} == quantities and all(
+                expiry >= renew_before for _, _, expiry in held
+            ):
+                return []
+        StockReservation.objects.filter(cart=cart).delete()
+        available = dict(
+            Product.objects.filter(pk__in=quantities).with_available_stock()
+            .values_list('pk', 'available_stock')
+        )
+        short = sorted(pk for pk, quantity in quantities.items() if available.get(pk, 0) < quantity)
+        if short:
+            transaction.set_rollback(True)
+            return short
+        StockReservation.objects.bulk_create([
+            StockReservation(cart=cart, product_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in quantities.items()
+        ])
+    return []
+
+
+def release_reservations(cart):
+    """
+    Drop the holds of `cart`, e.g. once its order took the stock or its
+    checkout session expired.
+    """
+    StockReservation.objects.filter(cart=cart).delete()
+
+
+def release_expired_reservations(now=None):
+    """
+    Delete the reservations that have expired.
+
+    Expired holds no longer count against the available stock, so this only
+    keeps the table small.
+
+    Returns:
+        int: The number of deleted reservations.
+    """
+    deleted, _ = StockReservation.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
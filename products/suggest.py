@@ -0,0 +1,169 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from .models import Product
+
+
+def normalize(text):
+    """
+    Lowercase `text` and reduce it to its words separated by single spaces.
+    """
+    return ' '.join(re.findall(r'\w+', text.casefold()))
+
+
+class PrefixIndex:
+    """
+    In-process typeahead index over product names.
+
+    Every word-suffix of a name ("red summer dress", "summer dress", "dress")
+    is kept in one sorted list of `(key, product id)` pairs, so a prefix
+    lookup is a binary search followed by a short forward scan. The index is
+    loaded lazily, patched on product saves and deletes in this process, and
+    rebuilt once it is older than `SUGGEST_INDEX_MAX_AGE` seconds so changes
+    made by other processes show up within that window.
+
+    Only one thread rebuilds at a time; the others keep answering from the
+    stale index meanwhile (or wait for the first build). Saves and deletes
+    committed while the rows are read are replayed on the rebuilt index.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._entries = []
+        self._products = {}
+        self._built_at = None
+        # Changes recorded while a rebuild reads the rows, or None.
+        self._changes = None
+
+    @staticmethod
+    def keys_for(name):
+        words = normalize(name).split(' ')
+        return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+    def load(self, rows):
+        """
+        Replace the index contents with `(id, name, category)` rows.
+        """
+        entries = []
+        products = {}
+        for product_id, name, category in rows:
+            keys = self.keys_for(name)
+            products[product_id] = (name, category, keys)
+            entries.extend((key, product_id) for key in keys)
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._products = products
+            self._built_at = time.monotonic()
+            changes, self._changes = self._changes, None
+            for change, args in changes or ():
+                change(*args)
+
+    def read_rows(self):
+        return Product.objects.values_list('id', 'name', 'category').iterator()
+
+    def rebuild(self):
+        """
+        Reload the index from the database.
+
+        Changes arriving while the rows are read may be missing from them,
+        so they are recorded and applied again once the rows are loaded.
+        """
+        with self._lock:
+            self._changes = []
+        try:
+            self.load(self.read_rows())
+        finally:
+            with self._lock:
+                self._changes = None
+
+    def is_built(self):
+        return self._built_at is not None
+
+    def ensure_fresh(self):
+        max_age = self.max_age
+        if max_age is None:
+            max_age = getattr(settings, 'SUGGEST_INDEX_MAX_AGE', 300)
+        if self.is_built() and time.monotonic() - self._built_at <= max_age:
+            return
+        # A stale index keeps serving while another thread rebuilds it; an
+        # index that was never built is waited for.
+        if not self._rebuild_lock.acquire(blocking=not self.is_built()):
+            return
+        try:
+            if not self.is_built() or time.monotonic() - self._built_at > max_age:
+                self.rebuild()
+        finally:
+            self._rebuild_lock.release()
+
+    def update(self, product_id, name, category):
+        """
+        Insert or replace one product's entries.
+        """
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((self._update, (product_id, name, category)))
+            if self.is_built():
+                self._update(product_id, name, category)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((self._discard, (product_id,)))
+            if self.is_built():
+                self._discard(product_id)
+
+    def _update(self, product_id, name, category):
+        self._discard(product_id)
+        keys = self.keys_for(name)
+        self._products[product_id] = (name, category, keys)
+        for key in keys:
+            insort(self._entries, (key, product_id))
+
+    def _discard(self, product_id):
+        previous = self._products.pop(product_id, None)
+        if previous is None:
+            return
+        for key in previous[2]:
+            position = bisect_left(self._entries, (key, product_id))
+            if position < len(self._entries) and self._entries[position] == (key, product_id):
+                del self._entries[position]
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return up to `limit` products whose name has a word starting with `prefix`.
+
+        Names that start with the prefix come first; ties are alphabetical.
+
+        Returns:
+            list: Dicts with the `id`, `name` and `category` of each match.
+        """
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            position = bisect_left(self._entries, (prefix,))
+            seen = {}
+            # Look a little past `limit` so whole-name matches can be ranked first.
+            while position < len(self._entries) and len(seen) < limit * 4:
+                key, product_id = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                seen.setdefault(product_id, key)
+                position += 1
+            matches = [(product_id, self._products[product_id]) for product_id in seen]
+        matches.sort(key=lambda match: (
+            not normalize(match[1][0]).startswith(prefix), match[1][0].casefold(), match[0]
+        ))
+        return [
+            {'id': product_id, 'name': name, 'category': category}
+            for product_id, (name, category, _) in matches[:limit]
+        ]
+
+
+suggest_index = PrefixIndex()
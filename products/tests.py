@@ -2,10 +2,31 @@ from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Product
+from .models import Product, StockReservation
+from .stock import reserve_stock
+from cart.models import Cart
+from datetime import timedelta
 from reviews.models import Review
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.core.management.base import CommandError
+from io import StringIO
+from .cache import LIST_VERSION_KEY
+from .search import PostgresProductSearch, SQLiteProductSearch
+from .suggest import PrefixIndex, suggest_index
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from io import BytesIO
+from jobs.models import Job
+from PIL import Image, ImageFile
+from unittest.mock import patch
 import os
+import shutil
+import tempfile
+import threading
+from bisect import bisect_left
 
 class ProductTestCase(TestCase):
     """
@@ -226,3 +247,568 @@ class ProductTestCase(TestCase):
         response = self.client.post('/products/', data, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('name', response.data)
+
+
+class ReviewAggregateTestCase(TestCase):
+    """
+    Test suite for the review aggregates stored on Product.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.user2 = User.objects.create_user(username='otheruser', password='12345')
+        self.product = Product.objects.create(
+            owner=self.user, name='Test Product', price=10.00, stock=10
+        )
+        self.other_product = Product.objects.create(
+            owner=self.user, name='Other Product', price=10.00, stock=10
+        )
+
+    def test_review_create_update_delete_keep_aggregates_in_step(self):
+        """
+        Test that creating, updating, moving and deleting reviews adjusts the stored aggregates.
+        """
+        review = Review.objects.create(product=self.product, owner=self.user, rating=5, comment='a')
+        Review.objects.create(product=self.product, owner=self.user2, rating=2, comment='b')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.review_count, self.product.rating_sum), (2, 7))
+        self.assertEqual(self.product.average_rating, 3.5)
+
+        review.rating = 3
+        review.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.review_count, self.product.rating_sum), (2, 5))
+
+        review.product = self.other_product
+        review.save()
+        self.product.refresh_from_db()
+        self.other_product.refresh_from_db()
+        self.assertEqual((self.product.review_count, self.product.rating_sum), (1, 2))
+        self.assertEqual((self.other_product.review_count, self.other_product.rating_sum), (1, 3))
+
+        review.delete()
+        self.other_product.refresh_from_db()
+        self.assertEqual((self.other_product.review_count, self.other_product.rating_sum), (0, 0))
+        self.assertEqual(self.other_product.average_rating, 0)
+
+    def test_product_edit_keeps_aggregates_stored_since_it_was_loaded(self):
+        """
+        Test that saving a product loaded before a review and a rendition does not overwrite them.
+        """
+        product = Product.objects.get(pk=self.product.pk)
+        Review.objects.create(product=self.product, owner=self.user, rating=4, comment='a')
+        Product.objects.filter(pk=self.product.pk).update(image_renditions={'source': 'products/a.jpg'})
+
+        product.name = 'Renamed'
+        product.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Renamed')
+        self.assertEqual((self.product.review_count, self.product.rating_sum), (1, 4))
+        self.assertEqual(self.product.image_renditions, {'source': 'products/a.jpg'})
+
+        product.rating_sum = 0
+        product.save(update_fields=['rating_sum'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 0)
+
+    def test_rebuild_review_aggregates_command(self):
+        """
+        Test that the management command detects drift with --verify and repairs it on rebuild.
+        """
+        Review.objects.create(product=self.product, owner=self.user, rating=4, comment='a')
+        Product.objects.filter(pk=self.product.pk).update(review_count=9, rating_sum=1)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_review_aggregates', '--verify', stdout=StringIO(), stderr=StringIO())
+
+        call_command('rebuild_review_aggregates', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.other_product.refresh_from_db()
+        self.assertEqual((self.product.review_count, self.product.rating_sum), (1, 4))
+        self.assertEqual((self.other_product.review_count, self.other_product.rating_sum), (0, 0))
+        call_command('rebuild_review_aggregates', '--verify', stdout=StringIO())
+
+
+class ProductQueryCountTestCase(TestCase):
+    """
+    Test that product endpoints run a constant number of queries.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.user.profile.country = 'CH'
+        self.user.profile.save()
+
+    def create_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                owner=self.user, name=f'Product {i}', price=10.00, stock=10
+            )
+            Review.objects.create(product=product, owner=self.user, rating=4, comment='ok')
+
+    def test_list_products_query_count_does_not_grow_with_rows(self):
+        """
+        Test that listing one product and a full page of products cost the same number of queries.
+        """
+        self.create_products(1)
+        with self.assertNumQueries(2):
+            self.client.get('/products/')
+        self.create_products(9)
+        with self.assertNumQueries(2):
+            response = self.client.get('/products/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['review_count'], 1)
+        self.assertEqual(response.data['results'][0]['country'], 'Switzerland')
+
+
+class ProductSearchTestCase(TestCase):
+    """
+    Test suite for the product full-text search filter.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.seller = User.objects.create_user(username='vintageshop', password='12345')
+        self.jacket = Product.objects.create(
+            owner=self.user, name='Leather jacket', description='Warm and brown', price=90, stock=1
+        )
+        self.boots = Product.objects.create(
+            owner=self.user, name='Hiking boots', description='Pairs well with a leather jacket',
+            price=60, stock=1
+        )
+        self.scarf = Product.objects.create(
+            owner=self.seller, name='Wool scarf', description='Knitted', price=20, stock=1
+        )
+
+    def search(self, term, **params):
+        response = self.client.get('/products/', {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_matches_description_and_ranks_name_matches_first(self):
+        """
+        Test that description matches are found and ranked below name matches.
+        """
+        self.assertEqual(self.search('leather'), [self.jacket.id, self.boots.id])
+
+    def test_search_matches_word_prefixes_and_owner_username(self):
+        """
+        Test that partial words and the owner's username match.
+        """
+        self.assertEqual(self.search('jack'), [self.jacket.id, self.boots.id])
+        self.assertEqual(self.search('vintageshop'), [self.scarf.id])
+
+    def test_explicit_ordering_overrides_relevance(self):
+        """
+        Test that `?ordering=` takes precedence over relevance ordering.
+        """
+        self.assertEqual(self.search('leather', ordering='created_at'), [self.jacket.id, self.boots.id])
+        self.assertEqual(self.search('leather', ordering='-created_at'), [self.boots.id, self.jacket.id])
+
+    def test_index_follows_product_and_owner_changes(self):
+        """
+        Test that saving, deleting and renaming owners keep the index in sync.
+        """
+        self.scarf.name = 'Cashmere scarf'
+        self.scarf.save()
+        self.assertEqual(self.search('cashmere'), [self.scarf.id])
+        self.assertEqual(self.search('wool'), [])
+
+        self.seller.username = 'retroshop'
+        self.seller.save()
+        self.assertEqual(self.search('retroshop'), [self.scarf.id])
+
+        self.scarf.delete()
+        self.assertEqual(self.search('cashmere'), [])
+
+    def test_rebuild_command(self):
+        """
+        Test that the rebuild command restores a cleared index.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM products_product_fts')
+        self.assertEqual(self.search('scarf'), [])
+        call_command('rebuild_product_search_index', stdout=StringIO())
+        self.assertEqual(self.search('scarf'), [self.scarf.id])
+
+    def test_saves_of_unindexed_fields_skip_reindexing(self):
+        """
+        Test that a save limited to fields outside the search entry does not rebuild it.
+        """
+        with patch.object(SQLiteProductSearch, 'index') as index:
+            self.scarf.stock = 5
+            self.scarf.save(update_fields=['stock'])
+            index.assert_not_called()
+            self.scarf.name = 'Cashmere scarf'
+            self.scarf.save(update_fields=['name'])
+            index.assert_called_once_with([self.scarf.pk])
+
+    def test_postgres_query_matches_the_last_word_as_prefix(self):
+        """
+        Test that the PostgreSQL tsquery requires every word and completes the last one.
+        """
+        self.assertEqual(PostgresProductSearch.build_query('leather jack'), "'leather' & 'jack':*")
+        self.assertEqual(PostgresProductSearch.build_query("it's"), "'it' & 's':*")
+        self.assertIsNone(PostgresProductSearch.build_query('!!'))
+
+
+class ProductSuggestTestCase(TestCase):
+    """
+    Test suite for the typeahead suggestion endpoint and its prefix index.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.dress = Product.objects.create(
+            owner=self.user, name='Red Summer Dress', price=30, stock=1, category='women'
+        )
+        self.shirt = Product.objects.create(
+            owner=self.user, name='Summer Shirt', price=20, stock=1, category='men'
+        )
+        self.skirt = Product.objects.create(
+            owner=self.user, name='Denim Skirt', price=25, stock=1, category='women'
+        )
+        suggest_index.rebuild()
+
+    def suggest(self, q, **params):
+        response = self.client.get('/products/suggest/', {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_suggest_returns_compact_prefix_matches(self):
+        """
+        Test that any word of the name can match and whole-name prefixes rank first.
+        """
+        self.assertEqual(self.suggest('summ'), [
+            {'id': self.shirt.id, 'name': 'Summer Shirt', 'category': 'men'},
+            {'id': self.dress.id, 'name': 'Red Summer Dress', 'category': 'women'},
+        ])
+        self.assertEqual([item['id'] for item in self.suggest('SUMMER dr')], [self.dress.id])
+        self.assertEqual(len(self.suggest('s', limit=1)), 1)
+        self.assertEqual(self.suggest(''), [])
+
+    def test_suggest_runs_without_queries(self):
+        """
+        Test that suggestions are served from memory.
+        """
+        with self.assertNumQueries(0):
+            self.suggest('den')
+
+    def test_index_follows_product_changes(self):
+        """
+        Test that saves and deletes patch the index once they commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.skirt.name = 'Pleated Skirt'
+            self.skirt.save()
+            hat = Product.objects.create(owner=self.user, name='Sun hat', price=5, stock=1)
+        self.assertEqual(self.suggest('den'), [])
+        self.assertEqual([item['id'] for item in self.suggest('pleat')], [self.skirt.id])
+        self.assertEqual([item['id'] for item in self.suggest('sun')], [hat.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hat.delete()
+        self.assertEqual(self.suggest('sun'), [])
+
+    def test_lookup_cost_does_not_grow_with_the_index(self):
+        """
+        Test that a lookup is one binary search and a scan bounded by the limit.
+        """
+        visited = []
+
+        class CountingList(list):
+            def __getitem__(self, position):
+                visited.append(position)
+                return super().__getitem__(position)
+
+        index = PrefixIndex(max_age=3600)
+        index.load((i, f'Product {i} cotton shirt', 'men') for i in range(20000))
+        index._entries = CountingList(index._entries)
+        with patch('products.suggest.bisect_left', wraps=bisect_left) as bisect:
+            for prefix in ('product 1', 'cotton', 'shirt', 'product 19999'):
+                visited.clear()
+                bisect.reset_mock()
+                self.assertEqual(len(index.suggest(prefix, 10)), 10 if prefix != 'product 19999' else 1)
+                self.assertEqual(bisect.call_count, 1)
+                # The binary search's probes, then at most 4 * limit entries and the one ending the scan.
+                self.assertLessEqual(len(visited), len(index._entries).bit_length() + 10 * 4 + 1)
+
+    def test_stale_index_is_rebuilt_by_one_thread(self):
+        """
+        Test that concurrent lookups on a stale index start a single rebuild and keep answering.
+        """
+        index = PrefixIndex(max_age=0)
+        index.load([(1, 'Summer Shirt', 'men')])
+        started, release = threading.Event(), threading.Event()
+        rebuilds = []
+
+        def slow_rows():
+            rebuilds.append(threading.current_thread())
+            started.set()
+            release.wait(5)
+            return [(1, 'Summer Shirt', 'men')]
+
+        with patch.object(index, 'read_rows', side_effect=slow_rows):
+            rebuilder = threading.Thread(target=index.suggest, args=('summer',))
+            rebuilder.start()
+            self.assertTrue(started.wait(5))
+            for _ in range(3):
+                self.assertEqual([item['id'] for item in index.suggest('summer')], [1])
+            release.set()
+            rebuilder.join(5)
+        self.assertEqual(len(rebuilds), 1)
+
+    def test_changes_during_a_rebuild_are_replayed(self):
+        """
+        Test that saves and deletes arriving while the rows are read survive the rebuild.
+        """
+        index = PrefixIndex(max_age=3600)
+        index.load([(1, 'Summer Shirt', 'men'), (2, 'Denim Skirt', 'women')])
+
+        def rows_read_before_the_changes():
+            rows = [(1, 'Summer Shirt', 'men'), (2, 'Denim Skirt', 'women')]
+            index.update(3, 'Sun hat', 'men')
+            index.update(1, 'Winter Shirt', 'men')
+            index.remove(2)
+            return rows
+
+        with patch.object(index, 'read_rows', side_effect=rows_read_before_the_changes):
+            index.rebuild()
+        self.assertEqual([item['name'] for item in index.suggest('s')], ['Sun hat', 'Winter Shirt'])
+        self.assertEqual(index.suggest('summer'), [])
+        self.assertEqual(index.suggest('denim'), [])
+
+
+class ProductResponseCacheTestCase(TestCase):
+    """
+    Test suite for the cached product list and detail responses.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.other = User.objects.create_user(username='otheruser', password='12345')
+        self.product = Product.objects.create(
+            owner=self.user, name='Cached Product', price=10, stock=1, category='men'
+        )
+
+    def test_anonymous_requests_are_served_from_cache(self):
+        """
+        Test that repeated anonymous GETs run no queries, per URL.
+        """
+        self.client.get('/products/')
+        self.client.get(f'/products/{self.product.id}/')
+        with self.assertNumQueries(0):
+            list_response = self.client.get('/products/')
+            detail_response = self.client.get(f'/products/{self.product.id}/')
+        self.assertEqual(list_response.data['results'][0]['name'], 'Cached Product')
+        self.assertEqual(detail_response.data['name'], 'Cached Product')
+
+        response = self.client.get('/products/', {'category': 'women'})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_is_owner_is_personalized_from_shared_entries(self):
+        """
+        Test that a cached entry reports `is_owner` for the requesting user only.
+        """
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f'/products/{self.product.id}/')
+        self.assertTrue(response.data['is_owner'])
+
+        self.client.force_authenticate(self.other)
+        response = self.client.get(f'/products/{self.product.id}/')
+        self.assertFalse(response.data['is_owner'])
+
+        self.client.force_authenticate(None)
+        self.assertFalse(self.client.get('/products/').data['results'][0]['is_owner'])
+        self.client.force_authenticate(self.user)
+        self.assertTrue(self.client.get('/products/').data['results'][0]['is_owner'])
+
+    def test_logins_keep_the_cached_list(self):
+        """
+        Test that the `last_login` update of a login does not invalidate product responses.
+        """
+        self.client.get('/products/')
+        version = cache.get(LIST_VERSION_KEY)
+        self.assertTrue(self.client.login(username='testuser', password='12345'))
+        self.assertEqual(cache.get(LIST_VERSION_KEY), version)
+
+    def test_product_review_and_profile_changes_invalidate_entries(self):
+        """
+        Test that each model feeding the serializer invalidates the cached responses.
+        """
+        url = f'/products/{self.product.id}/'
+        self.client.get('/products/')
+        self.client.get(url)
+
+        self.product.name = 'Renamed Product'
+        self.product.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Renamed Product')
+        self.assertEqual(self.client.get('/products/').data['results'][0]['name'], 'Renamed Product')
+
+        review = Review.objects.create(product=self.product, owner=self.other, rating=4, comment='ok')
+        self.assertEqual(self.client.get(url).data['review_count'], 1)
+        review.delete()
+        self.assertEqual(self.client.get('/products/').data['results'][0]['review_count'], 0)
+
+        self.user.profile.city = 'Lausanne'
+        self.user.profile.save()
+        self.assertEqual(self.client.get(url).data['city'], 'Lausanne')
+
+        self.product.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/products/').data['count'], 0)
+
+
+class StockReservationTestCase(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='password')
+        self.product = Product.objects.create(owner=self.seller, name='Shirt', price=10, stock=3)
+        self.other = Product.objects.create(owner=self.seller, name='Hat', price=5, stock=10)
+        self.cart = Cart.objects.create(owner=User.objects.create_user(username='buyer', password='password'))
+        self.rival = Cart.objects.create(owner=User.objects.create_user(username='rival', password='password'))
+
+    def available(self, product, cart=None):
+        return Product.objects.with_available_stock(exclude_cart=cart).get(pk=product.pk).available_stock
+
+    def test_reserve_stock_holds_units(self):
+        self.assertEqual(reserve_stock(self.cart, {self.product.pk: 2, self.other.pk: 1}), [])
+        self.assertEqual(self.available(self.product), 1)
+        self.assertEqual(self.available(self.product, self.cart), 3)
+        self.assertEqual(reserve_stock(self.rival, {self.product.pk: 2}), [self.product.pk])
+        self.assertEqual(reserve_stock(self.rival, {self.product.pk: 1}), [])
+        self.assertEqual(self.available(self.product), 0)
+
+    def test_reserving_again_replaces_the_cart_holds(self):
+        reserve_stock(self.cart, {self.product.pk: 3})
+        self.assertEqual(reserve_stock(self.cart, {self.product.pk: 1}), [])
+        self.assertEqual(list(StockReservation.objects.values_list('quantity', flat=True)), [1])
+
+    def test_failed_reservation_keeps_previous_holds(self):
+        """
+        Ensure a reservation is all or nothing.
+        """
+        reserve_stock(self.cart, {self.product.pk: 1})
+        self.assertEqual(reserve_stock(self.cart, {self.product.pk: 1, self.other.pk: 11}), [self.other.pk])
+        self.assertEqual(
+            list(StockReservation.objects.values_list('product_id', 'quantity')), [(self.product.pk, 1)]
+        )
+
+    def test_expired_holds_are_not_counted_and_swept(self):
+        reserve_stock(self.cart, {self.product.pk: 3}, ttl=timedelta(minutes=-1))
+        self.assertEqual(self.available(self.product), 3)
+        self.assertEqual(reserve_stock(self.rival, {self.product.pk: 3}), [])
+        out = StringIO()
+        call_command('release_expired_reservations', stdout=out)
+        self.assertIn('Released 1 expired reservation(s).', out.getvalue())
+        self.assertEqual(list(StockReservation.objects.values_list('cart_id', flat=True)), [self.rival.pk])
+
+
+def image_upload(size, image_format='PNG', name='upload.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format)
+    return SimpleUploadedFile(name=name, content=buffer.getvalue(), content_type=Image.MIME[image_format])
+
+
+class ProductImageRenditionTestCase(TestCase):
+    """
+    Tests for header-only upload validation and the image rendition job.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='12345')
+        self.client.login(username='seller', password='12345')
+
+    def create(self, image):
+        return self.client.post('/products/', {
+            'name': 'Poster', 'price': 10, 'stock': 5, 'image': image,
+        }, format='multipart')
+
+    def run_jobs(self):
+        call_command('run_jobs', once=True, stdout=StringIO())
+
+    def test_upload_is_validated_from_the_header(self):
+        with patch.object(ImageFile.ImageFile, 'load', autospec=True) as load, \
+                patch.object(ImageFile.ImageFile, 'verify', autospec=True) as verify:
+            response = self.create(image_upload((800, 400), 'JPEG', 'upload.jpg'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        load.assert_not_called()
+        verify.assert_not_called()
+
+    def test_oversized_and_invalid_uploads_are_refused(self):
+        response = self.create(image_upload((4100, 10)))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['image'], ['Image width larger than 4096px!'])
+
+        response = self.create(SimpleUploadedFile('fake.png', b'not an image', content_type='image/png'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+    def test_renditions_are_generated_in_the_background(self):
+        response = self.create(image_upload((1000, 500)))
+        product = Product.objects.get(pk=response.data['id'])
+        self.assertIsNone(response.data['image_renditions'])
+        self.assertEqual(Job.objects.get().name, 'products.render_image')
+
+        self.run_jobs()
+        product.refresh_from_db()
+        self.assertEqual(product.image_renditions['source'], product.image.name)
+        expected_sizes = {'thumbnail': (200, 200), 'card': (600, 300), 'full': (1000, 500)}
+        for rendition, size in expected_sizes.items():
+            for extension, image_format in [('webp', 'WEBP'), ('jpeg', 'JPEG')]:
+                with default_storage.open(product.image_renditions[rendition][extension]) as rendition_file:
+                    image = Image.open(rendition_file)
+                    self.assertEqual((image.format, image.size), (image_format, size))
+
+        urls = self.client.get(f'/products/{product.pk}/').data['image_renditions']
+        self.assertEqual(set(urls), {'thumbnail', 'card', 'full'})
+        self.assertTrue(urls['card']['webp'].startswith('/media/renditions/products/'))
+        listed = self.client.get('/products/?fields=id,image_renditions').data['results'][0]
+        self.assertEqual(listed, {'id': product.pk, 'image_renditions': urls})
+
+    def test_new_image_replaces_the_renditions(self):
+        product = Product.objects.get(pk=self.create(image_upload((300, 300))).data['id'])
+        self.run_jobs()
+        product.refresh_from_db()
+        previous = product.image_renditions['thumbnail']['webp']
+
+        response = self.client.patch(f'/products/{product.pk}/', {'image': image_upload((500, 500))}, format='multipart')
+        self.assertIsNone(response.data['image_renditions'])
+        self.run_jobs()
+        product.refresh_from_db()
+        self.assertEqual(product.image_renditions['source'], product.image.name)
+        self.assertFalse(default_storage.exists(previous))
+
+    def test_saves_keeping_the_image_queue_nothing(self):
+        product = Product.objects.get(pk=self.create(image_upload((300, 300))).data['id'])
+        product.name = 'Framed poster'
+        product.save()
+        response = self.client.patch(f'/products/{product.pk}/', {'stock': 4}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.run_jobs()
+        product.refresh_from_db()
+        renditions = product.image_renditions
+        stale = Product.objects.get(pk=product.pk)
+        Product.objects.filter(pk=product.pk).update(image_renditions={})
+        stale.image_renditions = renditions
+        stale.stock = 3
+        stale.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).image_renditions, {})
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_default_image_has_no_renditions(self):
+        Product.objects.create(owner=self.user, name='Plain', price=10, stock=1)
+        self.assertFalse(Job.objects.exists())
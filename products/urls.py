@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import ProductList, ProductDetail
+from .views import ProductList, ProductDetail, ProductSuggest
 
 urlpatterns = [
     path('products/', ProductList.as_view(), name='product-list'),
+    path('products/suggest/', ProductSuggest.as_view(), name='product-suggest'),
     path('products/<int:pk>/', ProductDetail.as_view(), name='product-detail'),
 ]
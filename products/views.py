@@ -1,35 +1,81 @@
 from rest_framework import generics, permissions, filters
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_api.fieldsets import SparseFieldset
+from drf_api.mixins import CachedObjectMixin, ConditionalGetMixin
 from drf_api.permissions import IsOwnerOrReadOnly
+from .cache import ProductResponseCacheMixin
 from .models import Product
 from .serializers import ProductSerializer
+from .search import ProductSearchFilter
+from .suggest import suggest_index
+from drf_api.pagination import OptionalKeysetPagination
 
-class ProductList(generics.ListCreateAPIView):
+class ProductList(ProductResponseCacheMixin, generics.ListCreateAPIView):
     """
     List products or create a product if logged in
     The perform_create method associates the product with the logged in user.
+    `?search=` matches the name, owner username and description through the
+    product full-text index and orders results by relevance.
+    GET responses are cached per URL until a product, review or profile changes.
     """
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = Product.objects.all().order_by('-created_at')
+    queryset = Product.objects.for_serializer().order_by('-created_at')
     filter_backends = [
         filters.OrderingFilter,
-        filters.SearchFilter,
+        ProductSearchFilter,
         DjangoFilterBackend
     ]
     filterset_fields = [
         'owner__profile','category', 'size'
     ]
-    search_fields = ['owner__username', 'name']
     ordering_fields = ['created_at']
+    pagination_class = OptionalKeysetPagination
+
+    def get_queryset(self):
+        fieldset = SparseFieldset.from_request(self.request)
+        return Product.objects.for_serializer(fieldset).order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class ProductDetail(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetail(CachedObjectMixin, ConditionalGetMixin, ProductResponseCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve a product and edit or delete it if you own it.
+    GET responses are cached until the product, its reviews or its owner's profile change,
+    and carry ETag / Last-Modified validators for conditional requests.
     """
     serializer_class = ProductSerializer
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Product.objects.all()
+    queryset = Product.objects.for_serializer()
+
+    def get_queryset(self):
+        return Product.objects.for_serializer(SparseFieldset.from_request(self.request))
+
+    def get_validator_querysets(self):
+        return Product.objects.filter(pk=self.kwargs['pk']).validator_querysets()
+
+    def get_validators(self, request):
+        return self.get_cached_validators(request, super().get_validators)
+
+class ProductSuggest(APIView):
+    """
+    Typeahead suggestions for the product search box.
+
+    Returns the `id`, `name` and `category` of up to `limit` (default 10,
+    at most 20) products with a name word starting with `q`. Answers come
+    from the in-process prefix index, without a database query.
+    """
+    permission_classes = [permissions.AllowAny]
+    default_limit = 10
+    max_limit = 20
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+        return Response(suggest_index.suggest(request.query_params.get('q', ''), limit))
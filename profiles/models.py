@@ -1,7 +1,107 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from phonenumber_field.modelfields import PhoneNumberField
 from django_countries.fields import CountryField
+from products.models import Product
+from reviews.models import Review
+
+# Number of latest products and reviews embedded in a profile.
+PROFILE_PREVIEW_SIZE = 3
+
+def join_path(path, name):
+    return f'{path}.{name}' if path else name
+
+def owner_count(model):
+    """
+    Subquery counting the rows of `model` owned by the profile's owner.
+    """
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(owner=models.OuterRef('owner')).order_by().values('owner')
+            .annotate(count=models.Count('pk')).values('count')
+        ),
+        0,
+    )
+
+def owner_preview_prefetches(prefix='', fieldset=None, path=''):
+    """
+    Prefetch lookups for the latest products and reviews ProfileSerializer previews.
+
+    Each list is sliced per owner inside its prefetch query and stored on the
+    user as `latest_products` / `latest_reviews`, so the cost does not grow
+    with how active the owners are.
+
+    Args:
+        prefix (str): Lookup path from the queried model to the user, e.g. 'owner__'.
+        fieldset (SparseFieldset): The fields requested with `?fields=` / `?omit=`, if any.
+        path (str): Dotted path of the ProfileSerializer in the response.
+
+    Returns:
+        list: Prefetch objects for the previews the request asks for.
+    """
+    prefetches = []
+    if fieldset is None or fieldset.wants(join_path(path, 'latest_products')):
+        prefetches.append(models.Prefetch(
+            f'{prefix}products',
+            queryset=Product.objects.order_by('-created_at', '-id')[:PROFILE_PREVIEW_SIZE],
+            to_attr='latest_products',
+        ))
+    if fieldset is None or fieldset.wants(join_path(path, 'latest_reviews')):
+        prefetches.append(models.Prefetch(
+            f'{prefix}reviews',
+            queryset=Review.objects.select_related('owner').order_by('-created_at', '-id')[:PROFILE_PREVIEW_SIZE],
+            to_attr='latest_reviews',
+        ))
+    return prefetches
+
+class ProfileQuerySet(models.QuerySet):
+    """
+    QuerySet for Profile with the related rows needed by ProfileSerializer.
+    """
+
+    def for_serializer(self, fieldset=None):
+        """
+        Join the owner, count the owner's products and reviews, and prefetch
+        the latest PROFILE_PREVIEW_SIZE of each.
+
+        A page of profiles costs the same number of queries however many
+        products and reviews its owners have.
+
+        Args:
+            fieldset (SparseFieldset): The fields requested with `?fields=` /
+                `?omit=`, if any. Counts and previews left out are not queried.
+        """
+        return self.select_related('owner').with_counts(fieldset).prefetch_related(
+            *owner_preview_prefetches('owner__', fieldset)
+        )
+
+    def with_counts(self, fieldset=None, path=''):
+        """
+        Annotate `products_count` and `reviews_count` for the profiles' owners.
+        """
+        queryset = self
+        if fieldset is None or fieldset.wants(join_path(path, 'products_count')):
+            queryset = queryset.annotate(products_count=owner_count(Product))
+        if fieldset is None or fieldset.wants(join_path(path, 'reviews_count')):
+            queryset = queryset.annotate(reviews_count=owner_count(Review))
+        return queryset
+
+    def validator_querysets(self):
+        """
+        Querysets whose timestamps and ids determine how these profiles serialize.
+
+        Returns:
+            list: `(queryset, timestamp field)` pairs for the profiles, the
+            products counted and previewed under them (see
+            `ProductQuerySet.validator_querysets`) and the reviews their owners wrote.
+        """
+        owners = self.order_by().values('owner')
+        return [
+            (self, 'updated_at'),
+            *Product.objects.filter(owner__in=owners).validator_querysets(),
+            (Review.objects.filter(owner__in=owners), 'updated_at'),
+        ]
 
 class Profile(models.Model):
     owner = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -17,8 +117,13 @@ class Profile(models.Model):
     content = models.TextField(blank=True)
     image = models.ImageField(upload_to='images/', default='images/default_profile_xffzir')
 
+    objects = ProfileQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='profile_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.owner}'s profile"
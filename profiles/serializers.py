@@ -4,8 +4,10 @@ from .models import Profile
 from products.models import Product
 from reviews.models import Review
 from django_countries.serializer_fields import CountryField
-from products.serializers import ProductSerializer
+from products.images import HeaderOnlyImageField
+from products.serializers import ProductPreviewSerializer
 from reviews.serializers import ReviewSerializer
+from drf_api.fieldsets import SparseFieldsetMixin
 
 EU_COUNTRY_CODES = [
     "AT", "BE", "BG", "HR", "CY", "CZ", "DK", "EE", "FI", "FR", "DE", "GR", 
@@ -13,26 +15,31 @@ EU_COUNTRY_CODES = [
     "SI", "ES", "SE"
 ]
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for Profile instances.
 
-    Provides a detailed view of the user's profile, including personal information,
-    owned products, and reviews. It includes methods to verify ownership and validate
-    phone numbers against EU country codes.
+    Provides a compact view of the user's profile: personal information, the
+    number of products and reviews the user owns, and previews of the latest
+    few of each. The full lists are served, paginated, by
+    `/profiles/<pk>/products/` and `/profiles/<pk>/reviews/`. It includes
+    methods to verify ownership and validate phone numbers against EU country codes.
     """
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
     country = CountryField()
-    products = ProductSerializer(many=True, read_only=True, source='owner.products')
-    reviews = ReviewSerializer(many=True, read_only=True, source='owner.reviews')
+    image = HeaderOnlyImageField(required=False)
+    products_count = serializers.IntegerField(read_only=True)
+    reviews_count = serializers.IntegerField(read_only=True)
+    latest_products = ProductPreviewSerializer(many=True, read_only=True, source='owner.latest_products')
+    latest_reviews = ReviewSerializer(many=True, read_only=True, source='owner.latest_reviews')
 
     class Meta:
         model = Profile
         fields = [
             'id', 'owner', 'created_at', 'updated_at', 'name', 'street_address', 'city', 
             'state', 'postal_code', 'country', 'phone_number', 'content', 'image', 'is_owner', 
-            'products', 'reviews'
+            'products_count', 'reviews_count', 'latest_products', 'latest_reviews'
         ]
     
     def get_is_owner(self, obj):
@@ -1,5 +1,6 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from drf_api.authentication import invalidate_cached_user
 from .models import Profile
 
 def create_profile(sender, instance, created, **kwargs):
@@ -19,4 +20,22 @@ def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(owner=instance)
 
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Signal receiver that drops the cached authentication entry of a user.
+
+    Connected to the saves and deletes of User and Profile, whose fields
+    `drf_api.authentication.load_user` caches.
+
+    Args:
+        sender (Model): The model class sending the signal (User or Profile).
+        instance (Model): The user or profile being saved or deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    invalidate_cached_user(instance.pk if sender is User else instance.owner_id)
+
 post_save.connect(create_profile, sender=User)
+post_save.connect(invalidate_user_cache, sender=User)
+post_delete.connect(invalidate_user_cache, sender=User)
+post_save.connect(invalidate_user_cache, sender=Profile)
+post_delete.connect(invalidate_user_cache, sender=Profile)
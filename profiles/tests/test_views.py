@@ -2,7 +2,11 @@ from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from profiles.models import Profile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from products.models import Product
+from reviews.models import Review
+from profiles.models import PROFILE_PREVIEW_SIZE, Profile
 
 class ProfileDetailTestCase(TestCase):
 
@@ -84,3 +88,68 @@ class ProfileDetailTestCase(TestCase):
         response = self.client.delete(f'/profiles/{self.profile.id}/')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertTrue(Profile.objects.filter(pk=self.profile.id).exists())
+
+
+class ProfileContentTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user(username='seller', password='12345')
+        self.reviewer = User.objects.create_user(username='reviewer', password='12345')
+        self.profile = Profile.objects.get(owner=self.seller)
+        self.products = [
+            Product.objects.create(owner=self.seller, name=f'Product {i}', price=10, stock=1)
+            for i in range(5)
+        ]
+        for product in self.products[:4]:
+            Review.objects.create(product=product, owner=self.seller, rating=5, comment='ok')
+
+    def test_profile_embeds_counts_and_latest_previews(self):
+        """
+        Ensure a profile carries counts and only the latest few products and reviews.
+        """
+        response = self.client.get(f'/profiles/{self.profile.id}/')
+        self.assertEqual(response.data['products_count'], 5)
+        self.assertEqual(response.data['reviews_count'], 4)
+        self.assertEqual(
+            [product['id'] for product in response.data['latest_products']],
+            [product.id for product in reversed(self.products[-PROFILE_PREVIEW_SIZE:])],
+        )
+        self.assertEqual(len(response.data['latest_reviews']), PROFILE_PREVIEW_SIZE)
+        self.assertNotIn('products', response.data)
+
+    def test_profile_list_runs_constant_queries(self):
+        """
+        Ensure the profile list costs the same number of queries however much content owners have.
+        """
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/profiles/')
+        for i in range(3):
+            owner = User.objects.create_user(username=f'owner{i}', password='12345')
+            for j in range(4):
+                product = Product.objects.create(owner=owner, name=f'Item {j}', price=5, stock=1)
+                Review.objects.create(product=product, owner=owner, rating=3, comment='ok')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/profiles/')
+        self.assertEqual(len(large), len(small))
+        counts = {profile['owner']: profile['products_count'] for profile in response.data['results']}
+        self.assertEqual(counts, {'seller': 5, 'reviewer': 0, 'owner0': 4, 'owner1': 4, 'owner2': 4})
+
+    def test_sub_resources_page_through_all_content(self):
+        """
+        Ensure the full products and reviews lists are served by paginated sub-resources.
+        """
+        response = self.client.get(f'/profiles/{self.profile.id}/products/')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][0]['id'], self.products[-1].id)
+
+        response = self.client.get(f'/profiles/{self.profile.id}/reviews/', {'pagination': 'cursor'})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNone(response.data['next'])
+
+        reviewer_profile = Profile.objects.get(owner=self.reviewer)
+        response = self.client.get(f'/profiles/{reviewer_profile.id}/reviews/')
+        self.assertEqual(response.data['count'], 0)
+
+        response = self.client.get('/profiles/0/products/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
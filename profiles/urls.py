@@ -1,8 +1,10 @@
 
 from django.urls import path
-from .views import ProfileList, ProfileDetail
+from .views import ProfileList, ProfileDetail, ProfileProductList, ProfileReviewList
 
 urlpatterns = [
     path('profiles/', ProfileList.as_view(), name='profile-list'),
     path('profiles/<int:pk>/', ProfileDetail.as_view(), name='profile-detail'),
+    path('profiles/<int:pk>/products/', ProfileProductList.as_view(), name='profile-products'),
+    path('profiles/<int:pk>/reviews/', ProfileReviewList.as_view(), name='profile-reviews'),
 ]
@@ -1,7 +1,15 @@
+from django.shortcuts import get_object_or_404
 from rest_framework import generics
+from products.models import Product
+from products.serializers import ProductSerializer
+from reviews.models import Review
+from reviews.serializers import ReviewSerializer
 from .models import Profile
 from .serializers import ProfileSerializer
+from drf_api.fieldsets import SparseFieldset
+from drf_api.mixins import CachedObjectMixin, ConditionalGetMixin
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.pagination import OptionalKeysetPagination
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 
 class ProfileList(generics.ListAPIView):
@@ -12,18 +20,60 @@ class ProfileList(generics.ListAPIView):
     The permission class `IsAuthenticatedOrReadOnly` ensures that both authenticated
     and unauthenticated users can read the data, but modifications are restricted.
     """
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.for_serializer()
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = OptionalKeysetPagination
 
-class ProfileDetail(generics.RetrieveUpdateDestroyAPIView):
+    def get_queryset(self):
+        return Profile.objects.for_serializer(SparseFieldset.from_request(self.request))
+
+class ProfileDetail(CachedObjectMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a profile instance.
 
     This view provides detailed operations on a single profile instance. Only
     the owner of the profile has permissions to update or delete it, enforced
-    by the `IsOwnerOrReadOnly` permission class.
+    by the `IsOwnerOrReadOnly` permission class. GET responses carry ETag and
+    Last-Modified validators and conditional requests are answered with 304.
     """
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.for_serializer()
     serializer_class = ProfileSerializer
     permission_classes = [IsOwnerOrReadOnly]
+
+    def get_queryset(self):
+        return Profile.objects.for_serializer(SparseFieldset.from_request(self.request))
+
+    def get_validator_querysets(self):
+        return Profile.objects.filter(pk=self.kwargs['pk']).validator_querysets()
+
+class ProfileProductList(generics.ListAPIView):
+    """
+    API view to page through all products of a profile's owner, newest first.
+
+    The profile itself only embeds a count and the latest few products; this
+    sub-resource serves the full list with the same pagination as `/products/`.
+    """
+    serializer_class = ProductSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = OptionalKeysetPagination
+
+    def get_queryset(self):
+        profile = get_object_or_404(Profile.objects.only('owner_id'), pk=self.kwargs['pk'])
+        return Product.objects.for_serializer(SparseFieldset.from_request(self.request)).filter(
+            owner_id=profile.owner_id
+        ).order_by('-created_at', '-id')
+
+class ProfileReviewList(generics.ListAPIView):
+    """
+    API view to page through all reviews written by a profile's owner, newest first.
+    """
+    serializer_class = ReviewSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = OptionalKeysetPagination
+
+    def get_queryset(self):
+        profile = get_object_or_404(Profile.objects.only('owner_id'), pk=self.kwargs['pk'])
+        return Review.objects.select_related('owner').filter(
+            owner_id=profile.owner_id
+        ).order_by('-created_at', '-id')
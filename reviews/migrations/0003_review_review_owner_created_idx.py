@@ -0,0 +1,20 @@
+# Generated by Django 5.0.7 on 2026-10-17 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_search_index'),
+        ('reviews', '0002_review_review_created_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='review_owner_created_idx'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 # reviews/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from products.models import Product
 
@@ -17,6 +17,17 @@ class Review(models.Model):
     class Meta:
         unique_together = ['product', 'owner']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_id_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='review_owner_created_idx'),
+        ]
 
     def __str__(self):
         return f'Review by {self.owner.username} for {self.product.name}'
+
+    def save(self, *args, **kwargs):
+        # The receivers in reviews.signals update the product's stored review
+        # aggregates; run them in the same transaction as the row write.
+        # Deletes already run their signals inside the collector's transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
@@ -0,0 +1,60 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from products.aggregates import apply_review_delta
+from .models import Review
+
+def remember_previous_rating(sender, instance, **kwargs):
+    """
+    Signal receiver that records the stored product and rating of a review before it is updated.
+
+    The values are kept on the instance so `update_review_aggregates` can apply
+    the exact difference to the product's stored review aggregates. The row is
+    read with a lock inside the transaction of `Review.save`, so concurrent
+    edits of the same review each see the rating the other one stored.
+
+    Args:
+        sender (Model): The model class sending the signal (Review).
+        instance (Review): The instance of the model about to be saved.
+        **kwargs: Additional keyword arguments.
+    """
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = Review.objects.select_for_update().filter(pk=instance.pk).values_list(
+            'product_id', 'rating'
+        ).first()
+
+def update_review_aggregates(sender, instance, created, **kwargs):
+    """
+    Signal receiver that keeps `Product.review_count` and `Product.rating_sum` in step
+    with created and updated reviews.
+
+    Args:
+        sender (Model): The model class sending the signal (Review).
+        instance (Review): The instance of the model being saved.
+        created (bool): A boolean indicating whether a new record was created.
+        **kwargs: Additional keyword arguments.
+    """
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        apply_review_delta(instance.product_id, 1, instance.rating)
+        return
+    previous_product_id, previous_rating = previous
+    if previous_product_id != instance.product_id:
+        apply_review_delta(previous_product_id, -1, -previous_rating)
+        apply_review_delta(instance.product_id, 1, instance.rating)
+    else:
+        apply_review_delta(instance.product_id, 0, instance.rating - previous_rating)
+
+def remove_review_aggregates(sender, instance, **kwargs):
+    """
+    Signal receiver that subtracts a deleted review from its product's stored aggregates.
+
+    Args:
+        sender (Model): The model class sending the signal (Review).
+        instance (Review): The instance of the model that was deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    apply_review_delta(instance.product_id, -1, -instance.rating)
+
+pre_save.connect(remember_previous_rating, sender=Review)
+post_save.connect(update_review_aggregates, sender=Review)
+post_delete.connect(remove_review_aggregates, sender=Review)
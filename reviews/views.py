@@ -5,8 +5,10 @@ from rest_framework.exceptions import ValidationError
 from .models import Review
 from .serializers import ReviewSerializer
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.mixins import CachedObjectMixin
+from drf_api.pagination import OptionalKeysetPagination
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(CachedObjectMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing Review instances.
 
@@ -15,9 +17,10 @@ class ReviewViewSet(viewsets.ModelViewSet):
     and only the owner of a review can modify or delete it. Additionally, it prevents users 
     from reviewing the same product more than once.
     """
-    queryset = Review.objects.all()
+    queryset = Review.objects.select_related('owner')
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = OptionalKeysetPagination
 
     def perform_create(self, serializer):
         """